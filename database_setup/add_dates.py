@@ -1,42 +1,29 @@
-import os
-import mysql.connector
-
-# Check if a credentials file exists to read database login details
-# If it does not exist, ask the user to enter them manually
-if os.path.isfile('../credentials.txt'):
-    with open("../credentials.txt", "r") as reader:
-        u, p = [line.strip() for line in reader.readlines()]
-else:
-    u = input("Enter database user: ")
-    p = input("Enter database password: ")
-
-# Connect to the MySQL database using the provided credentials
-# This connects to the local database that stores meal information
-cnx = mysql.connector.connect(
-    host="127.0.0.1",
-    port=3308,
-    user=u,
-    password=p,
-    database="meals"
-)
-
-# Create a cursor to execute SQL queries on the database
-cur = cnx.cursor()
-
-# Fetch the names of all meals currently stored in the table
-cur.execute("SELECT Name FROM MealsTable;")
-meals = [r[0] for r in cur.fetchall()]
-
-# Update the Last_Made date for each meal to a fixed date
+from meal_app import create_app
+from meal_app.catalogue import catalogue
+from meal_app.utilities import execute_mysql_query, update_last_made
+
+# Fixed date written into Last_Made for every existing meal
 # This ensures the column has valid data for all existing meals
-sql = "UPDATE MealsTable SET Last_Made = %s WHERE Name = %s"
-for name in meals:
-    cur.execute(sql, ("2021-04-23", name))
+BACKFILL_DATE = "2021-04-23"
+
+
+def main():
+    # Create the Flask app so the shared database helpers can be used
+    app = create_app()
+    with app.app_context():
+        # Fetch the names of all meals currently stored in the table
+        rows = execute_mysql_query("SELECT Name FROM MealsTable;", fetch="all") or []
+        meals = [r["Name"] for r in rows]
+
+        # Update Last_Made in bulk: one UPDATE per chunk of names instead of one per meal
+        update_last_made(meals, BACKFILL_DATE)
+
+    # Tell running workers the catalogue has changed, so they drop their cached meals and pages
+    catalogue.invalidate()
+
+    # Print a confirmation message once the update is completed
+    print(" Last_Made backfilled.")
 
-# Save the changes and close the database connection
-cnx.commit()
-cur.close()
-cnx.close()
 
-# Print a confirmation message once the update is completed
-print(" Last_Made backfilled.")
+if __name__ == "__main__":
+    main()
@@ -1,66 +1,186 @@
-import json
+import argparse
+from datetime import timedelta
 from sqlalchemy import text
 from meal_app import create_app, db
-from meal_app.variables import (
-    fresh_ingredients as VAR_FRESH,
-    tinned_ingredients as VAR_TINNED,
-    dry_ingredients as VAR_DRY,
-    dairy_ingredients as VAR_DAIRY,
-)
-
-# These are the allowed tag names we want to make sure exist in the Tags table
+from meal_app.catalogue import catalogue
+from meal_app.utilities import INGREDIENT_BUCKETS, load_bucket, quantity_or_none
+
+# These are the standard tags we want to make sure exist in the Tags table (in Tag_Bit order)
 TAGS = ['Spring/Summer', 'Autumn/Winter', 'Quick/Easy', 'Special']
 
+# Name of this job's row in MaintenanceState (stores the high-water mark between runs)
+JOB_NAME = "backfill_catalog"
+
+# Number of changed meals processed per transaction
+BATCH_SIZE = 1000
+
+# How far behind the saved mark each run restarts. Updated_At is set when a statement
+# runs, not when it commits, so a write committed after a run has passed its timestamp
+# would otherwise be skipped for good; it must commit within this window to be seen.
+# Reprocessing a meal is idempotent, so the overlap only costs a few repeated rows.
+SAFETY_WINDOW = timedelta(minutes=5)
+
 # Insert the standard tags into the Tags catalog table if they are not already present
 def ensure_tags(conn):
-    for t in TAGS:
-        conn.execute(text("INSERT IGNORE INTO Tags (Tag_Name) VALUES (:t)"), {"t": t})
+    values = ", ".join(f"(:t{i}, {i})" for i in range(len(TAGS)))
+    conn.execute(
+        text(f"INSERT IGNORE INTO Tags (Tag_Name, Tag_Bit) VALUES {values}"),
+        {f"t{i}": t for i, t in enumerate(TAGS)},
+    )
 
-# Insert an ingredient name into the Ingredients catalog table if it is valid and not already present
-def upsert_ingredient_name(conn, name: str):
-    if not name:
-        return
+# Read the (Updated_At, Meal_ID) position reached by the previous run
+def read_high_water_mark(conn):
+    row = conn.execute(
+        text("SELECT Last_Updated, Last_Meal_ID FROM MaintenanceState WHERE Job_Name = :job"),
+        {"job": JOB_NAME},
+    ).first()
+    if row is None or row[0] is None:
+        return None
+    return row[0], row[1] or 0
+
+# Store the position reached so the next run starts after it
+def write_high_water_mark(conn, updated_at, meal_id):
     conn.execute(
-        text("INSERT IGNORE INTO Ingredients (Ingredient_Name) VALUES (:n)"),
-        {"n": name},
+        text("""
+        INSERT INTO MaintenanceState (Job_Name, Last_Updated, Last_Meal_ID)
+        VALUES (:job, :updated_at, :meal_id)
+        ON DUPLICATE KEY UPDATE Last_Updated = VALUES(Last_Updated), Last_Meal_ID = VALUES(Last_Meal_ID)
+        """),
+        {"job": JOB_NAME, "updated_at": updated_at, "meal_id": meal_id},
     )
 
-# Take one ingredient bucket (fresh/tinned/dry/dairy) and extract ingredient names from it
-# The bucket may come as a JSON string or a Python dictionary depending on how it was stored/read
-def process_bucket(conn, bucket):
-    if not bucket:
-        return
-    if isinstance(bucket, str):
-        try:
-            data = json.loads(bucket)
-        except Exception:
-            data = {}
-    elif isinstance(bucket, dict):
-        data = bucket
+# Fetch the next batch of meals changed after the given (Updated_At, Meal_ID) position
+# Uses the (Updated_At, Meal_ID) index, so each batch is a range read rather than a table scan
+def fetch_changed_meals(conn, mark):
+    columns = "Meal_ID, Updated_At, " + ", ".join(INGREDIENT_BUCKETS)
+    if mark is None:
+        query = f"SELECT {columns} FROM MealsTable ORDER BY Updated_At, Meal_ID LIMIT :limit"
+        params = {"limit": BATCH_SIZE}
     else:
-        data = {}
-    for name in data.keys():
-        upsert_ingredient_name(conn, name)
+        query = f"""
+        SELECT {columns} FROM MealsTable
+        WHERE Updated_At > :updated_at OR (Updated_At = :updated_at AND Meal_ID > :meal_id)
+        ORDER BY Updated_At, Meal_ID
+        LIMIT :limit
+        """
+        params = {"updated_at": mark[0], "meal_id": mark[1], "limit": BATCH_SIZE}
+    return conn.execute(text(query), params).mappings().all()
+
+# Add any ingredient names not seen before with one multi-row INSERT IGNORE,
+# then record their IDs in the in-memory name -> ID map
+def add_new_ingredients(conn, names, ingredient_ids):
+    new_names = sorted({n for n in names if n.casefold() not in ingredient_ids})
+    if not new_names:
+        return
+    params = {f"n{i}": n for i, n in enumerate(new_names)}
+    values = ", ".join(f"(:n{i})" for i in range(len(new_names)))
+    conn.execute(text(f"INSERT IGNORE INTO Ingredients (Ingredient_Name) VALUES {values}"), params)
+
+    placeholders = ", ".join(f":n{i}" for i in range(len(new_names)))
+    rows = conn.execute(
+        text(f"SELECT Ingredient_ID, Ingredient_Name FROM Ingredients WHERE Ingredient_Name IN ({placeholders})"),
+        params,
+    ).fetchall()
+    for ingredient_id, name in rows:
+        ingredient_ids[name.casefold()] = ingredient_id
+
+# Replace the MealIngredients rows for one batch of meals
+def write_meal_ingredients(conn, meals, ingredient_ids):
+    meal_params = {f"m{i}": m["Meal_ID"] for i, m in enumerate(meals)}
+    placeholders = ", ".join(f":{key}" for key in meal_params)
+    conn.execute(text(f"DELETE FROM MealIngredients WHERE Meal_ID IN ({placeholders})"), meal_params)
+
+    mapping_rows = []
+    for m in meals:
+        for category in INGREDIENT_BUCKETS:
+            for name, quantity in load_bucket(m.get(category)).items():
+                ingredient_id = ingredient_ids.get(name.casefold()) if name else None
+                if ingredient_id is None:
+                    continue
+                mapping_rows.append({
+                    "meal_id": m["Meal_ID"],
+                    "ingredient_id": ingredient_id,
+                    "category": category,
+                    "quantity": quantity_or_none(quantity),
+                })
+
+    # Insert the batch's mapping with one executemany
+    if mapping_rows:
+        conn.execute(
+            text("""
+            INSERT IGNORE INTO MealIngredients (Meal_ID, Ingredient_ID, Category, Quantity)
+            VALUES (:meal_id, :ingredient_id, :category, :quantity)
+            """),
+            mapping_rows,
+        )
+
+# Remove mapping rows whose meal no longer exists (meals deleted outside the app, or a truncated table)
+# The app's own delete path removes a meal's rows itself, so this full anti-join only runs with --full
+def remove_orphaned_mappings(conn):
+    conn.execute(text("""
+        DELETE mi FROM MealIngredients mi
+        LEFT JOIN MealsTable m ON m.Meal_ID = mi.Meal_ID
+        WHERE m.Meal_ID IS NULL
+    """))
+
+def backfill(full=False) -> int:
+    """
+    Refresh the Ingredients catalogue and MealIngredients mapping from MealsTable.
+    Only meals changed since the previous run are processed unless full=True, which also
+    removes mapping rows left behind by meals deleted outside the app.
+    Returns the number of meals processed.
+    """
+    with db.engine.begin() as conn:
+        # Make sure the Tags table has the standard set of tag values
+        ensure_tags(conn)
+        if full:
+            remove_orphaned_mappings(conn)
+
+        mark = None if full else read_high_water_mark(conn)
+        if mark is not None:
+            mark = (mark[0] - SAFETY_WINDOW, 0)
+
+        # Load the existing catalogue once so each name is only sent to MySQL when it is new
+        ingredient_ids = {
+            name.casefold(): ingredient_id
+            for ingredient_id, name in conn.execute(text("SELECT Ingredient_ID, Ingredient_Name FROM Ingredients"))
+        }
+
+    processed = 0
+    while True:
+        # Each batch (catalogue names, mapping rows and the new mark) commits together
+        with db.engine.begin() as conn:
+            meals = fetch_changed_meals(conn, mark)
+            if not meals:
+                break
+
+            names = [name for m in meals for category in INGREDIENT_BUCKETS for name in load_bucket(m.get(category)) if name]
+            add_new_ingredients(conn, names, ingredient_ids)
+            write_meal_ingredients(conn, meals, ingredient_ids)
+
+            last = meals[-1]
+            mark = (last["Updated_At"], last["Meal_ID"])
+            write_high_water_mark(conn, *mark)
+        processed += len(meals)
+        print(f" {processed} meals processed")
+    return processed
 
 def main():
+    parser = argparse.ArgumentParser(description="Refresh the Ingredients catalogue and MealIngredients mapping.")
+    parser.add_argument("--full", action="store_true",
+                        help="ignore the saved high-water mark, reprocess every meal and remove orphaned mapping rows")
+    args = parser.parse_args()
+
     # Create the Flask app so we can access the database through its application context
     app = create_app()
     with app.app_context():
-        # Open a transaction so all inserts happen safely and get committed automatically
-        with db.engine.begin() as conn:
-            # Make sure the Tags table has the standard set of tag values
-            ensure_tags(conn)
+        processed = backfill(full=args.full)
 
-            # Read all ingredient buckets from MealsTable and use them to populate Ingredients catalog
-            rows = conn.execute(text("SELECT Fresh_Ingredients, Tinned_Ingredients, Dry_Ingredients, Dairy_Ingredients FROM MealsTable")).mappings().all()
-            for r in rows:
-                process_bucket(conn, r.get("Fresh_Ingredients"))
-                process_bucket(conn, r.get("Tinned_Ingredients"))
-                process_bucket(conn, r.get("Dry_Ingredients"))
-                process_bucket(conn, r.get("Dairy_Ingredients"))
+    # Tell running workers the catalogue has changed, so they drop their cached meals and pages
+    catalogue.invalidate()
 
     # Print a confirmation once catalogs have been refreshed
-    print("✔ Catalogs refreshed: Ingredients, Tags.")
+    print(f"✔ Catalogs refreshed: Ingredients, Tags, MealIngredients ({processed} meals processed).")
 
 # Run the script only when executed directly (not when imported as a module)
 if __name__ == "__main__":
@@ -1,11 +1,21 @@
+import argparse
 import json
+import time
+from functools import lru_cache
 from pathlib import Path
 from sqlalchemy import text
 from meal_app import create_app, db
+from meal_app.catalogue import catalogue
 
 # Path to the JSON file that contains sample meal data
 JSON_PATH = Path(__file__).resolve().parent / "sample_database_data.json"
 
+# Number of meals written per multi-row INSERT (each batch is its own transaction)
+DEFAULT_BATCH_SIZE = 1000
+
+# Number of characters read from the input file at a time
+READ_CHUNK_SIZE = 1 << 16
+
 # SQL statement to create the MealsTable if it does not already exist
 # This table stores meal details, ingredients as JSON, and seasonal/tag flags
 CREATE_TABLE_SQL = """
@@ -21,24 +31,43 @@ CREATE TABLE IF NOT EXISTS MealsTable (
   Dry_Ingredients JSON NULL,
   Dairy_Ingredients JSON NULL,
   Last_Made DATE NULL,
-  Spring_Summer TINYINT(1) NOT NULL DEFAULT 0,
-  Autumn_Winter TINYINT(1) NOT NULL DEFAULT 0,
-  Quick_Easy   TINYINT(1) NOT NULL DEFAULT 0,
-  Special      TINYINT(1) NOT NULL DEFAULT 0,
-  UNIQUE KEY uk_meal_name (Name)
+  Tags_Mask    INT UNSIGNED NOT NULL DEFAULT 0,
+  Updated_At   TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+  Page_Number  INT AS (IF(Page REGEXP '^[0-9]{1,9}$', CAST(Page AS SIGNED), NULL)) STORED,
+  UNIQUE KEY uk_meal_name (Name),
+  KEY idx_updated_at (Updated_At, Meal_ID),
+  KEY idx_book_page (Book, Page_Number),
+  KEY idx_staple_name (Staple, Name),
+  KEY idx_last_made (Last_Made),
+  KEY idx_tags_made (Tags_Mask, Last_Made),
+  KEY idx_staple_made (Staple, Last_Made)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 """
 
-# SQL statement used to insert a new meal or update it if the name already exists
-INSERT_SQL = text("""
+# Columns written for every imported meal, in VALUES order
+INSERT_COLUMNS = [
+    "Name", "Staple", "Book", "Page", "Website",
+    "Fresh_Ingredients", "Tinned_Ingredients", "Dry_Ingredients", "Dairy_Ingredients",
+]
+
+
+@lru_cache(maxsize=4)
+def build_insert_sql(row_count):
+    """
+    Build a multi-row INSERT for `row_count` meals.
+    Existing meals with the same name are updated in place (upsert).
+    """
+    values = ",\n".join(
+        "(" + ", ".join(f":{column}_{i}" for column in INSERT_COLUMNS) + ", NULL, 0)"
+        for i in range(row_count)
+    )
+    return text(f"""
 INSERT INTO MealsTable
   (Name, Staple, Book, Page, Website,
    Fresh_Ingredients, Tinned_Ingredients, Dry_Ingredients, Dairy_Ingredients,
-   Last_Made, Spring_Summer, Autumn_Winter, Quick_Easy, Special)
+   Last_Made, Tags_Mask)
 VALUES
-  (:Name, :Staple, :Book, :Page, :Website,
-   :Fresh_Ingredients, :Tinned_Ingredients, :Dry_Ingredients, :Dairy_Ingredients,
-   NULL, 0, 0, 0, 0)
+{values}
 ON DUPLICATE KEY UPDATE
   Staple=VALUES(Staple),
   Book=VALUES(Book),
@@ -50,42 +79,162 @@ ON DUPLICATE KEY UPDATE
   Dairy_Ingredients=VALUES(Dairy_Ingredients);
 """)
 
+
+def iter_json_array(path: Path):
+    """
+    Yield the objects of a top-level JSON array one at a time.
+    The file is read in fixed-size chunks, so memory use does not grow with the file size.
+    """
+    decoder = json.JSONDecoder()
+    with path.open("r", encoding="utf-8") as f:
+        buf = ""
+        pos = 0
+        started = False
+        while True:
+            # Skip whitespace and separators, reading more of the file when the buffer runs out
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buf):
+                chunk = f.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    return
+                buf, pos = buf[pos:] + chunk, 0
+                continue
+
+            if not started:
+                if buf[pos] != "[":
+                    raise ValueError(f"{path} does not contain a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buf[pos] == "]":
+                return
+
+            # Decode the next object; if it is cut off at the end of the buffer, read more and retry
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                chunk = f.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    raise
+                buf, pos = buf[pos:] + chunk, 0
+                continue
+            yield obj
+            pos = end
+
+
+def iter_json_lines(path: Path):
+    """Yield one meal per line from a newline-delimited JSON (.ndjson / .jsonl) file."""
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def iter_meals(path: Path):
+    # Pick the streaming parser that matches the input file format
+    if path.suffix.lower() in (".ndjson", ".jsonl"):
+        return iter_json_lines(path)
+    return iter_json_array(path)
+
+
+def meal_params(row, i) -> dict:
+    """Build the bound parameters for one meal at position `i` of a batch."""
+    return {
+        f"Name_{i}": row.get("Name", ""),
+        f"Staple_{i}": row.get("Staple", ""),
+        f"Book_{i}": row.get("Book", ""),
+        f"Page_{i}": row.get("Page", ""),
+        f"Website_{i}": row.get("Website", ""),
+        f"Fresh_Ingredients_{i}": json.dumps(row.get("Fresh_Ingredients", {})),
+        f"Tinned_Ingredients_{i}": json.dumps(row.get("Tinned_Ingredients", {})),
+        f"Dry_Ingredients_{i}": json.dumps(row.get("Dry_Ingredients", {})),
+        f"Dairy_Ingredients_{i}": json.dumps(row.get("Dairy_Ingredients", {})),
+    }
+
+
+def write_batch(batch) -> None:
+    # Insert or update the whole batch with one statement inside its own transaction
+    params = {}
+    for i, row in enumerate(batch):
+        params.update(meal_params(row, i))
+    with db.engine.begin() as conn:
+        conn.execute(build_insert_sql(len(batch)), params)
+
+
+def import_meals(path: Path, batch_size=DEFAULT_BATCH_SIZE, upsert=False) -> int:
+    """
+    Stream meals from `path` into MealsTable and return the number of meals written.
+
+    upsert=False empties MealsTable first (the original sample-data behaviour);
+    upsert=True keeps existing rows and inserts or updates meals by name.
+    """
+    with db.engine.begin() as conn:
+        # Create the MealsTable if it does not already exist
+        conn.execute(text(CREATE_TABLE_SQL))
+
+        # Remove any existing rows so only the imported data is stored
+        if not upsert:
+            conn.execute(text("TRUNCATE TABLE MealsTable"))
+
+    started = time.perf_counter()
+    total = 0
+    batch = []
+    for row in iter_meals(path):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            write_batch(batch)
+            total += len(batch)
+            batch = []
+            report_progress(total, started)
+    if batch:
+        write_batch(batch)
+        total += len(batch)
+        report_progress(total, started)
+    return total
+
+
+def report_progress(total, started) -> None:
+    # Print the running total and throughput after each batch
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    print(f" {total} meals written ({total / elapsed:.0f} meals/s)")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Import meals into MealsTable.")
+    parser.add_argument("path", nargs="?", type=Path, default=JSON_PATH,
+                        help="JSON array or NDJSON (.ndjson/.jsonl) file of meals (default: sample data)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="meals per multi-row INSERT and transaction")
+    parser.add_argument("--upsert", action="store_true",
+                        help="keep existing meals and insert/update by name instead of truncating the table")
+    return parser.parse_args()
+
+
 def main():
-    # Check that the sample JSON file exists before continuing
-    if not JSON_PATH.exists():
-        raise FileNotFoundError(f"Could not find JSON file at: {JSON_PATH}")
+    args = parse_args()
 
-    # Load meal data from the JSON file
-    data = json.loads(JSON_PATH.read_text(encoding="utf-8"))
+    # Check that the input file exists before continuing
+    if not args.path.exists():
+        raise FileNotFoundError(f"Could not find JSON file at: {args.path}")
 
     # Create the Flask application so database access works correctly
     app = create_app()
     with app.app_context():
-        # Create the MealsTable if it does not already exist
-        with db.engine.begin() as conn:
-            conn.execute(text(CREATE_TABLE_SQL))
-
-            # Remove any existing rows so only the current sample data is stored
-            conn.execute(text("TRUNCATE TABLE MealsTable"))
+        started = time.perf_counter()
+        total = import_meals(args.path, batch_size=max(1, args.batch_size), upsert=args.upsert)
+        elapsed = time.perf_counter() - started
 
-        # Insert or update each meal from the JSON file
-        with db.engine.begin() as conn:
-            for row in data:
-                params = {
-                    "Name": row.get("Name", ""),
-                    "Staple": row.get("Staple", ""),
-                    "Book": row.get("Book", ""),
-                    "Page": row.get("Page", ""),
-                    "Website": row.get("Website", ""),
-                    "Fresh_Ingredients": json.dumps(row.get("Fresh_Ingredients", {})),
-                    "Tinned_Ingredients": json.dumps(row.get("Tinned_Ingredients", {})),
-                    "Dry_Ingredients": json.dumps(row.get("Dry_Ingredients", {})),
-                    "Dairy_Ingredients": json.dumps(row.get("Dairy_Ingredients", {})),
-                }
-                conn.execute(INSERT_SQL, params)
+    # Tell running workers the catalogue has changed, so they drop their cached meals and pages
+    catalogue.invalidate()
 
     # Print confirmation once all data has been inserted successfully
-    print(" Imported sample data into MealsTable.")
+    print(f" Imported {total} meals into MealsTable in {elapsed:.1f}s.")
+    if args.upsert:
+        print(" Run backfill_catalog.py to update the Ingredients catalogue and MealIngredients mapping.")
+    else:
+        print(" Run backfill_catalog.py --full to rebuild the Ingredients catalogue and MealIngredients mapping.")
 
 if __name__ == "__main__":
     main()
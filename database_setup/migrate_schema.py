@@ -0,0 +1,133 @@
+from sqlalchemy import text
+from meal_app import create_app, db
+from meal_app.catalogue import catalogue
+
+# Columns added to MealsTable after its original CREATE TABLE
+# Each entry is applied only if the column is missing, so the script can be re-run safely
+MEALS_TABLE_COLUMNS = {
+    # Row modification time, used as the high-water mark by backfill_catalog.py
+    "Updated_At": "ADD COLUMN Updated_At TIMESTAMP(6) NOT NULL "
+                  "DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)",
+    # Integer copy of Page for index-backed Book/Page ordering (NULL when Page is not a number)
+    "Page_Number": "ADD COLUMN Page_Number INT "
+                   "AS (IF(Page REGEXP '^[0-9]{1,9}$', CAST(Page AS SIGNED), NULL)) STORED",
+    # One bit per tag (the tag's Tags.Tag_Bit); replaces the per-tag flag columns
+    "Tags_Mask": "ADD COLUMN Tags_Mask INT UNSIGNED NOT NULL DEFAULT 0",
+}
+
+# Columns added to the Tags table, applied only if the column is missing
+TAGS_TABLE_COLUMNS = {
+    # Which bit of MealsTable.Tags_Mask the tag owns
+    "Tag_Bit": "ADD COLUMN Tag_Bit TINYINT UNSIGNED NULL UNIQUE",
+}
+
+# Number of bits in MealsTable.Tags_Mask
+TAGS_MASK_BITS = 32
+
+# Secondary indexes added to MealsTable, applied only if the index is missing
+MEALS_TABLE_INDEXES = {
+    "idx_updated_at": "ADD KEY idx_updated_at (Updated_At, Meal_ID)",
+    # Keyset pagination orders for the List Meals page (Meal_ID is appended implicitly by InnoDB)
+    "idx_book_page": "ADD KEY idx_book_page (Book, Page_Number)",
+    "idx_staple_name": "ADD KEY idx_staple_name (Staple, Name)",
+    "idx_last_made": "ADD KEY idx_last_made (Last_Made)",
+    # Tag filters (Tags_Mask IN (...)) and Inspire Me candidate pools, ordered by when last made
+    "idx_tags_made": "ADD KEY idx_tags_made (Tags_Mask, Last_Made)",
+    "idx_staple_made": "ADD KEY idx_staple_made (Staple, Last_Made)",
+}
+
+# Indexes on the old per-tag flag columns, dropped once idx_tags_made replaces them
+OBSOLETE_MEALS_TABLE_INDEXES = [
+    "idx_spring_summer_made",
+    "idx_autumn_winter_made",
+    "idx_quick_easy_made",
+    "idx_special_made",
+]
+
+
+def existing_columns(conn, table="MealsTable") -> set:
+    rows = conn.execute(text("""
+        SELECT COLUMN_NAME FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table
+    """), {"table": table}).fetchall()
+    return {r[0] for r in rows}
+
+
+def existing_indexes(conn) -> set:
+    rows = conn.execute(text("""
+        SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'MealsTable'
+    """)).fetchall()
+    return {r[0] for r in rows}
+
+
+def assign_tag_bits(conn) -> None:
+    """Give every tag without a Tag_Bit the lowest free bit, oldest tag first."""
+    rows = conn.execute(text("SELECT Tag_ID, Tag_Name, Tag_Bit FROM Tags ORDER BY Tag_ID")).fetchall()
+    taken = {r[2] for r in rows if r[2] is not None}
+    free = (bit for bit in range(TAGS_MASK_BITS) if bit not in taken)
+    for tag_id, name, bit in rows:
+        if bit is not None:
+            continue
+        bit = next(free, None)
+        if bit is None:
+            print(f" No free Tags_Mask bit for tag {name!r}; it will not be used")
+            continue
+        conn.execute(text("UPDATE Tags SET Tag_Bit = :bit WHERE Tag_ID = :id"), {"bit": bit, "id": tag_id})
+        print(f" Assigned bit {bit} to tag {name!r}")
+
+
+def backfill_tags_mask(conn, columns) -> None:
+    """Set Tags_Mask from the old flag columns (Quick_Easy for "Quick/Easy", and so on)."""
+    terms = []
+    for name, bit in conn.execute(text("SELECT Tag_Name, Tag_Bit FROM Tags WHERE Tag_Bit IS NOT NULL")):
+        column = name.replace('/', '_')
+        if column in columns:
+            terms.append(f"IF({column} <> 0, {1 << bit}, 0)")
+    if terms:
+        result = conn.execute(text(f"UPDATE MealsTable SET Tags_Mask = {' | '.join(terms)}"))
+        print(f" Backfilled Tags_Mask for {result.rowcount} meals")
+
+
+def main():
+    # Create the Flask app so we can access the database through its application context
+    app = create_app()
+    with app.app_context():
+        with db.engine.begin() as conn:
+            # Add any missing columns first, since the indexes may depend on them
+            columns = existing_columns(conn)
+            for name, ddl in MEALS_TABLE_COLUMNS.items():
+                if name not in columns:
+                    conn.execute(text(f"ALTER TABLE MealsTable {ddl}"))
+                    print(f" Added column MealsTable.{name}")
+
+            tag_columns = existing_columns(conn, "Tags")
+            for name, ddl in TAGS_TABLE_COLUMNS.items():
+                if name not in tag_columns:
+                    conn.execute(text(f"ALTER TABLE Tags {ddl}"))
+                    print(f" Added column Tags.{name}")
+            assign_tag_bits(conn)
+
+            # Copy the old flags into the mask once, when the mask column is first created
+            if "Tags_Mask" not in columns:
+                backfill_tags_mask(conn, columns)
+
+            indexes = existing_indexes(conn)
+            for name, ddl in MEALS_TABLE_INDEXES.items():
+                if name not in indexes:
+                    conn.execute(text(f"ALTER TABLE MealsTable {ddl}"))
+                    print(f" Added index MealsTable.{name}")
+            for name in OBSOLETE_MEALS_TABLE_INDEXES:
+                if name in indexes:
+                    conn.execute(text(f"ALTER TABLE MealsTable DROP KEY {name}"))
+                    print(f" Dropped index MealsTable.{name}")
+
+    # Tell running workers the catalogue has changed, so they drop their cached meals and pages
+    catalogue.invalidate()
+
+    print("✔ MealsTable schema is up to date.")
+
+
+# Run the script only when executed directly (not when imported as a module)
+if __name__ == "__main__":
+    main()
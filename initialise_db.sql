@@ -1,4 +1,4 @@
--- initialise_db.sql  (3-table version)
+-- initialise_db.sql  (5-table version)
 
 -- MealsTable is created by database_setup/import_sample_data.py
 
@@ -8,16 +8,36 @@ CREATE TABLE IF NOT EXISTS Ingredients (
   Ingredient_Name VARCHAR(150) NOT NULL UNIQUE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
--- 2) Tags catalogue (just the 4 you use)
+-- 2) Tags catalogue; each tag owns one bit (Tag_Bit) of MealsTable.Tags_Mask
 CREATE TABLE IF NOT EXISTS Tags (
   Tag_ID   INT AUTO_INCREMENT PRIMARY KEY,
-  Tag_Name VARCHAR(100) NOT NULL UNIQUE
+  Tag_Name VARCHAR(100) NOT NULL UNIQUE,
+  Tag_Bit  TINYINT UNSIGNED NULL UNIQUE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
--- Seed the four flags as tags (idempotent)
-INSERT IGNORE INTO Tags (Tag_Name)
-VALUES ('Spring/Summer'), ('Autumn/Winter'), ('Quick/Easy'), ('Special');
+-- Seed the four standard tags (idempotent); a new tag only needs the next free Tag_Bit
+INSERT IGNORE INTO Tags (Tag_Name, Tag_Bit)
+VALUES ('Spring/Summer', 0), ('Autumn/Winter', 1), ('Quick/Easy', 2), ('Special', 3);
 
--- If you had the junction tables before, drop them:
-DROP TABLE IF EXISTS MealIngredients;
+-- 3) Meal -> ingredient mapping (one row per ingredient used by a meal)
+-- Kept in sync by the add/edit/delete views; rebuild with database_setup/backfill_catalog.py
+CREATE TABLE IF NOT EXISTS MealIngredients (
+  Meal_ID       INT NOT NULL,
+  Ingredient_ID INT NOT NULL,
+  Category      VARCHAR(30) NOT NULL,
+  Quantity      DECIMAL(10,2) NULL,
+  PRIMARY KEY (Meal_ID, Category, Ingredient_ID),
+  KEY idx_ingredient_category (Ingredient_ID, Category, Meal_ID)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 4) Progress markers for incremental maintenance scripts (e.g. backfill_catalog.py)
+CREATE TABLE IF NOT EXISTS MaintenanceState (
+  Job_Name     VARCHAR(64) PRIMARY KEY,
+  Last_Updated TIMESTAMP(6) NULL,
+  Last_Meal_ID INT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Columns and indexes added to MealsTable later are applied by database_setup/migrate_schema.py
+
+-- If you had the old tag junction table before, drop it:
 DROP TABLE IF EXISTS MealTags;
@@ -16,6 +16,75 @@ def create_app():
     # Initialize Flask extensions
     db.init_app(app)
 
+    # Keep session data on the server so large meal plans never travel in the cookie
+    from .sessions import init_app as init_sessions
+    init_sessions(app)
+
+    # Configure the shared in-process meal catalogue cache
+    from .catalogue import catalogue
+    catalogue.init_app(app)
+
+    # Tag lookup tables for the Tags_Mask bitmask (re-read when the catalogue changes)
+    from .tags import tag_catalogue
+    tag_catalogue.init_app(app)
+
+    # Configure the in-memory ingredient vocabulary served to the search page
+    from .vocabulary import vocabulary
+    vocabulary.init_app(app)
+
+    # Configure the pantry search index (rebuilt when the catalogue changes)
+    from .pantry import pantry_index
+    pantry_index.init_app(app)
+
+    # Recency-weighted suggestion pools for the Inspire Me page
+    from .inspiration import inspiration
+    inspiration.init_app(app)
+
+    # Automatic meal-plan generator (rebuilt when the catalogue changes)
+    from .meal_plans.generator import plan_generator
+    plan_generator.init_app(app)
+
+    # Saved meal plans live in one sharded, manifest-indexed store
+    from .meal_plans.store import plan_store
+    plan_store.init_app(app)
+
+    # Rendered-page cache for meal details, the meal list and add confirmations
+    from .fragments import fragment_cache
+    fragment_cache.init_app(app)
+
+    # Background job queue for slow plan builds, exports and date updates (see /api/v1/jobs)
+    from .jobs import job_queue
+    job_queue.init_app(app)
+
+    # ETag salt for the conditional GET support on read-only pages
+    from .http_cache import init_app as init_http_cache
+    init_http_cache(app)
+
+    # Per-request query/render metrics and the /metrics route
+    from .metrics import init_app as init_metrics
+    init_metrics(app)
+
+    # Each request shares one connection and transaction (see utilities.get_connection)
+    from .utilities import finish_connection
+
+    @app.after_request
+    def commit_request_transaction(response):
+        # Commit before the response is sent so a redirect never reaches the next page ahead of the write
+        committed = response.status_code < 500
+        finish_connection(commit=committed)
+        # Only now that the write is committed, tell other workers the catalogue has changed
+        catalogue.publish()
+        vocabulary.finish(committed)
+        return response
+
+    @app.teardown_appcontext
+    def close_request_connection(exc):
+        # Roll back anything left open by an error (or commit work done outside a request)
+        finish_connection(commit=exc is None)
+        if exc is None:
+            catalogue.publish()
+        vocabulary.finish(exc is None)
+
     # Perform setup that requires the application context
     with app.app_context():
         # Register custom Jinja utilities and filters
@@ -40,6 +109,7 @@ def create_app():
         from .meal_plans.display import display
         from .meal_plans.load import load
         from .meal_plans.delete import delete
+        from .api.v1 import api_v1
 
         # Register each blueprint with the Flask app
         app.register_blueprint(home)
@@ -53,6 +123,7 @@ def create_app():
         app.register_blueprint(display)
         app.register_blueprint(load)
         app.register_blueprint(delete)
+        app.register_blueprint(api_v1)
 
         # Return the fully configured Flask application
         return app
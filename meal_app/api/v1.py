@@ -0,0 +1,466 @@
+import json
+from datetime import date, datetime, timezone
+from pathlib import Path
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context, url_for
+from sqlalchemy.exc import IntegrityError
+from ..catalogue import catalogue
+from ..http_cache import conditional, make_etag
+from ..jobs import FINISHED_STATES, QueueFull, job_queue
+from ..pantry import pantry_index
+from ..tags import tag_catalogue
+from ..utilities import INGREDIENT_BUCKETS
+from ..meals.add import insert_meal
+from ..meals.find import meal_validators
+from ..meals.list_meals import SORT_OPTIONS, DEFAULT_SORT, decode_cursor, encode_cursor, fetch_meal_page
+from ..meals.search import meals_with_ingredient
+from ..meal_plans.create import build_meal_plan
+from ..meal_plans.generator import plan_generator
+from ..meal_plans.display import save_meal_plan, shopping_list_csv, stamp_plan_dates
+from ..meal_plans.store import plan_store
+
+# Versioned JSON API: the same capabilities as the HTML pages, without forms or redirects
+api_v1 = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+def _json_value(value):
+    # Dates and datetimes are sent as ISO 8601 strings
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def meal_summary(row) -> dict:
+    """JSON form of one row of the meal list."""
+    return {
+        "id": row["Meal_ID"],
+        "name": row["Name"],
+        "staple": row["Staple"],
+        "book": row["Book"],
+        "page": row["Page_Number"],
+        "last_made": _json_value(row["Last_Made"]),
+    }
+
+
+def meal_detail(record) -> dict:
+    """JSON form of a full catalogue record."""
+    detail = {
+        "id": record["Meal_ID"],
+        "name": record["Name"],
+        "staple": record["Staple"],
+        "book": record["Book"],
+        "page": record["Page"],
+        "website": record["Website"],
+        "last_made": _json_value(record["Last_Made"]),
+        "updated_at": _json_value(record.get("Updated_At")),
+        "tags": record["Tags"],
+    }
+    for bucket in INGREDIENT_BUCKETS:
+        detail[bucket] = record[bucket]
+    return detail
+
+
+def error(message, status=400):
+    return jsonify({"error": message}), status
+
+
+@api_v1.route('/meals', methods=['GET'])
+@conditional()
+def list_meals():
+    """
+    One page of meals in the requested order.
+
+    Query: sort (book, name, staple, last_made), limit, after (cursor from "next").
+    With format=ndjson every meal from the cursor onwards is streamed as one JSON object
+    per line, page by page. (The format is chosen in the URL rather than the Accept
+    header so the page's ETag covers it.)
+    """
+    sort = request.args.get('sort', DEFAULT_SORT)
+    if sort not in SORT_OPTIONS:
+        return error(f"sort must be one of {', '.join(SORT_OPTIONS)}")
+    columns = SORT_OPTIONS[sort][1] + ["Meal_ID"]
+    after = request.args.get('after')
+    cursor_values = decode_cursor(after, len(columns))
+    if after and cursor_values is None:
+        return error("invalid cursor")
+
+    max_limit = current_app.config.get('API_MAX_PAGE_SIZE', 1000)
+    limit = request.args.get('limit', current_app.config.get('API_PAGE_SIZE', 100), type=int)
+    limit = max(1, min(limit, max_limit))
+
+    if request.args.get('format') == 'ndjson':
+        def generate(values):
+            # Walk the keyset pages so memory stays flat however many meals there are
+            while True:
+                rows, values = fetch_meal_page(sort, values, max_limit)
+                for row in rows:
+                    yield json.dumps(meal_summary(row), separators=(",", ":")) + "\n"
+                if values is None:
+                    return
+        return Response(stream_with_context(generate(cursor_values)), mimetype=NDJSON_MIMETYPE)
+
+    rows, next_values = fetch_meal_page(sort, cursor_values, limit)
+    return jsonify({
+        "meals": [meal_summary(row) for row in rows],
+        "next": encode_cursor(next_values) if next_values is not None else None,
+    })
+
+
+def _meal_detail_validators(meal):
+    # The JSON includes Last_Made, which date stamps change without moving Updated_At, so it
+    # joins the meal page's ETag and no Last-Modified is sent
+    found = meal_validators(meal)
+    record = catalogue.get_meal(meal)
+    if found is None or not record:
+        return found
+    return make_etag(found[0], _json_value(record["Last_Made"])), None
+
+
+@api_v1.route('/meals/<meal>', methods=['GET'])
+@conditional(_meal_detail_validators)
+def get_meal(meal):
+    record = catalogue.get_meal(meal)
+    if not record:
+        return error(f"No meal found with name {meal}", 404)
+    return jsonify(meal_detail(record))
+
+
+def _parse_new_meal(payload):
+    # Validate a meal sent to POST /meals; returns (name, staple, buckets, tags) or an error message
+    if not isinstance(payload, dict):
+        return "expected a JSON object"
+    name = payload.get("name")
+    staple = payload.get("staple")
+    if not isinstance(name, str) or not name.strip() or not isinstance(staple, str) or not staple.strip():
+        return "name and staple are required"
+
+    tags = payload.get("tags", [])
+    labels = tag_catalogue.labels()
+    if not isinstance(tags, list) or any(tag not in labels for tag in tags):
+        return f"tags must be a list drawn from {', '.join(labels)}"
+
+    buckets = {}
+    for bucket in INGREDIENT_BUCKETS:
+        items = payload.get(bucket, {})
+        if not isinstance(items, dict) or not all(
+            isinstance(k, str) and isinstance(v, (str, int, float)) and not isinstance(v, bool)
+            for k, v in items.items()
+        ):
+            return f"{bucket} must map ingredient names to quantities"
+        # Stored the same way as the Add Meal form stores them: quantities as strings
+        buckets[bucket] = json.dumps({k: str(v) for k, v in items.items() if str(v) != ""})
+    return name.strip(), staple.strip(), buckets, tag_catalogue.mask(tags)
+
+
+@api_v1.route('/meals', methods=['POST'])
+def create_meal():
+    """Add a meal: {"name", "staple", "tags": [...], "Fresh_Ingredients": {name: quantity}, ...}."""
+    parsed = _parse_new_meal(request.get_json(silent=True))
+    if isinstance(parsed, str):
+        return error(parsed)
+    name, staple, buckets, tags = parsed
+    if catalogue.get_meal(name):
+        return error(f"A meal called {name} already exists", 409)
+
+    try:
+        insert_meal(name, staple, buckets, tags)
+    except IntegrityError:
+        # Lost a race with another request adding the same name (uk_meal_name)
+        return error(f"A meal called {name} already exists", 409)
+    record = catalogue.get_meal(name)
+    response = jsonify(meal_detail(record))
+    response.status_code = 201
+    response.headers["Location"] = url_for('api_v1.get_meal', meal=record["Name"])
+    return response
+
+
+@api_v1.route('/search', methods=['GET'])
+@conditional()
+def search():
+    """Meals using one ingredient: ingredient, optional category (e.g. Fresh_Ingredients)."""
+    ingredient = request.args.get('ingredient', '').strip()
+    category = request.args.get('category') or None
+    if not ingredient:
+        return error("ingredient is required")
+    if category is not None and category not in INGREDIENT_BUCKETS:
+        return error(f"category must be one of {', '.join(INGREDIENT_BUCKETS)}")
+    return jsonify({
+        "ingredient": ingredient,
+        "category": category,
+        "meals": meals_with_ingredient(ingredient, category),
+    })
+
+
+@api_v1.route('/pantry', methods=['GET'])
+@conditional()
+def pantry():
+    """Meals cookable from a pantry: pantry (repeated), mode (only or rank), max_missing, limit."""
+    selected = request.args.getlist('pantry')
+    mode = request.args.get('mode', 'only')
+    if mode not in ('only', 'rank'):
+        return error("mode must be only or rank")
+    max_limit = current_app.config.get('PANTRY_RESULT_LIMIT', 50)
+    limit = max(1, min(request.args.get('limit', max_limit, type=int), max_limit))
+    results = pantry_index.search(selected, mode=mode, max_missing=request.args.get('max_missing', type=int),
+                                  limit=limit) if selected else []
+    return jsonify({"pantry": selected, "mode": mode, "meals": results})
+
+
+def _parse_slots(payload):
+    # Accept either parallel "meals"/"quantities" arrays (compact) or a list of {"meal", "quantity"} slots
+    if "slots" in payload:
+        slots = payload["slots"]
+        if not isinstance(slots, list) or not all(isinstance(s, dict) for s in slots):
+            return "slots must be a list of {\"meal\", \"quantity\"} objects"
+        meals = [s.get("meal") for s in slots]
+        quantities = [s.get("quantity", 1) for s in slots]
+    else:
+        meals = payload.get("meals")
+        quantities = payload.get("quantities") or [1] * len(meals or [])
+        if not isinstance(meals, list) or not isinstance(quantities, list) or len(quantities) != len(meals):
+            return "meals must be a list, with quantities of the same length"
+
+    if not all(isinstance(m, str) and m.strip() for m in meals):
+        return "every slot needs a meal name"
+    if not all(isinstance(q, int) and not isinstance(q, bool) and q > 0 for q in quantities):
+        return "quantities must be positive integers"
+    return [m.strip() for m in meals], quantities
+
+
+def _parse_plan_request(payload):
+    # Validate a plan body (see build_plan); returns (meals, quantities, extras) or (message, status)
+    if not isinstance(payload, dict):
+        return "expected a JSON object", 400
+    parsed = _parse_slots(payload)
+    if isinstance(parsed, str):
+        return parsed, 400
+    meals, quantities = parsed
+
+    max_slots = current_app.config.get('API_MAX_PLAN_SLOTS', 5000)
+    if len(meals) > max_slots:
+        return f"a plan can have at most {max_slots} slots", 413
+    extras = payload.get("extras", [])
+    if not isinstance(extras, list) or not all(isinstance(e, str) for e in extras):
+        return "extras must be a list of strings", 400
+    return meals, quantities, extras
+
+
+def _plan_body(meals, quantities, extras, save=None) -> dict:
+    # Build (and optionally save) a plan; raises ValueError when none of the meals exist
+    plan = build_meal_plan(meals, quantities, extras)
+    if plan is None:
+        raise ValueError("none of the meals exist")
+
+    known = {m.casefold() for m in plan["Meal_List"]}
+    body = {
+        "plan": plan,
+        "unknown_meals": list(dict.fromkeys(m for m in meals if m.casefold() not in known)),
+    }
+    if save:
+        body["saved_as"] = Path(save_meal_plan(plan, str(save))).stem
+    return body
+
+
+@api_v1.route('/plans', methods=['POST'])
+def build_plan():
+    """
+    Build a meal plan and return its shopping list.
+
+    Body: {"meals": [...], "quantities": [...]} or {"slots": [{"meal", "quantity"}, ...]},
+    plus optional "extras": [...] and "save": "<plan name>" to store the plan as well.
+    Large plans are better submitted as a build_plan job (POST /jobs).
+    """
+    payload = request.get_json(silent=True)
+    parsed = _parse_plan_request(payload)
+    if len(parsed) == 2:
+        return error(*parsed)
+    try:
+        return jsonify(_plan_body(*parsed, save=payload.get("save")))
+    except ValueError as exc:
+        return error(str(exc), 422)
+
+
+@api_v1.route('/plans/generate', methods=['POST'])
+def generate_plan():
+    """
+    Let the generator pick the meals for a plan, then build it like POST /plans.
+
+    Body: {"slots": 7, "tags": [...], "not_made_days": 14, "max_per_staple": 2}, plus the
+    optional "extras" and "save" of POST /plans. The response adds "generator" with the
+    number of distinct and shared shopping-list items and how many meals were considered.
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return error("expected a JSON object")
+    max_slots = current_app.config.get('API_MAX_PLAN_SLOTS', 5000)
+    slots = payload.get("slots", 7)
+    tags = payload.get("tags", [])
+    options = {"not_made_days": payload.get("not_made_days"), "max_per_staple": payload.get("max_per_staple")}
+    if not isinstance(slots, int) or isinstance(slots, bool) or not 1 <= slots <= max_slots:
+        return error(f"slots must be a whole number from 1 to {max_slots}")
+    if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+        return error(f"tags must be a list drawn from {', '.join(tag_catalogue.labels())}")
+    for key, value in options.items():
+        if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < 0):
+            return error(f"{key} must be a non-negative whole number")
+    extras = payload.get("extras", [])
+    if not isinstance(extras, list) or not all(isinstance(e, str) for e in extras):
+        return error("extras must be a list of strings")
+
+    try:
+        selection = plan_generator.generate(slots, tags=tags, **options)
+    except ValueError as exc:
+        # An unknown tag
+        return error(str(exc))
+    if selection is None:
+        return error("no meals match the filters", 422)
+    meals = selection.pop("Meal_List")
+    try:
+        body = _plan_body(meals, [1] * len(meals), extras, save=payload.get("save"))
+    except ValueError as exc:
+        return error(str(exc), 422)
+    body["generator"] = selection
+    return jsonify(body)
+
+
+# Background jobs: the slow plan operations, run off the request thread (see meal_app/jobs.py)
+
+@job_queue.handler("build_plan")
+def build_plan_job(params) -> dict:
+    """Same body and result as POST /plans."""
+    return _plan_body(params["meals"], params["quantities"], params["extras"], save=params.get("save"))
+
+
+@job_queue.handler("export_plan")
+def export_plan_job(params) -> dict:
+    """The shopping list of a saved plan ("plan": name), or of a plan body, as CSV."""
+    if "plan" in params:
+        plan = plan_store.load(params["plan"])
+        if plan is None:
+            raise ValueError(f"No saved plan called {params['plan']}")
+        filename = params["plan"]
+    else:
+        plan = build_meal_plan(params["meals"], params["quantities"], params["extras"])
+        if plan is None:
+            raise ValueError("none of the meals exist")
+        filename = "Meal_Plan"
+    return {"filename": f"{filename}.csv", "csv": shopping_list_csv(plan)}
+
+
+@job_queue.handler("update_dates")
+def update_dates_job(params) -> dict:
+    """Set Last_Made for the given meals, like Update Dates on the display page."""
+    stamp_plan_dates(params["meals"], params.get("date"))
+    return {"meals": params["meals"], "date": params.get("date") or date.today().isoformat()}
+
+
+def _check_job_params(kind, params):
+    # Validate a job's params before it is queued; returns the params to store or (message, status)
+    if kind not in job_queue.kinds():
+        return f"kind must be one of {', '.join(job_queue.kinds())}", 400
+    if not isinstance(params, dict):
+        return "params must be a JSON object", 400
+    if kind == "export_plan" and "plan" in params:
+        if not isinstance(params["plan"], str) or not params["plan"]:
+            return "plan must be a saved plan name", 400
+        return {"plan": params["plan"]}
+    if kind in ("build_plan", "export_plan"):
+        parsed = _parse_plan_request(params)
+        if len(parsed) == 2:
+            return parsed
+        meals, quantities, extras = parsed
+        checked = {"meals": meals, "quantities": quantities, "extras": extras}
+        if kind == "build_plan" and params.get("save"):
+            checked["save"] = str(params["save"])
+        return checked
+    # update_dates
+    meals = params.get("meals")
+    if not isinstance(meals, list) or not meals or not all(isinstance(m, str) and m for m in meals):
+        return "meals must be a non-empty list of meal names", 400
+    stamp = params.get("date")
+    if stamp is not None:
+        try:
+            date.fromisoformat(stamp)
+        except (TypeError, ValueError):
+            return "date must be YYYY-MM-DD", 400
+    return {"meals": meals, "date": stamp}
+
+
+def _job_time(value):
+    return _json_value(datetime.fromtimestamp(value, timezone.utc)) if value is not None else None
+
+
+def job_status(job) -> dict:
+    """JSON form of a job record."""
+    body = {
+        "id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "error": job["error"],
+        "created_at": _job_time(job["created_at"]),
+        "started_at": _job_time(job["started_at"]),
+        "finished_at": _job_time(job["finished_at"]),
+        "status_url": url_for('api_v1.get_job', job_id=job["id"]),
+    }
+    if job["status"] == "done":
+        body["result_url"] = url_for('api_v1.get_job_result', job_id=job["id"])
+    return body
+
+
+@api_v1.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Queue a background job: {"kind": "build_plan" | "export_plan" | "update_dates", "params": {...}}.
+
+    build_plan takes the same body as POST /plans; export_plan takes a saved plan name
+    ("plan") or a plan body; update_dates takes "meals" and an optional "date". Answers
+    202 with the job's status URL, or 503 when this worker already has too many jobs queued.
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return error("expected a JSON object")
+    kind = payload.get("kind")
+    checked = _check_job_params(kind, payload.get("params", {}))
+    if isinstance(checked, tuple):
+        return error(*checked)
+
+    try:
+        job_id = job_queue.submit(kind, checked)
+    except QueueFull:
+        response, status = error("too many jobs are queued; try again shortly", 503)
+        response.headers["Retry-After"] = "5"
+        return response, status
+    response = jsonify(job_status(job_queue.get(job_id)))
+    response.status_code = 202
+    response.headers["Location"] = url_for('api_v1.get_job', job_id=job_id)
+    return response
+
+
+@api_v1.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """A job's status; with wait=<seconds> the request is held until the job finishes (long poll)."""
+    wait = request.args.get('wait', 0, type=float)
+    wait = max(0.0, min(wait, current_app.config.get('JOBS_MAX_WAIT', 30)))
+    job = job_queue.wait(job_id, wait) if wait else job_queue.get(job_id)
+    if job is None:
+        return error(f"No job with ID {job_id}", 404)
+    return jsonify(job_status(job))
+
+
+@api_v1.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """The result of a finished job; export_plan results are sent as a CSV download."""
+    job = job_queue.get(job_id, with_result=True)
+    if job is None:
+        return error(f"No job with ID {job_id}", 404)
+    if job["status"] not in FINISHED_STATES:
+        return error(f"job is still {job['status']}", 409)
+    if job["status"] != "done":
+        return error(f"job failed: {job['error']}", 409)
+
+    result = job["result"]
+    if job["kind"] == "export_plan":
+        return Response(result["csv"], mimetype="text/csv",
+                        headers={"Content-Disposition": f'attachment; filename="{result["filename"]}"'})
+    return jsonify(result)
@@ -0,0 +1,262 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from flask import g, has_app_context
+from .utilities import execute_mysql_query, load_bucket, in_clause, chunked, INGREDIENT_BUCKETS
+from .tags import tag_catalogue
+
+
+class CatalogueCache:
+    """
+    In-process cache of the meal catalogue.
+
+    Holds two kinds of entries:
+    - a summary of every meal name and its staple (used by the meal pickers)
+    - full meal records (source, tags and parsed ingredient buckets), kept in a
+      bounded LRU so memory use stays fixed however large the catalogue grows
+
+    Entries expire after a TTL, and the views that write to MealsTable call invalidate()
+    straight away. Writes are also published to other worker processes through a small
+    version file in the instance folder: its stamp changes after every committed write,
+    and a process that sees a new stamp drops its cached entries, so stale data does not
+    outlive the next request. The stamp also keys the HTTP validators in http_cache.py.
+    Returned records are shared between requests and must be treated as read-only.
+    """
+
+    def __init__(self, max_size=2048, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._summary = None
+        self._summary_loaded_at = 0.0
+        self._meals = OrderedDict()
+        # Bumped on every invalidation so derived in-memory structures can tell they are stale
+        self.version = 0
+        # Shared version file, and the stamp this process last synced with
+        self.version_path = None
+        self._seen_stamp = None
+
+    def init_app(self, app):
+        """Read cache sizing from the Flask config."""
+        self.max_size = app.config.get('CATALOGUE_CACHE_SIZE', self.max_size)
+        self.ttl = app.config.get('CATALOGUE_CACHE_TTL', self.ttl)
+        self.version_path = (app.config.get('CATALOGUE_VERSION_PATH')
+                             or os.path.join(app.instance_path, 'catalogue.version'))
+        self._seen_stamp = None
+        self._drop(None)
+
+    def _read_stamp(self) -> tuple[str, float]:
+        # The file is replaced on every publish, so its inode and mtime identify the version
+        try:
+            st = os.stat(self.version_path)
+        except FileNotFoundError:
+            self._write_stamp()
+            st = os.stat(self.version_path)
+        return f"{st.st_mtime_ns:x}-{st.st_ino:x}", st.st_mtime
+
+    def _write_stamp(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.version_path)), exist_ok=True)
+        tmp_path = f"{self.version_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(uuid.uuid4().hex)
+        os.replace(tmp_path, self.version_path)
+
+    def stamp(self) -> tuple[str, float]:
+        """
+        Return (token, modified time) of the catalogue-wide version shared by all processes.
+
+        If another process has published a write since this process last looked,
+        every cached entry is dropped first.
+        """
+        if self.version_path is None:
+            return "0", 0.0
+        token, modified = self._read_stamp()
+        with self._lock:
+            if token != self._seen_stamp:
+                if self._seen_stamp is not None:
+                    self._drop(None)
+                self._seen_stamp = token
+        return token, modified
+
+    def publish(self) -> None:
+        """
+        Tell other processes about this context's writes; called once its transaction has committed.
+
+        Inside an app context the entries invalidated during it are dropped again, since
+        another thread may have reloaded them from the database before the commit.
+        """
+        changed = False
+        if has_app_context():
+            changed = g.pop('catalogue_changed', False)
+            if changed is False:
+                return
+        if self.version_path is not None:
+            with self._lock:
+                self._write_stamp()
+                self._seen_stamp = self._read_stamp()[0]
+        if changed is not False:
+            # The version already moved on at invalidate(); bumping it again would make the
+            # vocabulary reload instead of applying this write's delta
+            self._drop(changed, bump_version=False)
+
+    def _expired(self, loaded_at) -> bool:
+        return (time.monotonic() - loaded_at) > self.ttl
+
+    def _load_summary(self) -> dict:
+        # Load every meal name with its staple in a single query
+        rows = execute_mysql_query("SELECT Name, Staple FROM MealsTable ORDER BY Name ASC;", fetch="all") or []
+        names = [r["Name"] for r in rows]
+
+        # Group names by staple, keeping alphabetical order within each group
+        staples = {}
+        for r in rows:
+            staples.setdefault(str(r.get("Staple") or ''), []).append(r["Name"])
+        return {"names": names, "staples": staples}
+
+    def _summary_data(self) -> dict:
+        self.stamp()
+        with self._lock:
+            if self._summary is not None and not self._expired(self._summary_loaded_at):
+                return self._summary
+
+        summary = self._load_summary()
+        with self._lock:
+            self._summary = summary
+            self._summary_loaded_at = time.monotonic()
+        return summary
+
+    def meal_names(self) -> list[str]:
+        """Return all meal names in alphabetical order."""
+        return self._summary_data()["names"]
+
+    def staples_dict(self) -> dict:
+        """Return {staple: [meal names]} for every staple in the catalogue."""
+        return self._summary_data()["staples"]
+
+    @staticmethod
+    def _build_record(row) -> dict:
+        # Convert a MealsTable row into a cache record with parsed buckets and tag labels
+        record = {
+            "Meal_ID": row.get("Meal_ID"),
+            "Name": row.get("Name"),
+            "Staple": row.get("Staple"),
+            "Book": row.get("Book"),
+            "Page": row.get("Page"),
+            "Website": row.get("Website"),
+            "Last_Made": row.get("Last_Made"),
+            "Updated_At": row.get("Updated_At"),
+            "Tags_Mask": int(row.get("Tags_Mask") or 0),
+        }
+        record["Tags"] = tag_catalogue.decode(record["Tags_Mask"])
+        for bucket in INGREDIENT_BUCKETS:
+            record[bucket] = load_bucket(row.get(bucket))
+        return record
+
+    def _store(self, name, record) -> None:
+        # Keyed on the casefolded name, as MySQL matches names case-insensitively: every
+        # spelling of a meal shares one entry, so invalidating any spelling drops it
+        key = name.casefold()
+        with self._lock:
+            self._meals[key] = (time.monotonic(), record)
+            self._meals.move_to_end(key)
+            # Evict the least recently used meals once the cache is full
+            while len(self._meals) > self.max_size:
+                self._meals.popitem(last=False)
+
+    def _cached(self, name):
+        key = name.casefold()
+        with self._lock:
+            entry = self._meals.get(key)
+            if entry is None:
+                return None
+            loaded_at, record = entry
+            if self._expired(loaded_at):
+                del self._meals[key]
+                return None
+            self._meals.move_to_end(key)
+            return record
+
+    def get_meal(self, name) -> dict | None:
+        """Return the cached record for one meal, loading it from the database on a miss."""
+        return self.get_meals([name]).get(name)
+
+    def get_meals(self, names) -> dict:
+        """
+        Return {name: record} for the requested meals.
+
+        Repeated names are looked up once. Cache misses are loaded together with one
+        IN (...) query per chunk of names instead of one query per meal.
+        Names that do not exist in MealsTable are left out of the result.
+        """
+        self.stamp()
+        found = {}
+        missing = []
+        for name in dict.fromkeys(names):
+            record = self._cached(name)
+            if record is not None:
+                found[name] = record
+            else:
+                missing.append(name)
+
+        for chunk in chunked(missing):
+            placeholders, params = in_clause(chunk)
+            rows = execute_mysql_query(
+                f"""
+                SELECT Meal_ID, Name, Staple, Book, Page, Website, Last_Made, Updated_At,
+                       Tags_Mask,
+                       Fresh_Ingredients, Tinned_Ingredients, Dry_Ingredients, Dairy_Ingredients
+                FROM MealsTable
+                WHERE Name IN ({placeholders})
+                """,
+                params,
+                fetch="all",
+            ) or []
+
+            # MySQL matches names case-insensitively, so pair rows with the requested names the same way
+            by_key = {r["Name"].casefold(): r for r in rows}
+            for name in chunk:
+                row = by_key.get(name.casefold())
+                if row is None:
+                    continue
+                record = self._build_record(row)
+                self._store(name, record)
+                found[name] = record
+        return found
+
+    def invalidate(self, names=None) -> None:
+        """
+        Drop cached entries after a write.
+
+        names : meal names whose records changed; when omitted every meal record is dropped.
+        The name summary is always dropped because names, staples or counts may have changed.
+        Inside an app context (a request or a background job) the change is published to
+        other processes after the context's transaction commits (see publish); outside
+        one it is published straight away.
+        """
+        self._drop(names)
+        if has_app_context():
+            # The names to drop again once the write commits (None for every record)
+            changed = g.get('catalogue_changed', set())
+            if names is None or changed is None:
+                g.catalogue_changed = None
+            else:
+                g.catalogue_changed = changed | set(names)
+        else:
+            self.publish()
+
+    def _drop(self, names, bump_version=True) -> None:
+        with self._lock:
+            self._summary = None
+            if names is None:
+                self._meals.clear()
+            else:
+                for name in names:
+                    self._meals.pop(name.casefold(), None)
+            if bump_version:
+                self.version += 1
+
+
+# Shared cache instance used by all blueprints
+catalogue = CatalogueCache()
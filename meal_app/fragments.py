@@ -0,0 +1,101 @@
+import sys
+import threading
+from collections import OrderedDict
+from .metrics import format_metrics, metrics
+
+
+class FragmentCache:
+    """
+    In-process LRU cache of rendered HTML.
+
+    Keys are tuples that identify exactly what the HTML was rendered from, e.g.
+    ("find", Meal_ID, Updated_At, name) for a meal page, so entries never need to be
+    invalidated: a changed row simply produces a new key, and the old entry ages out.
+    The cache is bounded by the memory its strings use (max_bytes), evicting the least
+    recently used pages first. Hit, miss and eviction counters are exported on /metrics.
+    """
+
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def init_app(self, app):
+        """Read the memory budget (FRAGMENT_CACHE_BYTES, 0 to disable) and export the counters."""
+        self.max_bytes = app.config.get('FRAGMENT_CACHE_BYTES', self.max_bytes)
+        self.clear()
+        metrics.add_collector(self.prometheus_lines)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get(self, key) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, html) -> None:
+        size = sys.getsizeof(html)
+        # A page bigger than the whole budget is never worth keeping
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (html, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_render(self, key, render) -> str:
+        """Return the cached HTML for key, calling render() and caching its result on a miss."""
+        html = self.get(key)
+        if html is None:
+            html = render()
+            self.put(key, html)
+        return html
+
+    def prometheus_lines(self) -> list[str]:
+        with self._lock:
+            values = [
+                ("meal_app_fragment_cache_hits_total", "counter", "Pages served from the fragment cache", self.hits),
+                ("meal_app_fragment_cache_misses_total", "counter", "Pages rendered on a fragment cache miss", self.misses),
+                ("meal_app_fragment_cache_evictions_total", "counter", "Pages evicted to stay within the memory budget",
+                 self.evictions),
+                ("meal_app_fragment_cache_entries", "gauge", "Pages held in the fragment cache", len(self._entries)),
+                ("meal_app_fragment_cache_bytes", "gauge", "Memory used by cached pages", self._bytes),
+                ("meal_app_fragment_cache_max_bytes", "gauge", "Fragment cache memory budget", self.max_bytes),
+            ]
+        return format_metrics(values)
+
+
+def meal_key(page, name, row) -> tuple:
+    """
+    Fragment key for a page rendered from one catalogue record.
+
+    The row's Meal_ID and Updated_At identify its version; without Updated_At the
+    catalogue-wide stamp is used instead. The requested name is part of the key because
+    pages echo it back as typed.
+    """
+    from .catalogue import catalogue
+
+    version = row.get("Updated_At") or catalogue.stamp()[0]
+    return page, row.get("Meal_ID"), version, name
+
+
+# Shared cache instance used by the meal detail, meal list and add confirmation pages
+fragment_cache = FragmentCache()
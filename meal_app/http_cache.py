@@ -0,0 +1,84 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+from functools import wraps
+from flask import current_app, make_response, request
+from .catalogue import catalogue
+
+
+def _code_salt(app) -> str:
+    # Fingerprint of the app's code and templates, so a deploy that changes how pages
+    # render also changes every ETag (identical in every worker started from the same tree)
+    latest = 0
+    for root, _, files in os.walk(app.root_path):
+        for name in files:
+            if name.endswith((".py", ".html", ".js", ".css")):
+                latest = max(latest, os.stat(os.path.join(root, name)).st_mtime_ns)
+    return f"{latest:x}"
+
+
+def init_app(app) -> None:
+    """Work out the ETag salt (ETAG_SALT, or a fingerprint of the code) once at startup."""
+    if not app.config.get('ETAG_SALT'):
+        app.config['ETAG_SALT'] = _code_salt(app)
+
+
+def make_etag(*parts) -> str:
+    """Hash the salt and the given version parts into an opaque ETag value."""
+    key = "\0".join(str(p) for p in (current_app.config.get('ETAG_SALT', ''),) + parts)
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=12).hexdigest()
+
+
+def catalogue_validators(**view_args):
+    """Validators for pages built from the whole catalogue: the shared stamp and the full URL."""
+    token, modified = catalogue.stamp()
+    return make_etag("catalogue", token, request.full_path), datetime.fromtimestamp(modified, timezone.utc)
+
+
+def _not_modified(etag, last_modified) -> bool:
+    # If-None-Match wins over If-Modified-Since when both are sent (RFC 9110 13.2.2)
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    since = request.if_modified_since
+    if since is not None and last_modified is not None:
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def _set_validators(response, etag, last_modified):
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Caches may keep the page but must check back each time (answered cheaply with a 304)
+    response.cache_control.no_cache = True
+    return response
+
+
+def conditional(validators=catalogue_validators):
+    """
+    Decorator adding ETag/Last-Modified to a read-only view and answering 304 when they match.
+
+    validators(**view_args) returns (etag, last_modified) for the current request, or None
+    when no validator can be given (the view then runs as usual). It must not depend on
+    anything the view renders, so a matching request is answered without running the view
+    at all. Only GET and HEAD requests are affected.
+    """
+    def decorate(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(*args, **kwargs)
+            found = validators(**kwargs)
+            if found is None:
+                return view(*args, **kwargs)
+
+            etag, last_modified = found
+            if _not_modified(etag, last_modified):
+                return _set_validators(current_app.response_class(status=304), etag, last_modified)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                _set_validators(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorate
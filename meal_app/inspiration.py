@@ -0,0 +1,153 @@
+import random
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from .tags import tag_catalogue
+from .utilities import execute_mysql_query, in_clause
+
+
+class _AliasTable:
+    """Walker alias table: one weighted draw is a random index and one comparison."""
+
+    def __init__(self, weights):
+        n = len(weights)
+        total = sum(weights)
+        scaled = [w * n / total for w in weights]
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+        small = [i for i, w in enumerate(scaled) if w < 1.0]
+        large = [i for i, w in enumerate(scaled) if w >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+
+    def draw(self, rng) -> int:
+        i = rng.randrange(len(self.prob))
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+
+class InspirationPools:
+    """
+    Recency-weighted meal suggestions for the Inspire Me page.
+
+    Each combination of tags (all or any of them required) and staples (any of them)
+    gets a candidate pool, loaded with one query that the (Tags_Mask, Last_Made) index
+    answers, and kept in memory with an alias table over the meals' weights. A meal's weight grows with the
+    days since it was last made (capped at max_age_days, which never-made meals get), so
+    forgotten favourites come up more often without recent meals disappearing entirely.
+    Drawing k suggestions is then O(k), however many meals the tags match.
+
+    Pools are bounded in number (least recently used dropped first) and rebuilt on first
+    use after the catalogue version changes, the cache TTL expires or the day changes.
+    """
+
+    def __init__(self, ttl=300, max_age_days=365, max_pools=64):
+        self.ttl = ttl
+        self.max_age_days = max_age_days
+        self.max_pools = max_pools
+        self._lock = threading.Lock()
+        self._pools = OrderedDict()
+
+    def init_app(self, app):
+        """Share the catalogue cache TTL and read INSPIRE_MAX_AGE_DAYS."""
+        self.ttl = app.config.get('CATALOGUE_CACHE_TTL', self.ttl)
+        self.max_age_days = app.config.get('INSPIRE_MAX_AGE_DAYS', self.max_age_days)
+        with self._lock:
+            self._pools.clear()
+
+    def _build(self, mask, match, staples, today) -> dict:
+        conditions = []
+        condition, params = tag_catalogue.filter_sql(mask, match)
+        if condition:
+            conditions.append(condition)
+        if staples:
+            placeholders, staple_params = in_clause(staples, prefix="s")
+            conditions.append(f"Staple IN ({placeholders})")
+            params.update(staple_params)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = execute_mysql_query(
+            f"SELECT Name, Staple, Last_Made FROM MealsTable {where} ORDER BY Last_Made",
+            params,
+            fetch="all",
+        ) or []
+
+        weights = []
+        for r in rows:
+            made = r["Last_Made"]
+            age = (today - made.toordinal()) if made is not None else self.max_age_days
+            weights.append(min(max(age, 0), self.max_age_days) + 1)
+        return {
+            "rows": [{"Name": r["Name"], "Staple": r["Staple"], "Last_Made": r["Last_Made"]} for r in rows],
+            "weights": weights,
+            "table": _AliasTable(weights) if rows else None,
+        }
+
+    def pool(self, tags=(), staples=(), match="all") -> dict:
+        """
+        Return the candidate pool for the given tags and staples; match is "all" (every
+        tag required) or "any". Raises ValueError for an unknown tag.
+        """
+        from .catalogue import catalogue
+
+        mask = tag_catalogue.mask(tags)
+        match = "any" if match == "any" else "all"
+        staples = tuple(sorted({s for s in staples if s}))
+        key = (mask, match, staples)
+        today = date.today().toordinal()
+
+        catalogue.stamp()
+        with self._lock:
+            entry = self._pools.get(key)
+            if entry is not None:
+                version, built_at, day, data = entry
+                if (version == catalogue.version and day == today
+                        and (time.monotonic() - built_at) <= self.ttl):
+                    self._pools.move_to_end(key)
+                    return data
+
+        version = catalogue.version
+        data = self._build(mask, match, staples, today)
+        with self._lock:
+            self._pools[key] = (version, time.monotonic(), today, data)
+            self._pools.move_to_end(key)
+            while len(self._pools) > self.max_pools:
+                self._pools.popitem(last=False)
+        return data
+
+    def suggest(self, tags=(), staples=(), k=10, match="all", rng=None) -> list[dict]:
+        """
+        Draw up to k distinct meals from the pool, weighted by time since last made.
+
+        Returns the chosen rows ({"Name", "Staple", "Last_Made"}), most overdue first.
+        """
+        rng = rng or random
+        data = self.pool(tags, staples, match)
+        rows, weights = data["rows"], data["weights"]
+        if k <= 0 or not rows:
+            return []
+
+        if k * 2 >= len(rows):
+            # Small pool: weighted order of the whole pool (Efraimidis-Spirakis keys)
+            order = sorted(range(len(rows)), key=lambda i: rng.random() ** (1.0 / weights[i]), reverse=True)
+            picked = order[:k]
+        else:
+            # Large pool: alias draws, skipping repeats (rare, since k is under half the pool)
+            picked = []
+            seen = set()
+            table = data["table"]
+            while len(picked) < k:
+                i = table.draw(rng)
+                if i not in seen:
+                    seen.add(i)
+                    picked.append(i)
+
+        picked.sort(key=lambda i: (-weights[i], rows[i]["Name"]))
+        return [rows[i] for i in picked]
+
+
+# Shared pools used by the Inspire Me page
+inspiration = InspirationPools()
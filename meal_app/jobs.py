@@ -0,0 +1,270 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from .metrics import format_metrics, metrics
+
+# Job states, in the order a job moves through them
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+FINISHED_STATES = (DONE, FAILED)
+
+
+class QueueFull(Exception):
+    """Raised by submit() when this process already has JOBS_MAX_QUEUED jobs waiting or running."""
+
+
+class JobQueue:
+    """
+    In-process background job queue for work too slow to do inside a request.
+
+    Jobs run on a small thread pool inside the web process, each in its own app
+    context (so it gets its own database connection and transaction, committed and
+    published exactly like a request's). Every job is recorded in a local SQLite table
+    shared by all worker processes on the host, so a job submitted to one process can be
+    polled from any other, and results survive until they expire (JOBS_RETENTION).
+
+    Handlers are registered per job kind with handler(kind); each takes the job's
+    params dict and returns a JSON-serialisable result. A ValueError from a handler is
+    recorded as the job's error message. Threads rather than processes are used because
+    plan work is mostly waiting on MySQL and shares the catalogue and registry caches.
+    """
+
+    def __init__(self, path=None, workers=2, max_queued=100, retention=86400, purge_interval=600):
+        self.path = path
+        self.workers = workers
+        self.max_queued = max_queued
+        self.retention = retention
+        self.purge_interval = purge_interval
+        self.app = None
+        self._handlers = {}
+        self._lock = threading.Lock()
+        self._finished = threading.Condition(self._lock)
+        self._executor = None
+        self._pid = None
+        self._pending = 0
+        self._ready = False
+        self._last_purge = 0.0
+        self.completed = 0
+        self.failed = 0
+
+    def init_app(self, app):
+        """Read the JOBS_* settings, keep the app for job contexts and export the queue metrics."""
+        self.app = app
+        self.path = app.config.get('JOBS_DB_PATH') or os.path.join(app.instance_path, "jobs.sqlite3")
+        self.workers = app.config.get('JOBS_WORKERS', self.workers)
+        self.max_queued = app.config.get('JOBS_MAX_QUEUED', self.max_queued)
+        self.retention = app.config.get('JOBS_RETENTION', self.retention)
+        self._ready = False
+        metrics.add_collector(self.prometheus_lines)
+
+    def handler(self, kind):
+        """Decorator registering the function that runs jobs of the given kind."""
+        def register(fn):
+            self._handlers[kind] = fn
+            return fn
+        return register
+
+    def kinds(self) -> list[str]:
+        return sorted(self._handlers)
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per operation; commits on success, rolls back on error
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _owner() -> str:
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def _ensure_ready(self) -> None:
+        if self._ready:
+            return
+        with self._lock:
+            if self._ready:
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS jobs (
+                        id          TEXT PRIMARY KEY,
+                        kind        TEXT NOT NULL,
+                        status      TEXT NOT NULL,
+                        params      TEXT NOT NULL,
+                        result      BLOB,
+                        error       TEXT,
+                        owner       TEXT NOT NULL,
+                        created_at  REAL NOT NULL,
+                        started_at  REAL,
+                        finished_at REAL
+                    )
+                    """
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, finished_at)")
+            self._fail_orphans()
+            self._ready = True
+
+    def _fail_orphans(self) -> None:
+        # Jobs left queued or running by a process on this host that no longer exists will never finish
+        host = socket.gethostname()
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT DISTINCT owner FROM jobs WHERE status IN (?, ?) AND owner LIKE ?",
+                (QUEUED, RUNNING, f"{host}:%"),
+            ).fetchall()
+            for (owner,) in rows:
+                pid = int(owner.rsplit(":", 1)[1])
+                if pid != os.getpid() and not _process_alive(pid):
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE owner = ? AND status IN (?, ?)",
+                        (FAILED, "interrupted: the worker running this job stopped", time.time(), owner,
+                         QUEUED, RUNNING),
+                    )
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # Threads do not survive a fork, so each worker process starts its own pool
+        if self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="meal-app-job")
+            self._pid = os.getpid()
+            self._pending = 0
+        return self._executor
+
+    def submit(self, kind, params) -> str:
+        """Queue a job and return its ID; raises QueueFull when this process is saturated."""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind {kind!r}")
+        self._ensure_ready()
+        self._purge_if_due()
+        with self._lock:
+            pool = self._pool()
+            if self._pending >= self.max_queued:
+                raise QueueFull(f"{self._pending} jobs are already waiting")
+            self._pending += 1
+
+        job_id = uuid.uuid4().hex
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT INTO jobs (id, kind, status, params, owner, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (job_id, kind, QUEUED, json.dumps(params), self._owner(), time.time()),
+                )
+            pool.submit(self._run, job_id, kind, params)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        return job_id
+
+    def _run(self, job_id, kind, params) -> None:
+        status, result, error = DONE, None, None
+        try:
+            with self._connect() as conn:
+                conn.execute("UPDATE jobs SET status = ?, started_at = ? WHERE id = ?",
+                             (RUNNING, time.time(), job_id))
+            # Leaving the context commits the job's transaction (or rolls it back on error)
+            with self.app.app_context():
+                result = zlib.compress(json.dumps(self._handlers[kind](params)).encode("utf-8"))
+        except ValueError as exc:
+            status, error = FAILED, str(exc)
+        except Exception as exc:
+            self.app.logger.exception("Job %s (%s) failed", job_id, kind)
+            status, error = FAILED, f"{type(exc).__name__}: {exc}"
+
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                    (status, result, error, time.time(), job_id),
+                )
+        finally:
+            with self._finished:
+                self._pending -= 1
+                if status == DONE:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                self._finished.notify_all()
+
+    def get(self, job_id, with_result=False) -> dict | None:
+        """Return the job's record (and its decoded result if asked and finished), or None."""
+        self._ensure_ready()
+        columns = "id, kind, status, error, created_at, started_at, finished_at"
+        if with_result:
+            columns += ", result"
+        with self._connect() as conn:
+            row = conn.execute(f"SELECT {columns} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        if with_result:
+            raw = job.pop("result")
+            job["result"] = json.loads(zlib.decompress(raw).decode("utf-8")) if raw is not None else None
+        return job
+
+    def wait(self, job_id, timeout) -> dict | None:
+        """
+        Return the job once it has finished or timeout seconds have passed (a long poll).
+
+        Jobs run by this process wake the waiter as soon as they finish; jobs owned by
+        another worker process are noticed by re-reading the table every quarter second.
+        """
+        deadline = time.monotonic() + timeout
+        job = self.get(job_id)
+        while job is not None and job["status"] not in FINISHED_STATES:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            with self._finished:
+                self._finished.wait(min(remaining, 0.25))
+            job = self.get(job_id)
+        return job
+
+    def _purge_if_due(self) -> None:
+        now = time.time()
+        if now - self._last_purge < self.purge_interval:
+            return
+        self._last_purge = now
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (DONE, FAILED, now - self.retention),
+            )
+
+    def prometheus_lines(self) -> list[str]:
+        with self._lock:
+            values = [
+                ("meal_app_jobs_pending", "gauge", "Background jobs queued or running in this process", self._pending),
+                ("meal_app_jobs_completed_total", "counter", "Background jobs finished successfully", self.completed),
+                ("meal_app_jobs_failed_total", "counter", "Background jobs that failed", self.failed),
+            ]
+        return format_metrics(values)
+
+
+def _process_alive(pid) -> bool:
+    # os.kill(pid, 0) only probes a process on POSIX (on Windows it would terminate it)
+    if os.name == "nt":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# Shared queue; handlers for the plan jobs are registered in api/v1.py
+job_queue = JobQueue()
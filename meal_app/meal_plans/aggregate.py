@@ -0,0 +1,173 @@
+"""
+Shopping-list aggregation engine.
+
+A plan is usually a few distinct meals repeated across many slots, so the work is done
+once per distinct (bucket, meal, quantity) group rather than once per slot:
+- each group's quantities are parsed once and laid out in flat arrays, with every
+  (bucket, ingredient) pair mapped to an integer ID
+- scaling is one array multiply, and the totals are one weighted sum per ingredient ID,
+  weighted by how many slots use each group (NumPy when it is installed, plain loops
+  otherwise)
+- every slot gets its own copy of its group's scaled buckets; input dictionaries are
+  never modified
+
+Totals match the original per-addition algorithm exactly:
+- a quantity that is not a number is dropped, as before
+- when every scaled quantity of an ingredient is a whole number of hundredths, the
+  plain sum is rounded once at the end, which gives the same value as rounding after
+  every addition
+- otherwise that ingredient's quantities are replayed in slot order with the original
+  rounding after every addition, so odd inputs such as 0.333 still produce the same total
+- integral totals are stored as int, everything else as float
+"""
+from ..utilities import INGREDIENT_BUCKETS
+
+try:
+    import numpy as np
+except ImportError:  # the engine falls back to plain Python loops
+    np = None
+
+# Scaled quantities closer than this to a multiple of 0.01 count as whole hundredths
+_HUNDREDTHS_TOLERANCE = 1e-6
+
+
+class _Layout:
+    """Flat arrays for the distinct groups of a plan (see _flatten)."""
+
+    def __init__(self):
+        self.keys = []        # (bucket, ingredient) for each key ID, in first-seen order
+        self.key_ids = []     # per quantity: key ID
+        self.values = []      # per quantity: parsed amount
+        self.factors = []     # per quantity: the group's meal quantity
+        self.weights = []     # per quantity: number of slots using the group
+        self.groups = []      # per group: (bucket, ingredient names, start offset)
+        self.slots = []       # per slot: group index for each bucket
+
+
+def _parse_bucket(bucket, dct, ids, keys):
+    # Numeric quantities of one bucket as (ingredient names, key IDs, values)
+    names, key_ids, values = [], [], []
+    for ingredient, raw in (dct or {}).items():
+        try:
+            value = float(raw)
+        except (TypeError, ValueError):
+            continue
+        key = (bucket, ingredient)
+        key_id = ids.get(key)
+        if key_id is None:
+            key_id = ids[key] = len(keys)
+            keys.append(key)
+        names.append(ingredient)
+        key_ids.append(key_id)
+        values.append(value)
+    return names, key_ids, values
+
+
+def _flatten(meals, with_factors) -> _Layout:
+    """
+    Group the plan's slots and lay the distinct groups out as flat arrays.
+
+    Slots share a group when they hold the same bucket dictionary (the same cached
+    meal record) with the same quantity.
+    """
+    layout = _Layout()
+    ids = {}
+    group_index = {}
+    counts = []
+    for meal in meals:
+        factor = float(meal.get("quantity", 1) or 1) if with_factors else 1.0
+        slot = []
+        for bucket in INGREDIENT_BUCKETS:
+            dct = meal.get(bucket)
+            group_key = (bucket, id(dct), factor)
+            index = group_index.get(group_key)
+            if index is None:
+                index = group_index[group_key] = len(layout.groups)
+                names, key_ids, values = _parse_bucket(bucket, dct, ids, layout.keys)
+                layout.groups.append((bucket, names, len(layout.values)))
+                layout.key_ids.extend(key_ids)
+                layout.values.extend(values)
+                layout.factors.extend([factor] * len(values))
+                counts.append(0)
+            counts[index] += 1
+            slot.append(index)
+        layout.slots.append(slot)
+
+    for index, (_, names, _) in enumerate(layout.groups):
+        layout.weights.extend([counts[index]] * len(names))
+    return layout
+
+
+def _scale(values, factors) -> list[float]:
+    if np is not None and values:
+        return (np.asarray(values, dtype=np.float64) * np.asarray(factors, dtype=np.float64)).tolist()
+    return [value * factor for value, factor in zip(values, factors)]
+
+
+def _sum_by_key(key_ids, scaled, weights, key_count) -> tuple[list[float], set[int]]:
+    """Return per-key weighted sums, and the keys that have a value that is not whole hundredths."""
+    if np is not None and scaled:
+        ids = np.asarray(key_ids, dtype=np.int64)
+        vals = np.asarray(scaled, dtype=np.float64)
+        sums = np.bincount(ids, weights=vals * np.asarray(weights, dtype=np.float64), minlength=key_count)
+        cents = vals * 100.0
+        inexact = np.abs(cents - np.rint(cents)) > _HUNDREDTHS_TOLERANCE
+        return sums.tolist(), set(np.unique(ids[inexact]).tolist())
+
+    sums = [0.0] * key_count
+    inexact = set()
+    for key_id, value, weight in zip(key_ids, scaled, weights):
+        sums[key_id] += value * weight
+        cents = value * 100.0
+        if abs(cents - round(cents)) > _HUNDREDTHS_TOLERANCE:
+            inexact.add(key_id)
+    return sums, inexact
+
+
+def _replay(layout, scaled, inexact, sums) -> None:
+    # Re-add the odd ingredients slot by slot, rounding after every addition like the original code
+    for key_id in inexact:
+        sums[key_id] = 0.0
+    for slot in layout.slots:
+        for index in slot:
+            _, names, start = layout.groups[index]
+            for offset in range(start, start + len(names)):
+                key_id = layout.key_ids[offset]
+                if key_id in inexact:
+                    sums[key_id] = round(sums[key_id] + scaled[offset], 2)
+
+
+def _totals(layout, scaled) -> dict:
+    sums, inexact = _sum_by_key(layout.key_ids, scaled, layout.weights, len(layout.keys))
+    if inexact:
+        _replay(layout, scaled, inexact, sums)
+
+    totals = {bucket: {} for bucket in INGREDIENT_BUCKETS}
+    for (bucket, ingredient), total in zip(layout.keys, sums):
+        total = round(total, 2)
+        totals[bucket][ingredient] = int(total) if total.is_integer() else total
+    return totals
+
+
+def aggregate(meal_info_list, with_factors=True) -> tuple[list[dict], dict]:
+    """
+    Scale each meal's buckets by its quantity and total them across the plan.
+
+    meal_info_list : dicts with the four ingredient buckets and an optional "quantity"
+    with_factors   : False to ignore "quantity" (the buckets are already scaled)
+
+    Returns (scaled, totals): scaled has one dict of scaled buckets per meal, with
+    non-numeric quantities dropped; totals is {bucket: {ingredient: total}}.
+    """
+    layout = _flatten(meal_info_list, with_factors)
+    scaled_values = _scale(layout.values, layout.factors)
+
+    group_dicts = [
+        dict(zip(names, scaled_values[start:start + len(names)]))
+        for _, names, start in layout.groups
+    ]
+    scaled = [
+        {layout.groups[index][0]: dict(group_dicts[index]) for index in slot}
+        for slot in layout.slots
+    ]
+    return scaled, _totals(layout, scaled_values)
@@ -1,8 +1,12 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session
 import json
 from pathlib import Path
-from ..utilities import execute_mysql_query
+from ..utilities import INGREDIENT_BUCKETS
+from ..catalogue import catalogue
 from ..variables import extras
+from ..tags import tag_catalogue
+from .aggregate import aggregate
+from .generator import plan_generator
 
 # Blueprint for the "Create Meal Plan" feature
 create = Blueprint('create', __name__, template_folder='templates', static_folder='../static')
@@ -10,130 +14,82 @@ create = Blueprint('create', __name__, template_folder='templates', static_folde
 
 def get_meal_info(meal_list, quantity_list) -> list[dict]:
     """
-    Fetch ingredient JSON columns for each selected meal from the database.
+    Fetch the ingredient buckets for all selected meals in one batched lookup.
     Also attach the quantity selected for that meal so we can scale ingredients later.
     """
+    # One catalogue lookup for the whole plan; repeated meals are only fetched once
+    records = catalogue.get_meals(meal_list)
+
     results = []
-    q = """
-      SELECT Fresh_Ingredients, Tinned_Ingredients, Dry_Ingredients, Dairy_Ingredients
-      FROM MealsTable
-      WHERE Name = :name
-    """
-    for idx, meal in enumerate(meal_list):
-        # Fetch one row for this meal name
-        row = execute_mysql_query(q, {"name": meal}, fetch="one")
+    for meal, quantity in zip(meal_list, quantity_list):
+        row = records.get(meal)
         if not row:
             continue
 
-        # Convert JSON text to a Python dict, and treat empty/null values as an empty dict
-        def _loads(v):
-            if v in (None, "", "null"):
-                return {}
-            return json.loads(v)
-
-        # Store ingredient buckets plus the meal quantity for later scaling
-        parsed = {
-            "Fresh_Ingredients": _loads(row.get("Fresh_Ingredients")),
-            "Tinned_Ingredients": _loads(row.get("Tinned_Ingredients")),
-            "Dry_Ingredients": _loads(row.get("Dry_Ingredients")),
-            "Dairy_Ingredients": _loads(row.get("Dairy_Ingredients")),
-            "quantity": quantity_list[idx],
-        }
+        # The aggregation engine never modifies its input, so the cached buckets are shared as-is
+        parsed = {bucket: row[bucket] for bucket in INGREDIENT_BUCKETS}
+        parsed["quantity"] = quantity
         results.append(parsed)
     return results
 
 
 def quantity_adjustment(meal_list_dict) -> list[dict]:
     """Multiply ingredient amounts by the quantity selected for each meal."""
+    # Non-numeric amounts are dropped; the input dictionaries are left untouched
+    return aggregate(meal_list_dict)[0]
 
-    # Helper to multiply every numeric value in a dictionary by a factor
-    # If a value cannot be converted to a number, that ingredient is removed
-    def _scale(dct, factor):
-        if not isinstance(dct, dict):
-            return {}
-        for k, v in list(dct.items()):
-            try:
-                dct[k] = float(v) * float(factor)
-            except (TypeError, ValueError):
-                dct.pop(k, None)
-        return dct
-
-    # Update each meal dict by scaling ingredient quantities and then removing the quantity field
-    for meal in meal_list_dict:
-        qty = meal.get("quantity", 1) or 1
-        meal["Fresh_Ingredients"] = _scale(meal.get("Fresh_Ingredients", {}), qty)
-        meal["Tinned_Ingredients"] = _scale(meal.get("Tinned_Ingredients", {}), qty)
-        meal["Dry_Ingredients"] = _scale(meal.get("Dry_Ingredients", {}), qty)
-        meal["Dairy_Ingredients"] = _scale(meal.get("Dairy_Ingredients", {}), qty)
-        meal.pop("quantity", None)
-    return meal_list_dict
-
-
-def build_ingredient_dictionary(meal_ingredient_dict, complete_ingredient_dict, ingredient_type) -> dict:
-    """
-    Add one meal's ingredient bucket into the overall totals dictionary.
-    If an ingredient appears multiple times across meals, its quantity is added together.
-    """
-    for ingredient, val in meal_ingredient_dict.items():
-        # Skip any ingredient amounts that are not numeric
-        try:
-            val = float(val)
-        except (TypeError, ValueError):
-            continue
-
-        # Add the amount into the correct ingredient category bucket
-        bucket = complete_ingredient_dict[ingredient_type]
-        bucket[ingredient] = bucket.get(ingredient, 0) + val
 
-        # Round to keep totals neat and readable
-        bucket[ingredient] = round(bucket[ingredient], 2)
+def collate_ingredients(meal_info_list) -> dict:
+    """Merge all meals' ingredient buckets into one combined shopping list dictionary."""
+    # The buckets are already scaled, so any "quantity" key is ignored here
+    return aggregate(meal_info_list, with_factors=False)[1]
 
-        # If the number is effectively an integer, store it as an int for cleaner display
-        if float(bucket[ingredient]).is_integer():
-            bucket[ingredient] = int(bucket[ingredient])
-    return complete_ingredient_dict
 
+def build_meal_plan(meal_names, quantities, extras_selected=()) -> dict | None:
+    """
+    Build the complete plan dictionary shown on the display page and saved by the plan store.
 
-def collate_ingredients(meal_info_list) -> dict:
-    """Merge all meals' ingredient buckets into one combined shopping list dictionary."""
-    complete_ingredient_dict = {
-        "Fresh_Ingredients": {},
-        "Tinned_Ingredients": {},
-        "Dry_Ingredients": {},
-        "Dairy_Ingredients": {},
-    }
-
-    # Combine ingredient totals across all meals
-    for meal in meal_info_list:
-        for ingredient_type in complete_ingredient_dict.keys():
-            dct = meal.get(ingredient_type) or {}
-            if dct:
-                build_ingredient_dictionary(dct, complete_ingredient_dict, ingredient_type)
+    meal_names      : meal names, one per slot (matched case-insensitively)
+    quantities      : quantity for each slot, aligned with meal_names
+    extras_selected : extra pantry items to list with the plan
 
+    Names that match no meal are dropped (keeping quantities aligned) and the stored
+    spelling of each meal is used. Returns None if no slot names a known meal.
+    """
+    records = catalogue.get_meals(meal_names)
+    selected = [(records[m]['Name'], q) for m, q in zip(meal_names, quantities) if m in records]
+    meal_list = [m for m, _ in selected]
+    quantity_list = [q for _, q in selected]
+    if not meal_list:
+        return None
+
+    # Fetch ingredient info for each meal, then scale by quantity and total the plan in one pass
+    meal_info = get_meal_info(meal_list, quantity_list)
+    adjusted, complete_ingredient_dict = aggregate(meal_info)
+
+    # Build a per-meal breakdown so the UI can show shopping lists meal-by-meal if needed
+    per_meal = []
+    for idx, meal_name in enumerate(meal_list):
+        meal_dict = adjusted[idx] if idx < len(adjusted) else {}
+        per_meal.append({
+            "Name": meal_name,
+            "Fresh_Ingredients": meal_dict.get("Fresh_Ingredients", {}),
+            "Tinned_Ingredients": meal_dict.get("Tinned_Ingredients", {}),
+            "Dry_Ingredients": meal_dict.get("Dry_Ingredients", {}),
+            "Dairy_Ingredients": meal_dict.get("Dairy_Ingredients", {}),
+        })
+
+    # Store everything needed for the display page in one dictionary
+    complete_ingredient_dict['Extra_Ingredients'] = list(extras_selected)
+    complete_ingredient_dict['Meal_List'] = meal_list
+    complete_ingredient_dict['Per_Meal_Ingredients'] = per_meal
     return complete_ingredient_dict
 
 
 @create.route('/create', methods=['GET', 'POST'])
 def create_meal_plan():
-    # Get meals grouped by staple from the database (useful for categorizing or headings)
-    query_string = """
-      SELECT GROUP_CONCAT(Name ORDER BY Name ASC) AS Meals, Staple
-      FROM MealsTable
-      GROUP BY Staple;
-    """
-    results = execute_mysql_query(query_string, fetch="all") or []
-
-    # Convert the grouped results into a dictionary: {staple: [meal1, meal2, ...]}
-    staples_dict = {}
-    for item in results:
-        staple = str(item.get('Staple') or '')
-        meals_csv = item.get('Meals') or ''
-        meals_list = [m for m in meals_csv.split(',') if m] if meals_csv else []
-        staples_dict[staple] = meals_list
-
-    # Build a flat list of all meals to populate every dropdown in the UI
-    all_rows = execute_mysql_query("SELECT Name FROM MealsTable ORDER BY Name ASC;", fetch="all") or []
-    all_meals = [r["Name"] for r in all_rows]
+    # Get meals grouped by staple from the catalogue cache: {staple: [meal1, meal2, ...]}
+    staples_dict = catalogue.staples_dict()
 
     # Try to load sample meal names from the sample JSON file (only used for display/helping users)
     sample_meals = []
@@ -180,37 +136,8 @@ def create_meal_plan():
                 qty_raw.append(1)
 
         # Make sure each selected meal has a matching quantity
-        meal_list = meals_raw
-        if len(qty_raw) < len(meal_list):
-            qty_raw += [1] * (len(meal_list) - len(qty_raw))
-        quantity_list = qty_raw[:len(meal_list)]
-
-        # If the user submits without selecting any meals, show the form again
-        if not meal_list:
-            return render_template('create.html',
-                                   staples_dict=staples_dict,
-                                   extras=extras,
-                                   all_meals=all_meals,
-                                   sample_meals=sample_meals)
-
-        # Fetch ingredient info for each meal and adjust ingredient totals based on quantities
-        meal_info = get_meal_info(meal_list, quantity_list)
-        adjusted = quantity_adjustment(meal_info)
-
-        # Build a per-meal breakdown so the UI can show shopping lists meal-by-meal if needed
-        per_meal = []
-        for idx, meal_name in enumerate(meal_list):
-            meal_dict = adjusted[idx] if idx < len(adjusted) else {}
-            per_meal.append({
-                "Name": meal_name,
-                "Fresh_Ingredients": meal_dict.get("Fresh_Ingredients", {}),
-                "Tinned_Ingredients": meal_dict.get("Tinned_Ingredients", {}),
-                "Dry_Ingredients": meal_dict.get("Dry_Ingredients", {}),
-                "Dairy_Ingredients": meal_dict.get("Dairy_Ingredients", {}),
-            })
-
-        # Create the final combined ingredient shopping list across all selected meals
-        complete_ingredient_dict = collate_ingredients(adjusted)
+        if len(qty_raw) < len(meals_raw):
+            qty_raw += [1] * (len(meals_raw) - len(qty_raw))
 
         # Collect any extra items the user selected (checkboxes)
         extras_selected = []
@@ -218,18 +145,49 @@ def create_meal_plan():
             if 'extra' in k.lower() and v and v.strip().lower() != 'null':
                 extras_selected.append(v.strip())
 
-        # Store everything needed for the display page in one dictionary
-        complete_ingredient_dict['Extra_Ingredients'] = extras_selected
-        complete_ingredient_dict['Meal_List'] = meal_list
-        complete_ingredient_dict['Per_Meal_Ingredients'] = per_meal
+        # Meals are typed into typeahead inputs, so names that match no meal are dropped
+        complete_ingredient_dict = build_meal_plan(meals_raw, qty_raw, extras_selected)
+
+        # If the user submits without selecting any meals, show the form again
+        if complete_ingredient_dict is None:
+            return render_template('create.html',
+                                   staples_dict=staples_dict,
+                                   extras=extras,
+                                   tags=tag_catalogue.labels(),
+                                   sample_meals=sample_meals)
 
         # Save the meal plan result in the session so the next page can display it
         session['complete_ingredient_dict'] = complete_ingredient_dict
         return redirect(url_for('display.display_meal_plan'))
 
-    # For GET requests, show the create meal plan page with dropdown data
+    # For GET requests, show the create meal plan page (meal names come from the typeahead endpoint)
     return render_template('create.html',
                            staples_dict=staples_dict,
                            extras=extras,
-                           all_meals=all_meals,
+                           tags=tag_catalogue.labels(),
                            sample_meals=sample_meals)
+
+
+# Largest plan the Generate form offers (the same as the hand-picked form's two weeks)
+MAX_GENERATED_SLOTS = 14
+
+
+@create.route('/create/generate', methods=['POST'])
+def generate_meal_plan():
+    """Let the generator pick the meals (see generator.py), then show the plan like a hand-picked one."""
+    slots = min(max(request.form.get('Slots', 7, type=int), 1), MAX_GENERATED_SLOTS)
+    not_made_days = request.form.get('Not_Made_Days', type=int)
+    try:
+        selection = plan_generator.generate(slots, tags=request.form.getlist('Tag'), not_made_days=not_made_days)
+    except ValueError:
+        selection = None
+
+    meal_list = selection['Meal_List'] if selection else []
+    complete_ingredient_dict = build_meal_plan(meal_list, [1] * len(meal_list)) if meal_list else None
+
+    # If no meal matches the filters, go back to the form
+    if complete_ingredient_dict is None:
+        return redirect(url_for('create.create_meal_plan'))
+
+    session['complete_ingredient_dict'] = complete_ingredient_dict
+    return redirect(url_for('display.display_meal_plan'))
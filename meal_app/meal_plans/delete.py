@@ -1,21 +1,30 @@
 from flask import Blueprint, render_template, request, redirect, url_for
-from pathlib import Path
-from ..utilities import execute_mysql_query
+from ..utilities import execute_mysql_query, delete_meal_ingredients
+from ..catalogue import catalogue
+from ..vocabulary import vocabulary
+from .store import plan_store
+from .load import plan_page
 
 # Blueprint responsible for deleting meals and saved meal plans
 delete = Blueprint('delete', __name__, template_folder='templates', static_folder='../static')
 
 
 def _list_meal_names() -> list[str]:
-    # Fetch all meal names from the database so they can be shown for deletion
-    rows = execute_mysql_query("SELECT Name FROM MealsTable ORDER BY Name ASC;", fetch="all") or []
-    return [r["Name"] for r in rows]
+    # Get all meal names from the catalogue cache so they can be shown for deletion
+    return catalogue.meal_names()
 
 
 def delete_meals(meal_names: list[str]) -> None:
     # Delete selected meals from the database using a parameterized query
     if not meal_names:
         return
+
+    # Keep the deleted meals' ingredients so the search vocabulary can be updated
+    old_records = catalogue.get_meals(meal_names)
+
+    # Remove the meals' ingredient mapping rows first so none are left orphaned
+    delete_meal_ingredients(meal_names)
+
     placeholders = ", ".join([f":n{i}" for i in range(len(meal_names))])
     params = {f"n{i}": name for i, name in enumerate(meal_names)}
     execute_mysql_query(
@@ -24,60 +33,21 @@ def delete_meals(meal_names: list[str]) -> None:
         fetch="none"
     )
 
-
-# Directory where saved meal plans are stored as JSON files
-SAVED_DIR = Path.cwd() / "saved_meal_plans"
-
-
-def _valid_json_file(p: Path) -> bool:
-    # Check that the file exists and is not empty
-    try:
-        return p.is_file() and p.stat().st_size > 0
-    except Exception:
-        return False
-
-
-def _list_saved_names() -> list[str]:
-    # Collect the names of all saved meal plans from the saved_meal_plans directory
-    names = set()
-    if SAVED_DIR.exists():
-        for p in SAVED_DIR.glob("*.json"):
-            if _valid_json_file(p):
-                names.add(p.stem)
-        for p in SAVED_DIR.glob("*"):
-            if p.suffix == "" and _valid_json_file(p):
-                names.add(p.name)
-    return sorted(names)
-
-
-def _resolve_plan_path(name: str) -> Path | None:
-    # Determine the actual file path for a saved meal plan
-    candidates: list[Path] = [
-        SAVED_DIR / f"{name}.json",
-        SAVED_DIR / name,
-    ]
-    for p in candidates:
-        if p.exists():
-            return p
-    return None
-
-
-def delete_plans(plan_names: list[str]) -> None:
-    # Delete the selected meal plan files from disk
-    for name in plan_names:
-        p = _resolve_plan_path(name)
-        if p:
-            p.unlink(missing_ok=True)
+    # Remove the deleted meals from the catalogue cache
+    catalogue.invalidate(meal_names)
+    for record in old_records.values():
+        vocabulary.apply(record, None)
 
 
 @delete.route('/delete', methods=['GET', 'POST'])
 def delete_meal_plan():
-    # Get available meals and saved planners to display on the delete page
+    # Get one page of saved planners from the manifest; meals are picked with the typeahead instead of listed
+    page = max(request.args.get('page', 0, type=int), 0)
+    planners, has_next = plan_page(page)
     meals = _list_meal_names()
-    planners = _list_saved_names()
 
     # If there is nothing to delete, show a separate message page
-    if not meals and not planners:
+    if not meals and not planners and page == 0:
         return render_template('no_meal_plans.html')
 
     if request.method == "POST":
@@ -96,11 +66,11 @@ def delete_meal_plan():
             selected = [v for k, v in request.form.items() if k.startswith('Plan ')]
             if not selected:
                 return redirect(url_for('delete.delete_meal_plan'))
-            delete_plans(selected)
+            plan_store.delete(selected)
             return render_template('delete_complete.html', message='Meal planners deleted')
 
         # Fallback redirect if no valid action was selected
         return redirect(url_for('delete.delete_meal_plan'))
 
     # For GET requests, show the delete page with available options
-    return render_template('delete.html', meals=meals, planners=planners)
+    return render_template('delete.html', planners=planners, page=page, has_next=has_next)
@@ -1,8 +1,11 @@
 from flask import Blueprint, redirect, url_for, render_template, request, session
-import os
-import json
 from datetime import datetime
-from ..utilities import execute_mysql_query
+import csv
+import io
+from ..utilities import execute_mysql_query, update_last_made, INGREDIENT_BUCKETS
+from ..catalogue import catalogue
+from ..registry import registry
+from .store import plan_store
 import re
 
 # Blueprint responsible for displaying a created meal plan and handling save/update actions
@@ -18,39 +21,52 @@ def _safe_name(name: str) -> str:
 
 
 def save_meal_plan(complete_ingredient_dict, plan_name: str | None = None):
-    """Saves created meal plan to the local saved_meal_plans directory.
+    """Saves created meal plan to the saved-plan store.
 
-    If plan_name is provided, use it (safely) for the filename; otherwise use a
+    If plan_name is provided, use it (safely) for the plan name; otherwise use a
     Windows-safe timestamp (no colon characters).
     """
-    # Create the folder where meal plans will be saved if it does not exist yet
-    if not os.path.exists('saved_meal_plans'):
-        os.makedirs('saved_meal_plans')
-
-    # Convert the meal plan dictionary into nicely formatted JSON text
-    json_file = json.dumps(complete_ingredient_dict, indent=4)
-
-    # Choose a filename base either from user input or a timestamp
+    # Choose a plan name either from user input or a timestamp
     if plan_name:
         base = _safe_name(plan_name)
     else:
         base = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
 
-    filename = f"{base}.json"
-    path = os.path.join('saved_meal_plans', filename)
+    # If the name is already taken, add a timestamp so we don’t overwrite the existing plan
+    if plan_store.exists(base):
+        base += datetime.now().strftime("_%Y%m%d_%H%M%S")
 
-    # If the filename already exists, add a timestamp so we don’t overwrite the existing file
-    if os.path.exists(path):
-        suffix = datetime.now().strftime("_%Y%m%d_%H%M%S")
-        path = os.path.join('saved_meal_plans', f"{base}{suffix}.json")
-
-    # Write the meal plan JSON to disk
-    with open(path, "w", encoding="utf-8") as f:
-        f.write(json_file)
+    # Write the plan file and its manifest entry
+    path = plan_store.save(base, complete_ingredient_dict)
 
     # Return an absolute path so it can be shown to the user on the confirmation page
-    file_path = os.path.join(os.getcwd(), path)
-    return file_path
+    return str(path.resolve())
+
+
+def stamp_plan_dates(meals, date_now: str | None = None) -> None:
+    """Set Last_Made for every meal in a plan (today unless date_now, YYYY-MM-DD, is given)."""
+    if not meals:
+        return
+    # Use a Windows-safe date format
+    date_now = date_now or datetime.now().strftime("%Y-%m-%d")
+    # Stamp every meal in the plan with set-based UPDATEs rather than one per meal
+    update_last_made(meals, date_now)
+    # Cached records carry Last_Made, so drop the ones for these meals
+    catalogue.invalidate(meals)
+
+
+def shopping_list_csv(complete_ingredient_dict) -> str:
+    """Export a plan's combined shopping list as CSV: category, ingredient, amount (with unit)."""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["Category", "Ingredient", "Amount"])
+    for bucket in INGREDIENT_BUCKETS:
+        items = complete_ingredient_dict.get(bucket) or {}
+        for name, amount in zip(items, registry.format_bucket(items)):
+            writer.writerow([bucket.replace("_", " "), name, amount])
+    for extra in complete_ingredient_dict.get('Extra_Ingredients') or []:
+        writer.writerow(["Extras", extra, ""])
+    return out.getvalue()
 
 
 def create_meal_info_table(rows):
@@ -70,52 +86,9 @@ def create_meal_info_table(rows):
 
 
 def append_ingredient_units(fresh_ingredients, tinned_ingredients, dry_ingredients, dairy_ingredients):
-    """Appends unit suffixes to ingredient quantities where appropriate."""
-    from ..variables import gram_list
-
-    # Add units for fresh ingredients (grams or bulbs for onions)
-    def _fresh_unit(val, name):
-        if name in gram_list:
-            return f"{val} g"
-        if name in ("Onions (Red)", "Onions (White)"):
-            return f"{val} bulbs"
-        return str(val)
-
-    fresh_ingredients[1] = [
-        _fresh_unit(fresh_ingredients[1][idx], fresh_ingredients[0][idx])
-        for idx, _ in enumerate(fresh_ingredients[1])
-    ]
-
-    # Add units for tinned ingredients (grams for some items, otherwise tin/tins)
-    def _tinned_unit(val, name):
-        if name in gram_list:
-            return f"{val} g"
-        try:
-            num = float(val)
-        except (TypeError, ValueError):
-            return str(val)
-        if num <= 1:
-            return f"{int(num) if num.is_integer() else num} tin"
-        return f"{int(num) if num.is_integer() else num} tins"
-
-    tinned_ingredients[1] = [
-        _tinned_unit(tinned_ingredients[1][idx], tinned_ingredients[0][idx])
-        for idx, _ in enumerate(tinned_ingredients[1])
-    ]
-
-    # Add grams for dry ingredients that are measured in grams
-    dry_ingredients[1] = [
-        f"{dry_ingredients[1][idx]} g" if dry_ingredients[0][idx] in gram_list else str(dry_ingredients[1][idx])
-        for idx, _ in enumerate(dry_ingredients[1])
-    ]
-
-    # Add grams for dairy items in gram_list, add ml for milk, otherwise keep as-is
-    dairy_ingredients[1] = [
-        (f"{dairy_ingredients[1][idx]} g" if dairy_ingredients[0][idx] in gram_list
-         else f"{dairy_ingredients[1][idx]} ml" if str(dairy_ingredients[0][idx]) == 'Milk'
-         else str(dairy_ingredients[1][idx]))
-        for idx, _ in enumerate(dairy_ingredients[1])
-    ]
+    """Appends unit suffixes to ingredient quantities, using the shared ingredient registry."""
+    for names_values in (fresh_ingredients, tinned_ingredients, dry_ingredients, dairy_ingredients):
+        names_values[1] = [registry.format_quantity(name, val) for name, val in zip(names_values[0], names_values[1])]
     return fresh_ingredients, tinned_ingredients, dry_ingredients, dairy_ingredients
 
 
@@ -123,14 +96,11 @@ def append_ingredient_units(fresh_ingredients, tinned_ingredients, dry_ingredien
 def display_meal_plan():
     # GET request is used to show the meal plan results
     if request.method == "GET":
-        # Pull the meal plan dictionary from the session
-        complete_ingredient_dict = session.pop('complete_ingredient_dict', None)
+        # Read the meal plan dictionary from the session; it stays there for POST actions like Save/Update Dates
+        complete_ingredient_dict = session.get('complete_ingredient_dict')
         if not complete_ingredient_dict:
             return redirect(url_for('create.create_meal_plan'))
 
-        # Put it back so it remains available for POST actions like Save/Update Dates
-        session['complete_ingredient_dict'] = complete_ingredient_dict
-
         # Get the list of meals selected by the user
         meal_list = complete_ingredient_dict.get('Meal_List', []) or []
         if not meal_list:
@@ -214,10 +184,9 @@ def display_meal_plan():
         )
 
     # POST request is used for actions like "Save" and "Update Dates"
-    complete_ingredient_dict = session.pop('complete_ingredient_dict', None)
+    complete_ingredient_dict = session.get('complete_ingredient_dict')
     if not complete_ingredient_dict:
         return redirect(url_for('create.create_meal_plan'))
-    session['complete_ingredient_dict'] = complete_ingredient_dict
 
     submit_val = request.form.get('submit', '')
     if submit_val == 'Save':
@@ -227,16 +196,8 @@ def display_meal_plan():
         return render_template('save_complete.html', file_path=file_path)
 
     if submit_val == 'Update Dates':
-        # Use a Windows-safe date format and update Last_Made for meals in this plan
-        date_now = datetime.now().strftime("%Y-%m-%d")
-        meals = complete_ingredient_dict.get('Meal_List', [])
-        if meals:
-            for name in meals:
-                execute_mysql_query(
-                    "UPDATE MealsTable SET Last_Made = :dt WHERE Name = :name",
-                    {"dt": date_now, "name": name},
-                    fetch="none",
-                )
+        # Update Last_Made for meals in this plan
+        stamp_plan_dates(complete_ingredient_dict.get('Meal_List', []))
         return redirect(url_for('display.display_meal_plan'))
 
     # If an unknown action is submitted, return the user back to the create page
@@ -0,0 +1,257 @@
+import math
+import threading
+import time
+from datetime import date
+from ..utilities import execute_mysql_query
+from ..tags import tag_catalogue
+from ..pantry import _iter_bits
+
+# Ordinal used for meals that have never been made (older than any real date)
+NEVER_MADE = -1
+
+
+def _day(value) -> int:
+    # Last_Made as a day number; dates and datetimes both have toordinal()
+    return value.toordinal() if value is not None else NEVER_MADE
+
+
+class PlanGenerator:
+    """
+    Picks meals for a plan so the shopping list is as short as possible.
+
+    Every distinct shopping-list item (category, ingredient) gets a bit position and each
+    meal's ingredients are one Python int, so the items a plan needs are the OR of its
+    meals' bitsets and "how many new items would this meal add" is one AND and a popcount.
+    Tag filters are bitsets over meal positions, ANDed together like the pantry index.
+
+    The search is greedy followed by local improvement:
+    - greedy fills one slot at a time with the meal adding the fewest new items,
+      preferring meals that share more items with the plan, then meals made longest ago
+    - swaps then replace one meal at a time while that strictly shortens the list, until
+      no swap helps or the time budget runs out
+    Both phases share the time budget: if it runs out during the greedy fill (very large
+    plans), the remaining slots are filled in one pass with the meals made longest ago.
+    A swap candidate must add fewer items than the slot it replaces contributes on its
+    own, and the items it adds outside the whole plan are a lower bound on that, so only
+    the few meals below the bound are ever checked.
+
+    Like the pantry index, the data is rebuilt on first use after the catalogue version
+    changes or the cache TTL expires.
+    """
+
+    def __init__(self, ttl=300, budget_ms=250):
+        self.ttl = ttl
+        self.budget_ms = budget_ms
+        self._lock = threading.Lock()
+        self._index = None
+        self._built_version = None
+        self._built_at = 0.0
+
+    def init_app(self, app):
+        """Share the catalogue cache TTL and read the search budget (PLAN_GENERATOR_BUDGET_MS)."""
+        self.ttl = app.config.get('CATALOGUE_CACHE_TTL', self.ttl)
+        self.budget_ms = app.config.get('PLAN_GENERATOR_BUDGET_MS', self.budget_ms)
+        with self._lock:
+            self._index = None
+
+    @staticmethod
+    def _build() -> dict:
+        meals = execute_mysql_query(
+            """
+            SELECT Meal_ID, Name, Staple, Last_Made, Tags_Mask
+            FROM MealsTable
+            ORDER BY Meal_ID
+            """,
+            fetch="all",
+        ) or []
+        pairs = execute_mysql_query(
+            "SELECT Meal_ID, Category, Ingredient_ID FROM MealIngredients",
+            fetch="all",
+        ) or []
+
+        positions = {r["Meal_ID"]: p for p, r in enumerate(meals)}
+        # Per tag bit, the meals carrying it as a bitset over meal positions
+        tag_bits = {}
+        for p, r in enumerate(meals):
+            for bit in _iter_bits(int(r["Tags_Mask"] or 0)):
+                tag_bits[bit] = tag_bits.get(bit, 0) | (1 << p)
+
+        # One bit per distinct shopping-list item, as collate_ingredients keys them
+        items = {}
+        masks = [0] * len(meals)
+        for r in pairs:
+            p = positions.get(r["Meal_ID"])
+            if p is None:
+                continue
+            bit = items.setdefault((r["Category"], r["Ingredient_ID"]), len(items))
+            masks[p] |= 1 << bit
+
+        return {
+            "names": [r["Name"] for r in meals],
+            "staples": [str(r["Staple"] or '') for r in meals],
+            "days": [_day(r["Last_Made"]) for r in meals],
+            "masks": masks,
+            "sizes": [m.bit_count() for m in masks],
+            "tag_bits": tag_bits,
+        }
+
+    def _data(self) -> dict:
+        from ..catalogue import catalogue
+
+        with self._lock:
+            if (self._index is not None and self._built_version == catalogue.version
+                    and (time.monotonic() - self._built_at) <= self.ttl):
+                return self._index
+
+        version = catalogue.version
+        index = self._build()
+        with self._lock:
+            self._index = index
+            self._built_version = version
+            self._built_at = time.monotonic()
+        return index
+
+    @staticmethod
+    def _candidates(index, tags, not_made_days, today) -> list[int]:
+        bits = (1 << len(index["names"])) - 1
+        for bit in _iter_bits(tag_catalogue.mask(tags)):
+            bits &= index["tag_bits"].get(bit, 0)
+        cutoff = today.toordinal() - not_made_days if not_made_days else None
+        days = index["days"]
+        sizes = index["sizes"]
+        # Meals with no ingredient mapping (not backfilled yet) would look free, so they are left out
+        return [
+            p for p in _iter_bits(bits)
+            if sizes[p] and (cutoff is None or days[p] <= cutoff)
+        ]
+
+    @staticmethod
+    def _greedy(index, candidates, slots, cap, deadline) -> list[int]:
+        masks, sizes, days, staples = index["masks"], index["sizes"], index["days"], index["staples"]
+        chosen = []
+        counts = {}
+        union = 0
+        pool = candidates
+        while len(chosen) < slots and pool:
+            if time.perf_counter() >= deadline:
+                # Out of time: one pass over what is left, longest since made first
+                for p in sorted(pool, key=lambda p: (days[p], p)):
+                    if len(chosen) >= slots:
+                        break
+                    if counts.get(staples[p], 0) < cap:
+                        chosen.append(p)
+                        counts[staples[p]] = counts.get(staples[p], 0) + 1
+                break
+            outside = ~union
+            added = [(masks[p] & outside).bit_count() for p in pool]
+            fewest = min(added)
+            # Ties: most items shared with the plan (the biggest meal), then the longest since made
+            best = min((p for p, a in zip(pool, added) if a == fewest), key=lambda p: (-sizes[p], days[p], p))
+            chosen.append(best)
+            union |= masks[best]
+            staple = staples[best]
+            counts[staple] = counts.get(staple, 0) + 1
+            full = counts[staple] >= cap
+            pool = [p for p in pool if p != best and not (full and staples[p] == staple)]
+        return chosen
+
+    @staticmethod
+    def _improve(index, candidates, chosen, cap, deadline) -> int:
+        """Apply improving swaps to chosen in place until none is left or the deadline passes; returns swaps made."""
+        masks, sizes, days, staples = index["masks"], index["sizes"], index["days"], index["staples"]
+        swaps = 0
+        while time.perf_counter() < deadline:
+            # Items needed by every slot except i, from prefix and suffix ORs
+            n = len(chosen)
+            prefix, suffix = [0] * (n + 1), [0] * (n + 1)
+            for i in range(n):
+                prefix[i + 1] = prefix[i] | masks[chosen[i]]
+                suffix[n - 1 - i] = suffix[n - i] | masks[chosen[n - 1 - i]]
+            union = prefix[n]
+            cost = union.bit_count()
+            rests = [prefix[i] | suffix[i + 1] for i in range(n)]
+            # Items only slot i needs: what a replacement must beat
+            gains = [cost - rest.bit_count() for rest in rests]
+
+            outside = ~union
+            in_plan = set(chosen)
+            bound = max(gains, default=0)
+            pool = []
+            for p in candidates:
+                if p not in in_plan:
+                    o = (masks[p] & outside).bit_count()
+                    if o < bound:
+                        pool.append((o, -sizes[p], days[p], p))
+            pool.sort()
+            counts = {}
+            for p in chosen:
+                counts[staples[p]] = counts.get(staples[p], 0) + 1
+
+            swapped = False
+            for i in sorted(range(n), key=lambda i: -gains[i]):
+                best, best_added = None, gains[i]
+                for o, _, _, p in pool:
+                    if o >= best_added:
+                        break
+                    if staples[p] != staples[chosen[i]] and counts.get(staples[p], 0) >= cap:
+                        continue
+                    added = (masks[p] & ~rests[i]).bit_count()
+                    if added < best_added:
+                        best, best_added = p, added
+                if best is not None:
+                    chosen[i] = best
+                    swaps += 1
+                    swapped = True
+                    break
+                if time.perf_counter() >= deadline:
+                    break
+            if not swapped:
+                break
+        return swaps
+
+    def generate(self, slots, tags=(), not_made_days=None, max_per_staple=None, budget_ms=None,
+                 today=None) -> dict | None:
+        """
+        Choose up to slots distinct meals needing as few shopping-list items as possible.
+
+        slots          : number of meals to pick
+        tags           : tag labels or columns every meal must have (e.g. "Quick/Easy")
+        not_made_days  : leave out meals made within this many days (never-made meals always qualify)
+        max_per_staple : most meals allowed per staple; by default the slots are spread
+                         evenly over the staples the candidates use
+        budget_ms      : time allowed for the search (PLAN_GENERATOR_BUDGET_MS by default)
+
+        Returns {"Meal_List", "Distinct_Ingredients", "Shared_Ingredients", "Candidates",
+        "Swaps"}, or None when no meal passes the filters. Fewer than slots meals are
+        returned when the filters leave too few. Raises ValueError for an unknown tag.
+        """
+        started = time.perf_counter()
+        budget_ms = self.budget_ms if budget_ms is None else budget_ms
+        index = self._data()
+        candidates = self._candidates(index, tags, not_made_days, today or date.today())
+        if not candidates or slots < 1:
+            return None
+
+        staples = index["staples"]
+        if not max_per_staple:
+            max_per_staple = math.ceil(slots / len({staples[p] for p in candidates}))
+
+        deadline = started + budget_ms / 1000
+        chosen = self._greedy(index, candidates, slots, max_per_staple, deadline)
+        swaps = self._improve(index, candidates, chosen, max_per_staple, deadline)
+
+        union = 0
+        for p in chosen:
+            union |= index["masks"][p]
+        distinct = union.bit_count()
+        return {
+            "Meal_List": [index["names"][p] for p in chosen],
+            "Distinct_Ingredients": distinct,
+            "Shared_Ingredients": sum(index["sizes"][p] for p in chosen) - distinct,
+            "Candidates": len(candidates),
+            "Swaps": swaps,
+        }
+
+
+# Shared generator used by the Create Meal Plan page and the JSON API
+plan_generator = PlanGenerator()
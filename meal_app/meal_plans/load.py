@@ -1,76 +1,35 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, current_app
-from pathlib import Path
-import json
-from ..utilities import execute_mysql_query
+from ..catalogue import catalogue
+from .store import plan_store
 
 # Blueprint responsible for loading saved meal plans or loading a single meal
 load = Blueprint('load', __name__, template_folder='templates', static_folder='../static')
 
-def candidate_dirs():
+def plan_page(page: int) -> tuple[list[str], bool]:
     """
-    Return the possible folders where saved meal plans may exist.
-    We check both the project-level folder and the app-level folder so the code works
-    even if the app is run from different working directories.
+    Return one page of saved plan names from the plan store's manifest,
+    and whether a further page exists.
     """
-    app_root = Path(current_app.root_path)
-    project_root = app_root.parent
-    return [
-        project_root / "saved_meal_plans",
-        app_root / "saved_meal_plans",
-    ]
-
-def list_saved_plans():
-    """
-    Look for saved meal plans in the candidate folders.
-    We accept both:
-    - files ending in .json
-    - files with no extension (older saves that may have been created differently)
-    The function returns a sorted list of plan names shown in the UI.
-    """
-    names = set()
-    for d in candidate_dirs():
-        if not d.exists():
-            continue
-
-        # Add all .json plan files using the filename without extension
-        for p in d.glob("*.json"):
-            names.add(p.stem)
-
-        # Also accept files without extension to support older saved plans
-        for p in d.glob("*"):
-            if p.is_file() and p.suffix == "":
-                names.add(p.name)
-    return sorted(names)
-
-def resolve_plan_path(meal_plan: str) -> Path | None:
-    """
-    Try to locate the actual file for the requested plan name.
-    We try both forms:
-    - <name>.json
-    - <name> (no extension)
-    Returns the first match found, otherwise returns None.
-    """
-    for d in candidate_dirs():
-        cand_json = d / f"{meal_plan}.json"
-        if cand_json.exists():
-            return cand_json
-        cand_raw = d / meal_plan
-        if cand_raw.exists():
-            return cand_raw
-    return None
+    page_size = current_app.config.get('PLAN_LIST_PAGE_SIZE', 100)
+    names = plan_store.names(offset=page * page_size, limit=page_size + 1)
+    return names[:page_size], len(names) > page_size
 
 @load.route('/load', methods=['GET', 'POST'])
 def choose_meal_plan():
-    # Get a list of saved plans from disk and a list of meals from the database
-    meal_plans = list_saved_plans()
-    rows = execute_mysql_query("SELECT Name FROM MealsTable ORDER BY Name ASC;", fetch="all") or []
-    meals = [r["Name"] for r in rows]
+    # Get one page of saved plans from the manifest; meals are picked with the typeahead instead of a full list
+    page = max(request.args.get('page', 0, type=int), 0)
+    meal_plans, has_next = plan_page(page)
 
     # If there are no saved plans and no meals in the database, show the empty page
-    if not meal_plans and not meals:
+    if not meal_plans and page == 0 and not catalogue.meal_names():
         return render_template('no_meal_plans.html')
 
     if request.method == "POST":
+        # A meal typed into the meal picker takes priority over the planner dropdown
+        meal = (request.form.get('Meal') or '').strip()
+        if meal:
+            return redirect(url_for('load.load_single_meal', meal=meal))
+
         # Some templates may use 'Meal Plan' and others may use 'Meal_Plan', so accept both
         selected = request.form.get('Meal Plan') or request.form.get('Meal_Plan')
         if not selected:
@@ -86,26 +45,25 @@ def choose_meal_plan():
             return redirect(url_for('load.load_single_meal', meal=name))
 
         # If it is a plain name, treat it as a plan if it exists in saved plans
-        if selected in meal_plans:
+        if plan_store.exists(selected):
             return redirect(url_for('load.load_meal_plan', meal_plan=selected))
         return redirect(url_for('load.load_single_meal', meal=selected))
 
-    # Show the load page with both lists so the user can choose what to load
+    # Show the load page with the saved planners and the meal picker
     return render_template('load.html',
                            len_meal_plans=len(meal_plans), meal_plans=meal_plans,
-                           len_meals=len(meals), meals=meals)
+                           page=page, has_next=has_next)
 
 @load.route('/load/<meal_plan>', methods=['GET', 'POST'])
 def load_meal_plan(meal_plan):
-    # Find the saved plan file on disk
-    plan_path = resolve_plan_path(meal_plan)
-    if not plan_path:
+    # Look the plan up in the plan store
+    plan = plan_store.load(meal_plan)
+    if plan is None:
         # If it does not exist, go back to the chooser page
         return redirect(url_for('load.choose_meal_plan'))
 
-    # Load the JSON meal plan into the session so the display page can render it
-    with plan_path.open("r", encoding="utf-8") as f:
-        session['complete_ingredient_dict'] = json.load(f)
+    # Load the meal plan into the session so the display page can render it
+    session['complete_ingredient_dict'] = plan
 
     return redirect(url_for('display.display_meal_plan'))
 
@@ -113,30 +71,18 @@ def load_meal_plan(meal_plan):
 @load.route('/load/meal/<meal>', methods=['GET'])
 def load_single_meal(meal):
     """Build a complete_ingredient_dict for a single meal from the DB and display it."""
-    # Fetch ingredient buckets for the selected meal from the database
-    row = execute_mysql_query(
-        """
-        SELECT Fresh_Ingredients, Tinned_Ingredients, Dry_Ingredients, Dairy_Ingredients
-        FROM MealsTable WHERE Name = :name
-        """,
-        {"name": meal},
-        fetch="one",
-    )
+    # Fetch the parsed ingredient buckets for the selected meal from the catalogue cache
+    row = catalogue.get_meal(meal)
     if not row:
         return redirect(url_for('load.choose_meal_plan'))
 
-    # Convert JSON values into Python dictionaries, treating empty/null as {}
-    def _loads(v):
-        if v in (None, "", "null"):
-            return {}
-        return json.loads(v)
-
     # Build the same structure used by the create flow so the display page works normally
+    # (copies are taken because the cached record is shared between requests)
     complete_ingredient_dict = {
-        "Fresh_Ingredients": _loads(row.get("Fresh_Ingredients")),
-        "Tinned_Ingredients": _loads(row.get("Tinned_Ingredients")),
-        "Dry_Ingredients": _loads(row.get("Dry_Ingredients")),
-        "Dairy_Ingredients": _loads(row.get("Dairy_Ingredients")),
+        "Fresh_Ingredients": dict(row["Fresh_Ingredients"]),
+        "Tinned_Ingredients": dict(row["Tinned_Ingredients"]),
+        "Dry_Ingredients": dict(row["Dry_Ingredients"]),
+        "Dairy_Ingredients": dict(row["Dairy_Ingredients"]),
         "Extra_Ingredients": [],
         "Meal_List": [meal],
     }
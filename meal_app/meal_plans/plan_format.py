@@ -0,0 +1,148 @@
+"""
+Compact on-disk format for saved meal plans.
+
+Layout of a version 1 file:
+
+    b"MPLN"                 magic
+    1 byte                  format version
+    4 bytes, big-endian     header length
+    header                  UTF-8 JSON: meal list, counts and anything else that
+                            listing a plan needs, readable without the body
+    body                    zlib-compressed UTF-8 JSON of the plan, with every
+                            ingredient name interned into one shared name table
+
+Per-meal breakdowns are stored as [name ID, quantity] pairs. The combined totals are
+left out whenever re-collating the per-meal breakdowns reproduces them exactly, and
+are stored explicitly otherwise, so decoding always returns the same plan that was
+encoded. Files that do not start with the magic are read as plain JSON, which keeps
+plans saved as .json or extension-less files loadable.
+"""
+import json
+import struct
+import zlib
+from ..utilities import INGREDIENT_BUCKETS
+
+MAGIC = b"MPLN"
+FORMAT_VERSION = 1
+FILE_SUFFIX = ".plan"
+_PREFIX = struct.Struct(">4sBI")
+
+
+class PlanFormatError(ValueError):
+    """Raised when a plan file cannot be decoded."""
+
+
+def _intern_bucket(bucket, table, ids) -> list:
+    # Replace ingredient names with their position in the shared name table
+    pairs = []
+    for name, quantity in (bucket or {}).items():
+        if name not in ids:
+            ids[name] = len(table)
+            table.append(name)
+        pairs.append([ids[name], quantity])
+    return pairs
+
+
+def _expand_bucket(pairs, table) -> dict:
+    return {table[i]: quantity for i, quantity in pairs}
+
+
+def _collated_totals(per_meal) -> dict:
+    from .create import collate_ingredients
+    return collate_ingredients(per_meal)
+
+
+def encode_plan(plan) -> bytes:
+    """Encode a complete_ingredient_dict into the compact binary format."""
+    table = []
+    ids = {}
+    per_meal = plan.get("Per_Meal_Ingredients") or []
+
+    body = {"names": table}
+    body["meals"] = [
+        {"Name": meal.get("Name"), **{b: _intern_bucket(meal.get(b), table, ids) for b in INGREDIENT_BUCKETS}}
+        for meal in per_meal
+    ]
+
+    # The totals can usually be rebuilt from the per-meal breakdowns, so only keep them when they can't
+    totals = {b: plan.get(b) or {} for b in INGREDIENT_BUCKETS}
+    if not per_meal or _collated_totals(per_meal) != totals:
+        body["totals"] = {b: _intern_bucket(totals[b], table, ids) for b in INGREDIENT_BUCKETS}
+
+    # Keep any other keys (extras, meal list, future additions) as they are
+    known = set(INGREDIENT_BUCKETS) | {"Per_Meal_Ingredients"}
+    body["other"] = {k: v for k, v in plan.items() if k not in known}
+
+    header = {
+        "meals": plan.get("Meal_List") or [],
+        "ingredient_count": len(table),
+        "has_per_meal": bool(per_meal),
+    }
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    body_bytes = zlib.compress(json.dumps(body, separators=(",", ":")).encode("utf-8"), 9)
+    return _PREFIX.pack(MAGIC, FORMAT_VERSION, len(header_bytes)) + header_bytes + body_bytes
+
+
+def is_compact(data) -> bool:
+    return data[:len(MAGIC)] == MAGIC
+
+
+def _split(data):
+    if len(data) < _PREFIX.size:
+        raise PlanFormatError("truncated plan file")
+    magic, version, header_length = _PREFIX.unpack_from(data)
+    if version != FORMAT_VERSION:
+        raise PlanFormatError(f"unsupported plan format version {version}")
+    header_end = _PREFIX.size + header_length
+    return data[_PREFIX.size:header_end], data[header_end:]
+
+
+def decode_plan(data) -> dict:
+    """Decode a plan file's bytes, accepting both the compact format and plain JSON."""
+    if not is_compact(data):
+        try:
+            plan = json.loads(data.decode("utf-8"))
+        except ValueError as exc:
+            raise PlanFormatError(str(exc)) from exc
+        if not isinstance(plan, dict):
+            raise PlanFormatError(f"expected a JSON object, got {type(plan).__name__}")
+        return plan
+
+    _, body_bytes = _split(data)
+    try:
+        body = json.loads(zlib.decompress(body_bytes).decode("utf-8"))
+    except (ValueError, zlib.error) as exc:
+        raise PlanFormatError(str(exc)) from exc
+
+    table = body["names"]
+    per_meal = [
+        {"Name": meal["Name"], **{b: _expand_bucket(meal[b], table) for b in INGREDIENT_BUCKETS}}
+        for meal in body["meals"]
+    ]
+    if "totals" in body:
+        totals = {b: _expand_bucket(body["totals"][b], table) for b in INGREDIENT_BUCKETS}
+    else:
+        totals = _collated_totals(per_meal)
+
+    plan = dict(totals)
+    plan.update(body["other"])
+    if per_meal:
+        plan["Per_Meal_Ingredients"] = per_meal
+    return plan
+
+
+def read_header(path) -> dict:
+    """
+    Read only the header of a plan file (meal list and counts) without decompressing the body.
+    Plain JSON plans have no header, so they are parsed and summarised instead.
+    """
+    with open(path, "rb") as f:
+        prefix = f.read(_PREFIX.size)
+        if is_compact(prefix):
+            header_bytes, _ = _split(prefix + f.read(_PREFIX.unpack(prefix)[2]))
+            return json.loads(header_bytes.decode("utf-8"))
+        plan = decode_plan(prefix + f.read())
+    return {
+        "meals": plan.get("Meal_List") or [],
+        "has_per_meal": bool(plan.get("Per_Meal_Ingredients")),
+    }
@@ -0,0 +1,244 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from .plan_format import FILE_SUFFIX, PlanFormatError, decode_plan, encode_plan, read_header
+
+# Name of the SQLite manifest kept at the top of the plan directory
+MANIFEST_NAME = "manifest.sqlite3"
+
+
+class PlanStore:
+    """
+    Repository of saved meal plans.
+
+    Plan files are sharded into subdirectories named after the first two hex digits of
+    the SHA-1 of the plan name, so no single directory grows without bound. A SQLite
+    manifest records each plan's name, file, created time, size and meal list; it is
+    updated in the same transaction as the file write or delete, so listing, counting
+    and resolving plans are indexed lookups and never touch the plan files themselves.
+
+    Plans are written in the compact format from plan_format.py. Plans saved before the
+    store existed (flat *.json or extension-less files in the old saved_meal_plans
+    folders) are converted and moved into the store the first time it is opened, and a
+    lost manifest is rebuilt from the plan file headers.
+    """
+
+    def __init__(self, root=None, legacy_dirs=()):
+        self.root = Path(root) if root else None
+        self.legacy_dirs = [Path(d) for d in legacy_dirs]
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def init_app(self, app):
+        """Point the store at SAVED_PLANS_DIR (default: <project>/saved_meal_plans)."""
+        app_root = Path(app.root_path)
+        project_root = app_root.parent
+        self.root = Path(app.config.get('SAVED_PLANS_DIR') or project_root / "saved_meal_plans")
+
+        # Older versions saved flat files here, relative to the working directory or inside the app package
+        self.legacy_dirs = [self.root, Path.cwd() / "saved_meal_plans", project_root / "saved_meal_plans",
+                            app_root / "saved_meal_plans"]
+        self._ready = False
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per operation; commits on success, rolls back on error
+        conn = sqlite3.connect(str(self.root / MANIFEST_NAME), timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _ensure_ready(self) -> None:
+        if self._ready:
+            return
+        with self._lock:
+            if self._ready:
+                return
+            self.root.mkdir(parents=True, exist_ok=True)
+            manifest_existed = (self.root / MANIFEST_NAME).exists()
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS plans (
+                        name       TEXT PRIMARY KEY,
+                        file       TEXT NOT NULL,
+                        created_at REAL NOT NULL,
+                        size       INTEGER NOT NULL,
+                        meals      TEXT NOT NULL
+                    )
+                    """
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_plans_created ON plans (created_at)")
+            if not manifest_existed:
+                self._reindex()
+            self._import_legacy_files()
+            self._ready = True
+
+    @staticmethod
+    def shard(name) -> str:
+        """Return the shard subdirectory for a plan name."""
+        return hashlib.sha1(name.encode("utf-8")).hexdigest()[:2]
+
+    def _relative_file(self, name) -> str:
+        return f"{self.shard(name)}/{name}{FILE_SUFFIX}"
+
+    def _reindex(self) -> None:
+        # Rebuild manifest rows from the plan files already in the shard directories,
+        # reading only each file's header
+        with self._connect() as conn:
+            for shard in sorted(self.root.iterdir()):
+                if not (shard.is_dir() and len(shard.name) == 2):
+                    continue
+                for path in shard.glob(f"*{FILE_SUFFIX}"):
+                    try:
+                        header = read_header(path)
+                        stat = path.stat()
+                    except (OSError, ValueError):
+                        continue
+                    conn.execute(
+                        "INSERT OR REPLACE INTO plans (name, file, created_at, size, meals) VALUES (?, ?, ?, ?, ?)",
+                        (path.stem, f"{shard.name}/{path.name}", stat.st_mtime, stat.st_size,
+                         json.dumps(header.get("meals", []))),
+                    )
+
+    def _write_file(self, relative, data) -> int:
+        # Write to a temporary file and rename it, so a plan file is never seen half-written
+        path = self.root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+        return len(data)
+
+    def _import_legacy_files(self) -> None:
+        # Move plans from the old flat folders into the sharded store; moved files are
+        # removed from the flat folders, so later starts find nothing left to import
+        for directory in dict.fromkeys(self.legacy_dirs):
+            if not directory.is_dir():
+                continue
+            for path in sorted(directory.iterdir()):
+                if not path.is_file() or path.name.startswith("."):
+                    continue
+                if path.suffix == ".json":
+                    name = path.stem
+                elif path.suffix == "":
+                    name = path.name
+                else:
+                    continue
+                try:
+                    plan = decode_plan(path.read_bytes())
+                except (OSError, PlanFormatError):
+                    continue
+                if self._exists(name):
+                    continue
+                self._save(name, plan, created_at=path.stat().st_mtime)
+                path.unlink()
+
+    def save(self, name, plan) -> Path:
+        """Store a plan under name, replacing any plan with that name. Returns the file path."""
+        self._ensure_ready()
+        return self._save(name, plan)
+
+    def _save(self, name, plan, created_at=None) -> Path:
+        relative = self._relative_file(name)
+        data = encode_plan(plan)
+        meals = json.dumps(plan.get("Meal_List", []) if isinstance(plan, dict) else [])
+
+        # The manifest row is written first and the file renamed into place before the
+        # transaction commits, so a failed file write never leaves a row without its file
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO plans (name, file, created_at, size, meals) VALUES (?, ?, ?, ?, ?)",
+                    (name, relative, created_at or time.time(), len(data), meals),
+                )
+                self._write_file(relative, data)
+        except sqlite3.Error:
+            # The commit failed after the rename: remove the file unless an earlier save still lists it
+            if not self._exists(name):
+                (self.root / relative).unlink(missing_ok=True)
+            raise
+        return self.root / relative
+
+    def load(self, name) -> dict | None:
+        """Return the saved plan called name, or None if there is no such plan."""
+        path = self.path(name)
+        if path is None:
+            return None
+        try:
+            return decode_plan(path.read_bytes())
+        except (OSError, PlanFormatError):
+            return None
+
+    def path(self, name) -> Path | None:
+        """Return the file holding the plan called name, or None."""
+        self._ensure_ready()
+        with self._connect() as conn:
+            row = conn.execute("SELECT file FROM plans WHERE name = ?", (name,)).fetchone()
+        return self.root / row["file"] if row else None
+
+    def exists(self, name) -> bool:
+        """Return True if a plan called name has been saved."""
+        self._ensure_ready()
+        return self._exists(name)
+
+    def _exists(self, name) -> bool:
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM plans WHERE name = ?", (name,)).fetchone() is not None
+
+    def delete(self, names) -> None:
+        """Remove the named plans from the manifest and from disk."""
+        self._ensure_ready()
+        files = []
+        with self._connect() as conn:
+            for name in names:
+                row = conn.execute("SELECT file FROM plans WHERE name = ?", (name,)).fetchone()
+                if row is None:
+                    continue
+                conn.execute("DELETE FROM plans WHERE name = ?", (name,))
+                files.append(row["file"])
+
+        # Files are removed only once the manifest no longer lists them
+        for relative in files:
+            (self.root / relative).unlink(missing_ok=True)
+
+    def count(self) -> int:
+        self._ensure_ready()
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM plans").fetchone()[0]
+
+    def names(self, offset=0, limit=None) -> list[str]:
+        """Return plan names in alphabetical order, one page at a time."""
+        self._ensure_ready()
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT name FROM plans ORDER BY name LIMIT ? OFFSET ?",
+                (-1 if limit is None else limit, offset),
+            ).fetchall()
+        return [r["name"] for r in rows]
+
+    def entries(self, offset=0, limit=None) -> list[dict]:
+        """Return manifest entries (name, created_at, size, meals), newest first."""
+        self._ensure_ready()
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT name, created_at, size, meals FROM plans ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                (-1 if limit is None else limit, offset),
+            ).fetchall()
+        return [
+            {"name": r["name"], "created_at": r["created_at"], "size": r["size"], "meals": json.loads(r["meals"])}
+            for r in rows
+        ]
+
+
+# Shared plan repository used by the create, display, load and delete pages
+plan_store = PlanStore()
@@ -1,7 +1,11 @@
 from flask import Blueprint, render_template, request, redirect, url_for
 import json
-from ..utilities import execute_mysql_query, parse_ingredients, get_tag_keys, get_tags
-from ..variables import staples_list, book_list, fresh_ingredients, tinned_ingredients, dry_ingredients, dairy_ingredients, tag_list
+from ..utilities import execute_mysql_query, parse_ingredients, sync_meal_ingredients
+from ..catalogue import catalogue
+from ..vocabulary import vocabulary
+from ..registry import registry
+from ..tags import tag_catalogue
+from ..variables import staples_list, book_list
 
 # Blueprint responsible for editing existing meals
 edit = Blueprint('edit', __name__, template_folder='templates', static_folder='../static')
@@ -9,51 +13,38 @@ edit = Blueprint('edit', __name__, template_folder='templates', static_folder='.
 
 @edit.route('/edit', methods=['GET', 'POST'])
 def index():
-    # Fetch all meal names so the user can choose which meal to edit
-    query_string = "SELECT Name FROM MealsTable;"
-    results = execute_mysql_query(query_string)
-    meals = [result['Name'] for result in results]
-
     if request.method == "POST":
         # Read the selected meal name from the form
         details = request.form
-        query_string = "SELECT * FROM MealsTable WHERE Name = :meal"
-        results = execute_mysql_query(query_string, {"meal": details['Meal']}, fetch="all")
+        record = catalogue.get_meal(details['Meal'])
+        if not record:
+            return f"No meal found with name {details['Meal']}", 404
 
         # Redirect to the edit page for the selected meal
-        return redirect(url_for('edit.edit_meal', meal=results[0]['Name']))
+        return redirect(url_for('edit.edit_meal', meal=record['Name']))
 
-    # Show the list of meals available for editing
-    return render_template('edit_list.html',
-                           len_meals=len(meals), meals=meals)
+    # Show the meal picker (names are suggested by the typeahead endpoint as the user types)
+    return render_template('edit_list.html')
 
 
 @edit.route('/edit/<meal>', methods=['GET', 'POST'])
 def edit_meal(meal):
     if request.method == "GET":
-        # Fetch the current data for the selected meal
-        query_string = "SELECT * FROM MealsTable WHERE Name = :meal"
-        results = execute_mysql_query(query_string, {"meal": meal}, fetch="all")
+        # Fetch the current data for the selected meal (served from the catalogue cache when possible)
+        row = catalogue.get_meal(meal)
 
         # If the meal does not exist, return a 404 error
-        if not results:
+        if not row:
             return f"No meal found with name {meal}", 404
 
-        row = results[0]
-
-        # Load existing ingredient JSON so it can be shown in the edit form
-        current_fresh_ingredients = json.loads(row['Fresh_Ingredients'])
-        current_tinned_ingredients = json.loads(row['Tinned_Ingredients'])
-        current_dry_ingredients = json.loads(row['Dry_Ingredients'])
-        current_dairy_ingredients = json.loads(row['Dairy_Ingredients'])
+        # Existing ingredient buckets are already parsed in the cached record
+        current_fresh_ingredients = row['Fresh_Ingredients']
+        current_tinned_ingredients = row['Tinned_Ingredients']
+        current_dry_ingredients = row['Dry_Ingredients']
+        current_dairy_ingredients = row['Dairy_Ingredients']
 
         # Store current tag values so checkboxes can be pre-selected
-        current_tags = [
-            row['Spring_Summer'],
-            row['Autumn_Winter'],
-            row['Quick_Easy'],
-            row['Special']
-        ]
+        current_tags = tag_catalogue.flags(row['Tags_Mask'])
 
         # Render the edit form with existing meal data pre-filled
         return render_template(
@@ -70,23 +61,30 @@ def edit_meal(meal):
             current_dairy_ingredients_keys=list(current_dairy_ingredients.keys()),
             len_staples=len(staples_list), staples=staples_list,
             len_books=len(book_list), books=book_list,
-            len_fresh_ingredients=len(fresh_ingredients),
-            fresh_ingredients=[ingredient[0] for ingredient in fresh_ingredients],
-            fresh_ingredients_units=[ingredient[1] for ingredient in fresh_ingredients],
-            len_tinned_ingredients=len(tinned_ingredients),
-            tinned_ingredients=[ingredient[0] for ingredient in tinned_ingredients],
-            tinned_ingredients_units=[ingredient[1] for ingredient in tinned_ingredients],
-            len_dry_ingredients=len(dry_ingredients),
-            dry_ingredients=[ingredient[0] for ingredient in dry_ingredients],
-            dry_ingredients_units=[ingredient[1] for ingredient in dry_ingredients],
-            len_dairy_ingredients=len(dairy_ingredients),
-            dairy_ingredients=[ingredient[0] for ingredient in dairy_ingredients],
-            dairy_ingredients_units=[ingredient[1] for ingredient in dairy_ingredients],
-            len_tags=len(tag_list), tags=tag_list,
+            len_fresh_ingredients=len(registry.names("Fresh_Ingredients")),
+            fresh_ingredients=registry.names("Fresh_Ingredients"),
+            fresh_ingredients_units=registry.units("Fresh_Ingredients"),
+            len_tinned_ingredients=len(registry.names("Tinned_Ingredients")),
+            tinned_ingredients=registry.names("Tinned_Ingredients"),
+            tinned_ingredients_units=registry.units("Tinned_Ingredients"),
+            len_dry_ingredients=len(registry.names("Dry_Ingredients")),
+            dry_ingredients=registry.names("Dry_Ingredients"),
+            dry_ingredients_units=registry.units("Dry_Ingredients"),
+            len_dairy_ingredients=len(registry.names("Dairy_Ingredients")),
+            dairy_ingredients=registry.names("Dairy_Ingredients"),
+            dairy_ingredients_units=registry.units("Dairy_Ingredients"),
+            len_tags=len(tag_catalogue.labels()), tags=tag_catalogue.labels(),
             current_tags=current_tags
         )
 
     if request.method == "POST":
+        # Keep the old ingredients so the search vocabulary can be updated incrementally
+        old_record = catalogue.get_meal(meal)
+
+        # A meal renamed or deleted since the form was opened cannot be updated
+        if not old_record:
+            return f"No meal found with name {meal}", 404
+
         # Convert submitted form data into a dictionary
         details = request.form
         details_dict = details.to_dict()
@@ -97,12 +95,13 @@ def edit_meal(meal):
         dry_ing = parse_ingredients(details_dict, "Dry ")
         dairy_ing = parse_ingredients(details_dict, "Dairy ")
 
-        # Collect selected tag values from the form
+        # Collect selected tag values from the form and encode them as one Tags_Mask value
+        labels = set(tag_catalogue.labels())
         tag_values = []
         for key in list(details_dict.keys()):
-            if 'Tag' in key:
+            if 'Tag' in key and details_dict[key] in labels:
                 tag_values.append(details_dict[key])
-        tags = get_tags(tag_values)
+        tags_mask = tag_catalogue.mask(tag_values)
 
         # SQL query used to update the meal with edited values
         query_string = """
@@ -116,10 +115,7 @@ def edit_meal(meal):
             Tinned_Ingredients = :tinned_ing,
             Dry_Ingredients = :dry_ing,
             Dairy_Ingredients = :dairy_ing,
-            Spring_Summer = :spring,
-            Autumn_Winter = :autumn,
-            Quick_Easy = :quick,
-            Special = :special
+            Tags_Mask = :tags_mask
         WHERE Name = :meal
         """
 
@@ -134,15 +130,25 @@ def edit_meal(meal):
             "tinned_ing": tinned_ing,
             "dry_ing": dry_ing,
             "dairy_ing": dairy_ing,
-            "spring": tags['Spring_Summer'],
-            "autumn": tags['Autumn_Winter'],
-            "quick": tags['Quick_Easy'],
-            "special": tags['Special'],
+            "tags_mask": tags_mask,
             "meal": meal
         }
 
         # Execute the update and redirect to the confirmation page
         execute_mysql_query(query_string, params, fetch="none")
+
+        # Rebuild the normalized ingredient mapping from the edited buckets
+        buckets = {
+            "Fresh_Ingredients": fresh_ing,
+            "Tinned_Ingredients": tinned_ing,
+            "Dry_Ingredients": dry_ing,
+            "Dairy_Ingredients": dairy_ing,
+        }
+        sync_meal_ingredients(details['Name'], buckets)
+
+        # Drop the cached copies of the old and new names
+        catalogue.invalidate([meal, details['Name']])
+        vocabulary.apply(old_record, buckets)
         return redirect(url_for('edit.confirmation', meal=details['Name']))
 
 
@@ -177,14 +183,8 @@ def confirmation(meal):
         dairy_ingredients = [list(json.loads(row['Dairy_Ingredients']).keys()),
                              list(json.loads(row['Dairy_Ingredients']).values())]
 
-        # Convert stored tag flags into readable tag labels
-        tags = [
-            {"Spring/Summer": row['Spring_Summer']},
-            {"Autumn/Winter": row['Autumn_Winter']},
-            {"Quick/Easy": row['Quick_Easy']},
-            {"Special": row['Special']}
-        ]
-        tags = get_tag_keys(tags)
+        # Convert the stored tag mask into readable tag labels
+        tags = tag_catalogue.decode(row['Tags_Mask'])
 
         # Render the confirmation page showing the updated meal details
         return render_template(
@@ -1,56 +1,65 @@
-from flask import Blueprint, render_template, request
-import json
+from flask import Blueprint, current_app, render_template, request
 from datetime import datetime
-from ..utilities import execute_mysql_query
-from ..variables import tag_list
+from ..catalogue import catalogue
+from ..inspiration import inspiration
+from ..tags import tag_catalogue
+from ..http_cache import conditional
 
 # Blueprint responsible for suggesting meals based on selected tags
 inspire = Blueprint('inspire', __name__, template_folder='templates', static_folder='../static')
 
 
 @inspire.route('/inspire', methods=['GET', 'POST'])
+@conditional()
 def index():
     if request.method == "POST":
-        # Read submitted form data
+        # Read submitted form data: any number of tags (all or any of them) and staples (any of them)
         details = request.form
+        tag_list = tag_catalogue.labels()
+        tags = [t for t in details.getlist('Tag') if t in tag_list]
+        match = "any" if details.get('Match') == "any" else "all"
+        staples = [s for s in details.getlist('Staple') if s and s != 'null']
+        max_count = current_app.config.get('INSPIRE_SUGGESTIONS', 10)
+        count = min(max(details.get('Count', max_count, type=int), 1), max_count)
 
-        # Replace "/" with "_" so the tag matches the database column name
-        tag = details['Tag'].replace('/', '_')
-
-        # Build a query to find meals matching the selected tag
-        # This is safe because the tag comes from a predefined list
-        query_string = f"""
-        SELECT Name, Staple, Last_Made
-        FROM MealsTable
-        WHERE {tag} = 1
-        ORDER BY Name;
-        """
-
-        # Execute the query and fetch all matching meals
-        results = execute_mysql_query(query_string, fetch="all")
+        # Draw suggestions from the in-memory pool for this combination, favouring
+        # meals that have not been made for a long time
+        results = inspiration.suggest(tags, staples, k=count, match=match)
 
         # Extract meal names, staples, and last-made dates for display
         meal_names = [meal['Name'] for meal in results]
-        staples = [meal['Staple'] for meal in results]
+        staples_made = [meal['Staple'] for meal in results]
         last_date = [
             datetime.strftime(meal['Last_Made'], "%d-%m-%Y")
             if meal['Last_Made'] else ""
             for meal in results
         ]
 
+        # Heading such as "Quick/Easy & Special & Rice or Pasta"
+        label = [(" | " if match == "any" else " & ").join(tags)] if tags else []
+        if staples:
+            label.append(" or ".join(staples))
+
         # Show the results page with the suggested meals
         return render_template(
             'inspire_results.html',
-            tag=details['Tag'],
+            tag=" & ".join(label) or "All",
+            selected_tags=tags,
+            selected_staples=staples,
+            match=match,
+            count=count,
             len_meals=len(meal_names),
             meal_names=meal_names,
-            staples=staples,
+            staples=staples_made,
             last_date=last_date
         )
 
-    # For GET requests, show the tag selection page
+    # For GET requests, show the tag and staple selection page
+    tag_list = tag_catalogue.labels()
     return render_template(
         'inspire.html',
         len_tags=len(tag_list),
-        tags=tag_list
+        tags=tag_list,
+        staple_options=sorted(s for s in catalogue.staples_dict() if s),
+        count=current_app.config.get('INSPIRE_SUGGESTIONS', 10)
     )
@@ -1,49 +1,138 @@
-from flask import Blueprint, render_template, request, redirect, url_for
+from flask import Blueprint, render_template, request, redirect, url_for, current_app
+import base64
 import json
-from datetime import datetime
-from ..utilities import execute_mysql_query
+from datetime import datetime, date
+from ..utilities import execute_mysql_query, keyset_condition
+from ..catalogue import catalogue
+from ..http_cache import conditional
+from ..fragments import fragment_cache
 
 # Blueprint responsible for listing all meals in the database
 list_meals = Blueprint('list_meals', __name__, template_folder='templates', static_folder='../static')
 
+# Sort options offered on the page: URL value -> (column heading, sort columns)
+# Meal_ID is always appended as the final tie-breaker so every row has a unique position
+# Each ordering is backed by a MealsTable index (uk_meal_name, idx_book_page, idx_staple_name, idx_last_made)
+SORT_OPTIONS = {
+    "book": ("Book/Page", ["Book", "Page_Number"]),
+    "name": ("Meal", ["Name"]),
+    "staple": ("Staple", ["Staple", "Name"]),
+    "last_made": ("Last Made", ["Last_Made"]),
+}
+DEFAULT_SORT = "book"
+
+
+def encode_cursor(values) -> str:
+    """Encode the sort values of the last row on a page into a URL-safe cursor."""
+    plain = [v.isoformat() if isinstance(v, (datetime, date)) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(plain).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor, length) -> list | None:
+    """Decode a cursor produced by encode_cursor; returns None if it is missing or invalid."""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != length:
+        return None
+    # Only plain sort values are accepted, and the final tie-breaker is always a Meal_ID
+    if any(isinstance(v, bool) or not isinstance(v, (str, int, float, type(None))) for v in values):
+        return None
+    if not isinstance(values[-1], int):
+        return None
+    return values
+
+
+def fetch_meal_page(sort, cursor_values, page_size) -> tuple[list, list | None]:
+    """
+    Fetch one page of meals in the requested order, starting after the cursor.
+    Returns the rows and the cursor values for the next page (None on the last page).
+    """
+    columns = SORT_OPTIONS[sort][1] + ["Meal_ID"]
+
+    where = ""
+    params = {"limit": page_size + 1}
+    if cursor_values is not None:
+        condition, cursor_params = keyset_condition(columns, cursor_values)
+        where = f"WHERE {condition}"
+        params.update(cursor_params)
+
+    # Only the displayed columns are selected; one extra row tells us whether a next page exists
+    query_string = f"""
+    SELECT Meal_ID, Name, Staple, Book, Page_Number, Last_Made
+    FROM MealsTable
+    {where}
+    ORDER BY {", ".join(columns)}
+    LIMIT :limit;
+    """
+    results = execute_mysql_query(query_string, params, fetch="all") or []
+
+    next_values = None
+    if len(results) > page_size:
+        results = results[:page_size]
+        next_values = [results[-1][column] for column in columns]
+    return results, next_values
+
+
+def render_list_page(sort, cursor_values, start) -> str:
+    """Render one page of the meal list."""
+    # Fetch one page of meals using keyset pagination
+    page_size = current_app.config.get('LIST_PAGE_SIZE', 50)
+    results, next_values = fetch_meal_page(sort, cursor_values, page_size)
+
+    # Extract individual columns into lists for easier rendering in the template
+    meal_names = [meal['Name'] for meal in results]
+    staples = [meal['Staple'] for meal in results]
+    books = [meal['Book'] for meal in results]
+    pages = [meal['Page_Number'] for meal in results]
+
+    # Format the Last_Made date for display, if available
+    last_dates = [
+        datetime.strftime(meal['Last_Made'], "%d-%m-%Y")
+        if meal['Last_Made'] else ""
+        for meal in results
+    ]
+
+    # Link to the next page, if there is one
+    next_url = None
+    if next_values is not None:
+        next_url = url_for('list_meals.index', sort=sort,
+                           after=encode_cursor(next_values), start=start + len(results))
+
+    return render_template(
+        'list_meals.html',
+        total_meals=len(catalogue.meal_names()),
+        len_meals=len(meal_names),
+        meal_names=meal_names,
+        staples=staples,
+        books=books,
+        page=pages,
+        last_date=last_dates,
+        start=start,
+        sort=sort,
+        sort_options={key: label for key, (label, _) in SORT_OPTIONS.items()},
+        next_url=next_url,
+    )
+
 
 @list_meals.route('/list_meals', methods=['GET', 'POST'])
+@conditional()
 def index():
     if request.method == "GET":
-        # Fetch all meals from the database
-        # Meals are ordered first by book name and then by page number
-        query_string = """
-        SELECT *, CAST(Page AS SIGNED) AS Page
-        FROM MealsTable
-        ORDER BY Book, Page;
-        """
-        results = execute_mysql_query(query_string, fetch="all")
-
-        # Extract individual columns into lists for easier rendering in the template
-        meal_names = [meal['Name'] for meal in results]
-        staples = [meal['Staple'] for meal in results]
-        books = [meal['Book'] for meal in results]
-        pages = [meal['Page'] for meal in results]
-        websites = [meal['Website'] for meal in results]
-
-        # Format the Last_Made date for display, if available
-        last_dates = [
-            datetime.strftime(meal['Last_Made'], "%d-%m-%Y")
-            if meal['Last_Made'] else ""
-            for meal in results
-        ]
-
-        # Render the page showing the complete list of meals
-        return render_template(
-            'list_meals.html',
-            len_meals=len(meal_names),
-            meal_names=meal_names,
-            staples=staples,
-            books=books,
-            page=pages,
-            website=websites,
-            last_date=last_dates
-        )
+        # Read the sort order, cursor and running row number from the query string
+        sort = request.args.get('sort', DEFAULT_SORT)
+        if sort not in SORT_OPTIONS:
+            sort = DEFAULT_SORT
+        columns = SORT_OPTIONS[sort][1] + ["Meal_ID"]
+        cursor_values = decode_cursor(request.args.get('after'), len(columns))
+        start = request.args.get('start', 1, type=int) if cursor_values is not None else 1
+
+        # Rendered pages are reused until the catalogue changes (any write publishes a new stamp)
+        key = ("list_meals", catalogue.stamp()[0], sort, tuple(cursor_values or ()), start)
+        return fragment_cache.get_or_render(key, lambda: render_list_page(sort, cursor_values, start))
 
     elif request.method == "POST" and request.form.get('submit'):
         # When a meal name is clicked, redirect to the detailed meal view
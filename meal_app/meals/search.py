@@ -1,26 +1,48 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session
-import json
+from flask import Blueprint, render_template, request, redirect, url_for, session, current_app
 from ..utilities import execute_mysql_query
+from ..vocabulary import vocabulary
+from ..pantry import pantry_index
+from ..http_cache import conditional
 
 # Blueprint responsible for searching meals by ingredient
 search = Blueprint('search', __name__, template_folder='templates', static_folder='../static')
 
 
-@search.route('/search', methods=['GET', 'POST'])
-def index():
-    # Fetch ingredient JSON columns from the database to build dropdown lists
-    query_string = """
-    SELECT Fresh_Ingredients, Tinned_Ingredients, Dry_Ingredients, Dairy_Ingredients
-    FROM MealsTable
-    WHERE JSON_LENGTH(Fresh_Ingredients) > 0;
+def meals_with_ingredient(ingredient, category=None) -> list[str]:
     """
-    results = execute_mysql_query(query_string, fetch="all")
+    Return the names of the meals that use an ingredient, in one category or in any.
+
+    The lookup goes through the indexed MealIngredients mapping
+    (Ingredients.Ingredient_Name -> MealIngredients(Ingredient_ID, Category) -> MealsTable).
+    """
+    if category:
+        query = """
+        SELECT m.Name
+        FROM Ingredients i
+        JOIN MealIngredients mi ON mi.Ingredient_ID = i.Ingredient_ID AND mi.Category = :category
+        JOIN MealsTable m ON m.Meal_ID = mi.Meal_ID
+        WHERE i.Ingredient_Name = :ingredient;
+        """
+    else:
+        query = """
+        SELECT DISTINCT m.Name
+        FROM Ingredients i
+        JOIN MealIngredients mi ON mi.Ingredient_ID = i.Ingredient_ID
+        JOIN MealsTable m ON m.Meal_ID = mi.Meal_ID
+        WHERE i.Ingredient_Name = :ingredient;
+        """
+    results = execute_mysql_query(query, {"ingredient": ingredient, "category": category}, fetch="all") or []
+    return [row['Name'] for row in results]
 
-    # Collect unique ingredient names for each category across all meals
-    fresh_ingredients = sorted({key for r in results for key in json.loads(r['Fresh_Ingredients']).keys()})
-    tinned_ingredients = sorted({key for r in results for key in json.loads(r['Tinned_Ingredients']).keys()})
-    dry_ingredients = sorted({key for r in results for key in json.loads(r['Dry_Ingredients']).keys()})
-    dairy_ingredients = sorted({key for r in results for key in json.loads(r['Dairy_Ingredients']).keys()})
+
+@search.route('/search', methods=['GET', 'POST'])
+@conditional()
+def index():
+    # Sorted ingredient names for each category, served from the in-memory vocabulary
+    fresh_ingredients = vocabulary.ingredients("Fresh_Ingredients")
+    tinned_ingredients = vocabulary.ingredients("Tinned_Ingredients")
+    dry_ingredients = vocabulary.ingredients("Dry_Ingredients")
+    dairy_ingredients = vocabulary.ingredients("Dairy_Ingredients")
 
     if request.method == "POST":
         # Convert submitted form data into a dictionary
@@ -44,17 +66,8 @@ def index():
             ingredient = details_dict[json_key]
 
         if ingredient and json_key:
-            # Build a query to find meals that contain the selected ingredient
-            # This is safe because the ingredient name comes from controlled dropdown lists
-            query = f"""
-            SELECT *
-            FROM MealsTable
-            WHERE JSON_EXTRACT({json_key}, '$."{ingredient}"') IS NOT NULL;
-            """
-            results = execute_mysql_query(query, fetch="all")
-
             # Store matching meal names in the session so they can be displayed on the results page
-            session['meal_list'] = [row['Name'] for row in results]
+            session['meal_list'] = meals_with_ingredient(ingredient, json_key)
 
             return redirect(url_for('search.search_results', ingredient=ingredient))
 
@@ -75,17 +88,8 @@ def search_results(ingredient):
         meals = session.pop('meal_list', None)
 
         if not meals:
-            # Fallback: search for the ingredient across all ingredient categories directly
-            query = f"""
-            SELECT Name
-            FROM MealsTable
-            WHERE JSON_EXTRACT(Fresh_Ingredients, '$."{ingredient}"') IS NOT NULL
-               OR JSON_EXTRACT(Tinned_Ingredients, '$."{ingredient}"') IS NOT NULL
-               OR JSON_EXTRACT(Dry_Ingredients, '$."{ingredient}"') IS NOT NULL
-               OR JSON_EXTRACT(Dairy_Ingredients, '$."{ingredient}"') IS NOT NULL;
-            """
-            results = execute_mysql_query(query, fetch="all")
-            meals = [row['Name'] for row in results]
+            # Fallback: search for the ingredient across all ingredient categories
+            meals = meals_with_ingredient(ingredient)
 
         # Render the results page showing meals that use the selected ingredient
         return render_template(
@@ -97,3 +101,41 @@ def search_results(ingredient):
     else:
         # Redirect back to the search page for non-GET requests
         return redirect(url_for('search.index'))
+
+
+@search.route('/pantry', methods=['GET'])
+@conditional()
+def pantry():
+    # Ingredients on hand and the search mode are passed in the query string
+    selected = request.args.getlist('pantry')
+    mode = request.args.get('mode', 'only')
+    if mode not in ('only', 'rank'):
+        mode = 'only'
+    max_missing = request.args.get('max_missing', type=int)
+
+    # Answer the search from the in-memory inverted index
+    results = None
+    if selected:
+        results = pantry_index.search(
+            selected,
+            mode=mode,
+            max_missing=max_missing,
+            limit=current_app.config.get('PANTRY_RESULT_LIMIT', 50),
+        )
+
+    # Offer every known ingredient, grouped by category
+    categories = {
+        "Fresh": vocabulary.ingredients("Fresh_Ingredients"),
+        "Tinned": vocabulary.ingredients("Tinned_Ingredients"),
+        "Dry": vocabulary.ingredients("Dry_Ingredients"),
+        "Dairy": vocabulary.ingredients("Dairy_Ingredients"),
+    }
+
+    return render_template(
+        'pantry.html',
+        categories=categories,
+        selected=set(selected),
+        mode=mode,
+        max_missing=max_missing,
+        results=results,
+    )
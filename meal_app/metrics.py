@@ -0,0 +1,196 @@
+import bisect
+import threading
+import time
+from flask import Blueprint, Response, current_app, g, has_request_context, request
+from jinja2 import Template
+
+# Blueprint exposing the collected metrics in Prometheus text format
+metrics_bp = Blueprint('metrics', __name__)
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """Fixed-bucket histogram with Prometheus-style cumulative output."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def lines(self, name, labels) -> list[str]:
+        out = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            out.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        out.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        out.append(f'{name}_sum{{{labels}}} {self.total:.6f}')
+        out.append(f'{name}_count{{{labels}}} {self.count}')
+        return out
+
+
+class MetricsRegistry:
+    """
+    Thread-safe store of per-endpoint database and render metrics.
+
+    Every metric is labelled with the Flask endpoint that produced it
+    (e.g. "find.some_meal_page"); work done outside a request is labelled "none".
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queries = {}
+        self.rows = {}
+        self.query_seconds = {}
+        self.render_seconds = {}
+        self.request_seconds = {}
+        self.queries_per_request = {}
+        # Extra sources of metric lines, e.g. cache counters (see add_collector)
+        self._collectors = []
+
+    def add_collector(self, collect) -> None:
+        """Register a callable returning extra exposition lines for render_prometheus."""
+        if collect not in self._collectors:
+            self._collectors.append(collect)
+
+    @staticmethod
+    def _histogram(store, endpoint, buckets) -> Histogram:
+        if endpoint not in store:
+            store[endpoint] = Histogram(buckets)
+        return store[endpoint]
+
+    def observe_query(self, endpoint, seconds, rows) -> None:
+        with self._lock:
+            self.queries[endpoint] = self.queries.get(endpoint, 0) + 1
+            self.rows[endpoint] = self.rows.get(endpoint, 0) + rows
+            self._histogram(self.query_seconds, endpoint, LATENCY_BUCKETS).observe(seconds)
+
+    def observe_render(self, endpoint, seconds) -> None:
+        with self._lock:
+            self._histogram(self.render_seconds, endpoint, LATENCY_BUCKETS).observe(seconds)
+
+    def observe_request(self, endpoint, seconds, queries) -> None:
+        with self._lock:
+            self._histogram(self.request_seconds, endpoint, LATENCY_BUCKETS).observe(seconds)
+            self._histogram(self.queries_per_request, endpoint, QUERY_COUNT_BUCKETS).observe(queries)
+
+    def render_prometheus(self) -> str:
+        """Return every metric in the Prometheus text exposition format."""
+        counters = [
+            ("meal_app_db_queries_total", "SQL statements executed", self.queries),
+            ("meal_app_db_rows_total", "Rows returned by SQL statements", self.rows),
+        ]
+        histograms = [
+            ("meal_app_db_query_seconds", "SQL statement latency", self.query_seconds),
+            ("meal_app_render_seconds", "Jinja template render time", self.render_seconds),
+            ("meal_app_request_seconds", "Request handling time", self.request_seconds),
+            ("meal_app_db_queries_per_request", "SQL statements issued per request", self.queries_per_request),
+        ]
+
+        lines = []
+        with self._lock:
+            for name, help_text, store in counters:
+                lines.extend(_header(name, "counter", help_text))
+                for endpoint in sorted(store):
+                    lines.append(f'{name}{{{_labels(endpoint)}}} {store[endpoint]}')
+            for name, help_text, store in histograms:
+                lines.extend(_header(name, "histogram", help_text))
+                for endpoint in sorted(store):
+                    lines.extend(store[endpoint].lines(name, _labels(endpoint)))
+        for collect in self._collectors:
+            lines.extend(collect())
+        return "\n".join(lines) + "\n"
+
+
+def _labels(endpoint) -> str:
+    # Escape the label value as required by the text exposition format
+    value = str(endpoint).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'endpoint="{value}"'
+
+
+def _header(name, kind, help_text) -> list[str]:
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+
+
+def format_metrics(values) -> list[str]:
+    """Exposition lines for unlabelled metrics given as (name, kind, help text, value) tuples."""
+    lines = []
+    for name, kind, help_text, value in values:
+        lines.extend(_header(name, kind, help_text))
+        lines.append(f"{name} {value}")
+    return lines
+
+
+# Shared registry used by the database helper, templates and request hooks
+metrics = MetricsRegistry()
+
+
+def current_endpoint() -> str:
+    """Return the endpoint label for the code that is currently running."""
+    if has_request_context():
+        return request.endpoint or "unknown"
+    return "none"
+
+
+def record_query(query_string, seconds, rows) -> None:
+    """
+    Record one executed SQL statement.
+    Statements slower than SLOW_QUERY_MS are also written to the application log.
+    """
+    endpoint = current_endpoint()
+    metrics.observe_query(endpoint, seconds, rows)
+    if has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
+
+    slow_ms = current_app.config.get('SLOW_QUERY_MS')
+    if slow_ms is not None and seconds * 1000 >= slow_ms:
+        current_app.logger.warning(
+            "Slow query (%.1f ms, %d rows) on %s: %s",
+            seconds * 1000, rows, endpoint, " ".join(query_string.split()),
+        )
+
+
+class TimedTemplate(Template):
+    """Jinja template class that records how long each top-level render takes."""
+
+    def render(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            metrics.observe_render(current_endpoint(), time.perf_counter() - start)
+
+
+def init_app(app) -> None:
+    """Install the render timer, per-request hooks and the /metrics route."""
+    # Templates are compiled lazily, so this applies to every template the app loads
+    app.jinja_env.template_class = TimedTemplate
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        g.query_count = 0
+
+    @app.after_request
+    def record_request(response):
+        started = g.get('request_started')
+        if started is not None:
+            metrics.observe_request(current_endpoint(), time.perf_counter() - started, g.get('query_count', 0))
+        return response
+
+    app.register_blueprint(metrics_bp)
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def show_metrics():
+    # Serve the metrics in the format Prometheus scrapes
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
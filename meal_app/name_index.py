@@ -0,0 +1,112 @@
+import bisect
+import threading
+
+
+def normalise(text) -> str:
+    """Casefold a name or query and collapse runs of whitespace."""
+    return " ".join(str(text).casefold().split())
+
+
+def trigrams(text) -> set[str]:
+    """Return the padded character trigrams of an already-normalised string."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """
+    Typo-tolerant search index over meal names, used by the typeahead endpoint.
+
+    Three structures are built from the catalogue's name list:
+    - the normalised names in sorted order, for whole-name prefix lookups with bisect
+    - every word of every name in sorted order, for word-prefix lookups
+    - trigram posting lists, for fuzzy matches that survive typos and missing letters
+
+    Matches are ranked whole-name prefix first, then word prefix, then by trigram
+    similarity, with shorter names ahead of longer ones inside each tier.
+    The index is rebuilt on first use whenever the catalogue hands back a new name list.
+    """
+
+    def __init__(self, min_similarity=0.5):
+        self.min_similarity = min_similarity
+        self._lock = threading.Lock()
+        self._source = None
+        self._index = None
+
+    @staticmethod
+    def _build(names) -> dict:
+        keys = [normalise(name) for name in names]
+        words = []
+        postings = {}
+        for position, key in enumerate(keys):
+            for word in set(key.split()):
+                words.append((word, position))
+            for gram in trigrams(key):
+                postings.setdefault(gram, []).append(position)
+        return {
+            "names": list(names),
+            "keys": keys,
+            "sorted_keys": sorted((key, position) for position, key in enumerate(keys)),
+            "sorted_words": sorted(words),
+            "postings": postings,
+        }
+
+    def _data(self) -> dict:
+        from .catalogue import catalogue
+
+        names = catalogue.meal_names()
+        with self._lock:
+            if self._index is not None and self._source is names:
+                return self._index
+
+        index = self._build(names)
+        with self._lock:
+            self._source = names
+            self._index = index
+        return index
+
+    @staticmethod
+    def _prefix_positions(sorted_pairs, prefix) -> list[int]:
+        # Every entry starting with prefix sits in one contiguous run of the sorted list
+        start = bisect.bisect_left(sorted_pairs, (prefix,))
+        positions = []
+        for key, position in sorted_pairs[start:]:
+            if not key.startswith(prefix):
+                break
+            positions.append(position)
+        return positions
+
+    def search(self, query, limit=10) -> list[str]:
+        """Return up to limit meal names matching query, best match first."""
+        q = normalise(query)
+        if not q or limit <= 0:
+            return []
+        index = self._data()
+        keys = index["keys"]
+
+        # Tier 0: the whole name starts with the query; tier 1: one of its words does
+        best = {}
+        for position in self._prefix_positions(index["sorted_keys"], q):
+            best[position] = (0, 0.0)
+        for position in self._prefix_positions(index["sorted_words"], q):
+            best.setdefault(position, (1, 0.0))
+
+        # Tier 2: enough of the query's trigrams appear in the name, which tolerates typos
+        query_grams = trigrams(q)
+        shared = {}
+        for gram in query_grams:
+            for position in index["postings"].get(gram, ()):
+                shared[position] = shared.get(position, 0) + 1
+        for position, count in shared.items():
+            if position in best:
+                continue
+            similarity = count / len(query_grams)
+            if similarity >= self.min_similarity:
+                best[position] = (2, -similarity)
+
+        ranked = sorted(best, key=lambda p: (best[p], len(keys[p]), keys[p]))
+        return [index["names"][p] for p in ranked[:limit]]
+
+
+# Shared index instance used by the typeahead endpoint
+name_index = NameIndex()
@@ -0,0 +1,212 @@
+import threading
+import time
+from .utilities import execute_mysql_query
+
+
+def _iter_bits(bits) -> list[int]:
+    # Positions of the set bits, lowest first (scanning the binary string avoids a shift per bit)
+    digits = format(bits, "b")[::-1]
+    positions = []
+    i = digits.find("1")
+    while i != -1:
+        positions.append(i)
+        i = digits.find("1", i + 1)
+    return positions
+
+
+def _bit_slices(values) -> list[int]:
+    # Store one small counter per meal "vertically": slice j holds bit j of every counter
+    slices = []
+    for position, value in enumerate(values):
+        j = 0
+        while value:
+            if value & 1:
+                while len(slices) <= j:
+                    slices.append(0)
+                slices[j] |= 1 << position
+            value >>= 1
+            j += 1
+    return slices
+
+
+def _subtract_slices(a, b, full) -> list[int]:
+    # Subtract bit-sliced counter b from a (every counter in a must be >= its partner in b)
+    out = []
+    borrow = 0
+    for j in range(max(len(a), len(b))):
+        x = a[j] if j < len(a) else 0
+        y = b[j] if j < len(b) else 0
+        out.append(x ^ y ^ borrow)
+        borrow = ((full ^ x) & y) | ((full ^ (x ^ y)) & borrow)
+    return out
+
+
+def _equal_mask(slices, value, full) -> int:
+    # Bitset of the positions whose bit-sliced counter equals value
+    if value >> len(slices):
+        return 0
+    mask = full
+    for j, s in enumerate(slices):
+        mask &= s if (value >> j) & 1 else full ^ s
+    return mask
+
+
+def _add_to_slices(slices, bits) -> list[int]:
+    # Add one 0/1 bitset to a bit-sliced counter (a ripple-carry adder over whole bitsets)
+    carry = bits
+    out = []
+    for s in slices:
+        out.append(s ^ carry)
+        carry &= s
+    if carry:
+        out.append(carry)
+    return out
+
+
+class PantryIndex:
+    """
+    Inverted index from ingredient to the meals that use it, for pantry searches.
+
+    Every meal is given a bit position and each ingredient's posting list is a Python
+    int with one bit per meal, so unions and intersections over the whole catalogue are
+    single big-integer operations. Per-meal coverage ("how many of my pantry items does
+    this meal use") is accumulated as a bit-sliced counter, which keeps the work
+    proportional to the number of pantry items rather than the number of meals.
+
+    The index is rebuilt on first use after the catalogue cache version changes
+    (every meal write calls catalogue.invalidate) or after the cache TTL expires.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._index = None
+        self._built_version = None
+        self._built_at = 0.0
+
+    def init_app(self, app):
+        """Share the catalogue cache TTL from the Flask config."""
+        self.ttl = app.config.get('CATALOGUE_CACHE_TTL', self.ttl)
+        with self._lock:
+            self._index = None
+
+    @staticmethod
+    def _build() -> dict:
+        # Read every (meal, ingredient) pair from the normalized mapping in one query
+        rows = execute_mysql_query(
+            """
+            SELECT DISTINCT m.Meal_ID, m.Name, i.Ingredient_Name
+            FROM MealIngredients mi
+            JOIN Ingredients i ON i.Ingredient_ID = mi.Ingredient_ID
+            JOIN MealsTable m ON m.Meal_ID = mi.Meal_ID
+            ORDER BY m.Meal_ID
+            """,
+            fetch="all",
+        ) or []
+
+        names = []
+        ingredients = []
+        positions = {}
+        postings = {}
+        for r in rows:
+            position = positions.get(r["Meal_ID"])
+            if position is None:
+                position = positions[r["Meal_ID"]] = len(names)
+                names.append(r["Name"])
+                ingredients.append([])
+
+            # Names are matched case-insensitively, like MySQL does
+            key = r["Ingredient_Name"].casefold()
+            if not postings.get(key, 0) >> position & 1:
+                postings[key] = postings.get(key, 0) | (1 << position)
+                ingredients[position].append(r["Ingredient_Name"])
+
+        sizes = [len(items) for items in ingredients]
+        return {
+            "names": names,
+            "ingredients": ingredients,
+            "sizes": sizes,
+            "size_slices": _bit_slices(sizes),
+            "postings": postings,
+        }
+
+    def _data(self) -> dict:
+        from .catalogue import catalogue
+
+        with self._lock:
+            if (self._index is not None and self._built_version == catalogue.version
+                    and (time.monotonic() - self._built_at) <= self.ttl):
+                return self._index
+
+        version = catalogue.version
+        index = self._build()
+        with self._lock:
+            self._index = index
+            self._built_version = version
+            self._built_at = time.monotonic()
+        return index
+
+    def search(self, pantry, mode="only", max_missing=None, limit=50) -> list[dict]:
+        """
+        Find meals that can be cooked from the given pantry.
+
+        pantry      : ingredient names on hand (matched case-insensitively)
+        mode        : "only" returns meals that use nothing outside the pantry;
+                      "rank" returns meals using at least one pantry item, ordered by
+                      fewest missing ingredients and then by most pantry items used
+        max_missing : in "rank" mode, leave out meals missing more than this many items
+        limit       : maximum number of results
+
+        Each result is {"Name", "Have", "Missing", "Missing_Ingredients"}.
+        """
+        index = self._data()
+        postings = index["postings"]
+        keys = {name.casefold() for name in pantry if name}
+
+        # Union of the posting lists gives every meal using at least one pantry item,
+        # and adding them up gives each meal's coverage as a bit-sliced counter
+        candidates = 0
+        coverage = []
+        for key in keys:
+            bits = postings.get(key, 0)
+            if bits:
+                candidates |= bits
+                coverage = _add_to_slices(coverage, bits)
+
+        full = (1 << len(index["names"])) - 1
+        sizes = index["sizes"]
+
+        # Missing-ingredient count per meal, still as a bit-sliced counter
+        missing_slices = _subtract_slices(index["size_slices"], coverage, full)
+        max_level = 0 if mode == "only" else max(sizes, default=0)
+        if max_missing is not None:
+            max_level = min(max_level, max_missing)
+
+        # Walk the missing counts upwards, so only as many levels are decoded as the limit needs.
+        # Within a level the meals using the most pantry items come first.
+        ranked = []
+        for missing in range(max_level + 1):
+            if len(ranked) >= limit:
+                break
+            level = candidates & _equal_mask(missing_slices, missing, full)
+            ranked.extend(sorted(
+                (missing, -(sizes[p] - missing), index["names"][p].casefold(), p)
+                for p in _iter_bits(level)
+            ))
+
+        # Build result rows for the returned meals only
+        results = []
+        for missing, negative_have, _, p in ranked[:limit]:
+            results.append({
+                "Name": index["names"][p],
+                "Have": -negative_have,
+                "Missing": missing,
+                "Missing_Ingredients": sorted(
+                    name for name in index["ingredients"][p] if name.casefold() not in keys
+                ),
+            })
+        return results
+
+
+# Shared index instance used by the pantry search page
+pantry_index = PantryIndex()
@@ -0,0 +1,122 @@
+from types import MappingProxyType
+from typing import NamedTuple
+from .variables import fresh_ingredients, tinned_ingredients, dry_ingredients, dairy_ingredients
+
+
+class Unit(NamedTuple):
+    """How a unit is written and how it converts to its base unit."""
+    singular: str
+    plural: str
+    base: str
+    factor: float
+
+
+# Every unit used by the ingredient lists; symbols such as g and tsp are never pluralised
+UNITS = MappingProxyType({
+    "g": Unit("g", "g", "g", 1.0),
+    "kg": Unit("kg", "kg", "g", 1000.0),
+    "ml": Unit("ml", "ml", "ml", 1.0),
+    "l": Unit("l", "l", "ml", 1000.0),
+    "tsp": Unit("tsp", "tsp", "ml", 5.0),
+    "tbsp": Unit("tbsp", "tbsp", "ml", 15.0),
+    "pcs": Unit("pcs", "pcs", "pcs", 1.0),
+    "cloves": Unit("clove", "cloves", "cloves", 1.0),
+    "bulbs": Unit("bulb", "bulbs", "bulbs", 1.0),
+    "tins": Unit("tin", "tins", "tins", 1.0),
+})
+
+# Ingredients that can appear in stored meals but are not offered on the Add/Edit forms
+DISPLAY_ONLY_INGREDIENTS = {
+    "Dairy_Ingredients": [["Milk", "ml"]],
+}
+
+
+class IngredientRecord(NamedTuple):
+    """One ingredient from variables.py with everything needed to display its quantities."""
+    name: str
+    category: str
+    unit: str
+    singular: str
+    plural: str
+    base_unit: str
+    factor: float
+
+
+def _display_number(value):
+    # Round to two places (like the shopping-list totals) and drop a trailing .0
+    num = round(float(value), 2)
+    return int(num) if num.is_integer() else num
+
+
+class IngredientRegistry:
+    """
+    Immutable lookup of every known ingredient, built once from the lists in variables.py.
+
+    Formatting a quantity is a single dict lookup followed by string formatting, and
+    every page (meal details, shopping lists, Add/Edit forms) uses the same rules:
+    - numbers are rounded to two places and integral values lose their ".0"
+    - the ingredient's unit is appended, singular for amounts of at most one
+    - unknown ingredients and non-numeric amounts are shown as they are
+    """
+
+    def __init__(self, lists, display_only=None):
+        records = {}
+        for source in (display_only or {}, lists):
+            for category, items in source.items():
+                for name, unit in items:
+                    spec = UNITS.get(unit, Unit(unit, unit, unit, 1.0))
+                    records[name] = IngredientRecord(name, category, unit, spec.singular, spec.plural,
+                                                     spec.base, spec.factor)
+
+        self._records = MappingProxyType(records)
+        self._names = MappingProxyType({c: tuple(name for name, _ in items) for c, items in lists.items()})
+        self._units = MappingProxyType({c: tuple(unit for _, unit in items) for c, items in lists.items()})
+
+    @classmethod
+    def from_variables(cls):
+        lists = {
+            "Fresh_Ingredients": fresh_ingredients,
+            "Tinned_Ingredients": tinned_ingredients,
+            "Dry_Ingredients": dry_ingredients,
+            "Dairy_Ingredients": dairy_ingredients,
+        }
+        return cls(lists, DISPLAY_ONLY_INGREDIENTS)
+
+    def get(self, name) -> IngredientRecord | None:
+        return self._records.get(name)
+
+    def unit(self, name) -> str | None:
+        record = self._records.get(name)
+        return record.unit if record else None
+
+    def names(self, category) -> tuple[str, ...]:
+        """Ingredient names offered on the forms for one bucket, in display order."""
+        return self._names.get(category, ())
+
+    def units(self, category) -> tuple[str, ...]:
+        """Units matching names(category), position for position."""
+        return self._units.get(category, ())
+
+    def to_base(self, name, value):
+        """Convert an amount to the unit's base unit (g, ml or the count unit itself)."""
+        record = self._records.get(name)
+        return float(value) * record.factor if record else float(value)
+
+    def format_quantity(self, name, value) -> str:
+        """Return an amount with its unit, e.g. "250 g" or "1 tin"."""
+        record = self._records.get(name)
+        try:
+            num = _display_number(value)
+        except (TypeError, ValueError):
+            return str(value)
+        if record is None:
+            return str(num)
+        return f"{num} {record.singular if 0 < num <= 1 else record.plural}"
+
+    def format_bucket(self, bucket) -> list[str]:
+        """Format every amount of one {ingredient: amount} bucket, in the bucket's order."""
+        return [self.format_quantity(name, value) for name, value in (bucket or {}).items()]
+
+
+# Shared registry, built when the app starts
+registry = IngredientRegistry.from_variables()
@@ -0,0 +1,291 @@
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+import zlib
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+
+# Session IDs are 32 random bytes, URL-safe base64 encoded (43 characters)
+SESSION_ID_BYTES = 32
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{43}$")
+
+# Stored payloads start with a marker byte saying whether the body is compressed
+RAW_MARKER = b"j"
+COMPRESSED_MARKER = b"z"
+
+
+class SQLiteSessionStore:
+    """Session payloads kept in one local SQLite file, shared by all worker processes."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id  TEXT PRIMARY KEY,
+                    data        BLOB NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_accessed ON sessions (accessed_at)")
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per operation; commits on success, rolls back on error
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def load(self, session_id):
+        """Return (payload, last access time) or None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT data, accessed_at FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return (bytes(row[0]), row[1]) if row else None
+
+    def save(self, session_id, payload, now) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, data, accessed_at) VALUES (?, ?, ?)",
+                (session_id, payload, now),
+            )
+
+    def touch(self, session_id, now) -> None:
+        with self._connect() as conn:
+            conn.execute("UPDATE sessions SET accessed_at = ? WHERE session_id = ?", (now, session_id))
+
+    def delete(self, session_id) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def purge(self, idle_before) -> None:
+        """Delete every session last used before the given time."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM sessions WHERE accessed_at < ?", (idle_before,))
+
+
+class FileSessionStore:
+    """Session payloads kept as one file per session; the file's mtime is its last access time."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, session_id):
+        return os.path.join(self.directory, session_id)
+
+    def load(self, session_id):
+        """Return (payload, last access time) or None."""
+        path = self._path(session_id)
+        try:
+            with open(path, "rb") as f:
+                return f.read(), os.path.getmtime(path)
+        except OSError:
+            return None
+
+    def save(self, session_id, payload, now) -> None:
+        # Write to a temporary file and rename it so readers never see a partial payload
+        path = self._path(session_id)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+    def touch(self, session_id, now) -> None:
+        try:
+            os.utime(self._path(session_id), (now, now))
+        except OSError:
+            pass
+
+    def delete(self, session_id) -> None:
+        try:
+            os.remove(self._path(session_id))
+        except OSError:
+            pass
+
+    def purge(self, idle_before) -> None:
+        """Delete every session last used before the given time."""
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < idle_before:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+
+class ServerSideSession(SessionMixin, MutableMapping):
+    """
+    Session whose data lives in a server-side store under an opaque ID.
+
+    Nothing is read from the store until the session is first used, so requests
+    that never touch the session cost no storage I/O at all.
+    """
+
+    def __init__(self, interface, session_id=None):
+        self.interface = interface
+        self.session_id = session_id
+        self.new = session_id is None
+        self.modified = False
+        self.accessed = False
+        self._data = None if session_id else {}
+        self._accessed_at = None
+
+    def _load(self) -> dict:
+        self.accessed = True
+        if self._data is None:
+            self._data, self._accessed_at = self.interface.load_data(self.session_id)
+            if self._accessed_at is None:
+                # Unknown or expired ID: start afresh under a new one
+                self.session_id = None
+                self.new = True
+        return self._data
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __setitem__(self, key, value):
+        self._load()[key] = value
+        self.modified = True
+
+    def __delitem__(self, key):
+        del self._load()[key]
+        self.modified = True
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """
+    Flask session interface that keeps session data in a local file or SQLite store.
+
+    The cookie carries only a random session ID. Payloads are serialised with Flask's
+    tagged JSON serializer and optionally zlib-compressed. Sessions unused for longer
+    than the idle timeout are treated as missing and purged periodically.
+    """
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store, idle_timeout=86400, compress=True, touch_interval=60, purge_interval=600):
+        self.store = store
+        self.idle_timeout = idle_timeout
+        self.compress = compress
+        self.touch_interval = touch_interval
+        self.purge_interval = purge_interval
+        self._last_purge = 0.0
+
+    def _encode(self, data) -> bytes:
+        body = self.serializer.dumps(data).encode("utf-8")
+        if self.compress:
+            return COMPRESSED_MARKER + zlib.compress(body)
+        return RAW_MARKER + body
+
+    def _decode(self, payload) -> dict:
+        marker, body = payload[:1], payload[1:]
+        if marker == COMPRESSED_MARKER:
+            body = zlib.decompress(body)
+        return self.serializer.loads(body.decode("utf-8"))
+
+    def load_data(self, session_id):
+        """Return (data, last access time); the time is None if the session does not exist."""
+        found = self.store.load(session_id)
+        if found is None:
+            return {}, None
+        payload, accessed_at = found
+        if time.time() - accessed_at > self.idle_timeout:
+            self.store.delete(session_id)
+            return {}, None
+        try:
+            return self._decode(payload), accessed_at
+        except (ValueError, zlib.error):
+            self.store.delete(session_id)
+            return {}, None
+
+    def open_session(self, app, request):
+        # Only the ID is read here; the data is loaded when the view first uses the session
+        session_id = request.cookies.get(app.config["SESSION_COOKIE_NAME"])
+        if not session_id or not SESSION_ID_PATTERN.match(session_id):
+            session_id = None
+        return ServerSideSession(self, session_id)
+
+    def _purge_if_due(self, now) -> None:
+        if now - self._last_purge >= self.purge_interval:
+            self._last_purge = now
+            self.store.purge(now - self.idle_timeout)
+
+    def save_session(self, app, session, response):
+        cookie_name = app.config["SESSION_COOKIE_NAME"]
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        # An untouched session needs no storage I/O and no new cookie
+        if not session.accessed:
+            return
+        response.vary.add("Cookie")
+        now = time.time()
+        self._purge_if_due(now)
+
+        # Emptied sessions are removed from the store along with their cookie
+        if session.modified and not session._data:
+            if session.session_id:
+                self.store.delete(session.session_id)
+                response.delete_cookie(cookie_name, domain=domain, path=path)
+            return
+
+        if session.modified:
+            if session.session_id is None:
+                session.session_id = secrets.token_urlsafe(SESSION_ID_BYTES)
+            self.store.save(session.session_id, self._encode(session._data), now)
+        elif session.session_id and session._accessed_at is not None:
+            # Reading the session counts as activity; refresh its access time now and then
+            if now - session._accessed_at >= self.touch_interval:
+                self.store.touch(session.session_id, now)
+            if not self.should_set_cookie(app, session):
+                return
+        else:
+            return
+
+        response.set_cookie(
+            cookie_name,
+            session.session_id,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+
+def init_app(app) -> None:
+    """Install the server-side session interface configured by SESSION_BACKEND."""
+    backend = app.config.get("SESSION_BACKEND", "sqlite")
+    location = app.config.get("SESSION_STORE_PATH")
+    if backend == "file":
+        store = FileSessionStore(location or os.path.join(app.instance_path, "sessions"))
+    elif backend == "sqlite":
+        store = SQLiteSessionStore(location or os.path.join(app.instance_path, "sessions.sqlite3"))
+    else:
+        raise ValueError(f"Unknown SESSION_BACKEND {backend!r}; expected 'sqlite' or 'file'")
+
+    app.session_interface = ServerSideSessionInterface(
+        store,
+        idle_timeout=app.config.get("SESSION_IDLE_TIMEOUT", 86400),
+        compress=app.config.get("SESSION_COMPRESS", True),
+    )
@@ -0,0 +1,125 @@
+/*
+  Meal-name typeahead.
+
+  Any <input data-typeahead="/typeahead/meals"> gets a <datalist> of suggestions that is
+  refreshed from the JSON endpoint as the user types, so pages no longer need to ship
+  every meal name as <option> elements.
+
+  Optional attributes:
+    data-typeahead-limit   number of suggestions to request (default 10)
+    data-typeahead-add     id of a <table>; pressing Enter or the matching button
+                           (data-typeahead-add-for="<input id>") appends a checked
+                           checkbox row for the chosen name, named "<prefix> <n>"
+    data-typeahead-prefix  checkbox name prefix used with data-typeahead-add (default "Meal")
+*/
+(function () {
+    var DEBOUNCE_MS = 150;
+    var counter = 0;
+
+    function attach(input) {
+        var list = document.createElement("datalist");
+        list.id = "typeahead-list-" + (counter++);
+        input.parentNode.insertBefore(list, input.nextSibling);
+        input.setAttribute("list", list.id);
+        input.setAttribute("autocomplete", "off");
+
+        var timer = null;
+        var lastQuery = null;
+
+        function refresh() {
+            var query = input.value.trim();
+            if (!query || query === lastQuery) {
+                return;
+            }
+            lastQuery = query;
+            var limit = input.getAttribute("data-typeahead-limit") || 10;
+            var url = input.getAttribute("data-typeahead") +
+                "?q=" + encodeURIComponent(query) + "&limit=" + encodeURIComponent(limit);
+
+            fetch(url, {headers: {"Accept": "application/json"}})
+                .then(function (response) { return response.json(); })
+                .then(function (data) {
+                    // Ignore replies to queries the user has already typed past
+                    if (input.value.trim() !== query) {
+                        return;
+                    }
+                    list.innerHTML = "";
+                    data.results.forEach(function (name) {
+                        var option = document.createElement("option");
+                        option.value = name;
+                        list.appendChild(option);
+                    });
+                })
+                .catch(function () { /* keep the previous suggestions */ });
+        }
+
+        input.addEventListener("input", function () {
+            clearTimeout(timer);
+            timer = setTimeout(refresh, DEBOUNCE_MS);
+        });
+
+        var tableId = input.getAttribute("data-typeahead-add");
+        if (tableId) {
+            attachAdder(input, document.getElementById(tableId));
+        }
+    }
+
+    function attachAdder(input, table) {
+        var prefix = input.getAttribute("data-typeahead-prefix") || "Meal";
+        var added = 0;
+
+        function add() {
+            var name = input.value.trim();
+            if (!name) {
+                return;
+            }
+            // Skip names that are already in the table
+            var boxes = table.querySelectorAll("input[type=checkbox]");
+            for (var i = 0; i < boxes.length; i++) {
+                if (boxes[i].value === name) {
+                    input.value = "";
+                    return;
+                }
+            }
+            var id = prefix.toLowerCase() + "_added_" + (added++);
+            var row = table.insertRow(-1);
+            var label = document.createElement("label");
+            label.htmlFor = id;
+            label.textContent = name;
+            var box = document.createElement("input");
+            box.type = "checkbox";
+            box.id = id;
+            box.name = prefix + " " + id;
+            box.value = name;
+            box.checked = true;
+            var nameCell = row.insertCell(-1);
+            nameCell.id = "checkboxtable_col1";
+            nameCell.appendChild(label);
+            var boxCell = row.insertCell(-1);
+            boxCell.id = "checkboxtable_col2";
+            boxCell.appendChild(box);
+            input.value = "";
+        }
+
+        input.addEventListener("keydown", function (event) {
+            if (event.key === "Enter") {
+                event.preventDefault();
+                add();
+            }
+        });
+        var button = document.querySelector("[data-typeahead-add-for='" + input.id + "']");
+        if (button) {
+            button.addEventListener("click", function (event) {
+                event.preventDefault();
+                add();
+            });
+        }
+    }
+
+    document.addEventListener("DOMContentLoaded", function () {
+        var inputs = document.querySelectorAll("input[data-typeahead]");
+        for (var i = 0; i < inputs.length; i++) {
+            attach(inputs[i]);
+        }
+    });
+})();
@@ -0,0 +1,173 @@
+import threading
+import time
+from .utilities import execute_mysql_query, in_clause
+
+# While no more than this many tag bits are in use, tag filters are written as
+# Tags_Mask IN (...) over every matching mask value, so MySQL answers them with range
+# reads on idx_tags_made; with more bits the filter falls back to a bitwise test
+IN_LIST_MAX_BITS = 8
+
+# Masks decoded through a precomputed table while the highest bit is below this
+DECODE_TABLE_MAX_BITS = 12
+
+
+def _column_name(label) -> str:
+    # Tags used to be MealsTable columns ("Quick_Easy"), so that spelling is accepted too
+    return str(label).replace('/', '_')
+
+
+class TagTables:
+    """
+    Lookup tables for one snapshot of the Tags table.
+
+    Each tag owns one bit of MealsTable.Tags_Mask (its Tag_Bit). Encoding labels to a
+    mask is one dict lookup per label, decoding a mask is one list index, and the mask
+    values matching an "all of" or "any of" filter are computed once per filter.
+    """
+
+    def __init__(self, rows):
+        # rows: (Tag_Name, Tag_Bit) pairs
+        rows = sorted(rows, key=lambda r: r[1])
+        self.labels = tuple(name for name, _ in rows)
+        self.used = 0
+        self._bits = {}
+        for name, bit in rows:
+            self.used |= 1 << bit
+            self._bits[name] = self._bits[_column_name(name)] = 1 << bit
+
+        width = self.used.bit_length()
+        self._decoded = None
+        if width <= DECODE_TABLE_MAX_BITS:
+            self._decoded = [self._decode(mask) for mask in range(1 << width)]
+        self._matches = {}
+
+    def _decode(self, mask) -> tuple[str, ...]:
+        return tuple(name for name in self.labels if mask & self._bits[name])
+
+    def mask(self, labels) -> int:
+        """Encode tag labels as a mask; raises ValueError for a tag that is not in the Tags table."""
+        mask = 0
+        for label in labels:
+            bit = self._bits.get(label)
+            if bit is None:
+                raise ValueError(f"Unknown tag {label!r}; expected one of {', '.join(self.labels)}")
+            mask |= bit
+        return mask
+
+    def decode(self, mask) -> list[str]:
+        """Tag labels set in a mask, in Tags table order (bits of unknown tags are ignored)."""
+        mask = int(mask or 0) & self.used
+        if self._decoded is not None:
+            return list(self._decoded[mask])
+        return list(self._decode(mask))
+
+    def flags(self, mask) -> list[int]:
+        """1 or 0 for each label, in labels order (used to pre-tick checkboxes)."""
+        mask = int(mask or 0)
+        return [1 if mask & self._bits[name] else 0 for name in self.labels]
+
+    def matching_masks(self, mask, mode="all") -> list[int] | None:
+        """
+        Every in-use mask value that passes an "all" or "any" filter on mask, or None
+        when too many tag bits are in use to list them.
+        """
+        key = (mask, mode)
+        found = self._matches.get(key)
+        if found is None and key not in self._matches:
+            if self.used.bit_count() > IN_LIST_MAX_BITS:
+                found = None
+            else:
+                # Walk every subset of the bits in use
+                values = []
+                subset = self.used
+                while True:
+                    if (subset & mask == mask) if mode == "all" else (subset & mask):
+                        values.append(subset)
+                    if subset == 0:
+                        break
+                    subset = (subset - 1) & self.used
+                found = sorted(values)
+            self._matches[key] = found
+        return found
+
+
+class TagCatalogue:
+    """
+    The tags defined in the Tags table, with lookup tables for the Tags_Mask bitmask.
+
+    Adding a tag is a new Tags row with the next free Tag_Bit; no MealsTable column is
+    needed. The table is re-read after the catalogue version changes or the cache TTL
+    expires, like the ingredient vocabulary.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._tables = None
+        self._loaded_at = 0.0
+        self._version = None
+
+    def init_app(self, app):
+        """Share the catalogue cache TTL from the Flask config."""
+        self.ttl = app.config.get('CATALOGUE_CACHE_TTL', self.ttl)
+        with self._lock:
+            self._tables = None
+
+    @staticmethod
+    def _load() -> TagTables:
+        rows = execute_mysql_query(
+            "SELECT Tag_Name, Tag_Bit FROM Tags WHERE Tag_Bit IS NOT NULL ORDER BY Tag_Bit",
+            fetch="all",
+        ) or []
+        return TagTables([(r["Tag_Name"], int(r["Tag_Bit"])) for r in rows])
+
+    def tables(self) -> TagTables:
+        from .catalogue import catalogue
+
+        with self._lock:
+            if (self._tables is not None and self._version == catalogue.version
+                    and (time.monotonic() - self._loaded_at) <= self.ttl):
+                return self._tables
+
+        version = catalogue.version
+        tables = self._load()
+        with self._lock:
+            self._tables = tables
+            self._loaded_at = time.monotonic()
+            self._version = version
+        return tables
+
+    def labels(self) -> tuple[str, ...]:
+        """All tag labels, in Tags table order."""
+        return self.tables().labels
+
+    def mask(self, labels) -> int:
+        return self.tables().mask(labels)
+
+    def decode(self, mask) -> list[str]:
+        return self.tables().decode(mask)
+
+    def flags(self, mask) -> list[int]:
+        return self.tables().flags(mask)
+
+    def filter_sql(self, mask, mode="all", column="Tags_Mask", prefix="tm"):
+        """
+        SQL condition selecting rows whose tags include all (mode="all") or any
+        (mode="any") of the tags in mask, and its params. Returns (None, {}) when
+        mask is 0, since every row passes.
+        """
+        if not mask:
+            return None, {}
+        values = self.tables().matching_masks(mask, mode)
+        if values is None:
+            op = f"= :{prefix}" if mode == "all" else "<> 0"
+            return f"({column} & :{prefix}) {op}", {prefix: mask}
+        if not values:
+            # A tag whose bit no meal can carry (removed from the Tags table)
+            return "1 = 0", {}
+        placeholders, params = in_clause(values, prefix=prefix)
+        return f"{column} IN ({placeholders})", params
+
+
+# Shared tag catalogue, loaded from the Tags table on first use
+tag_catalogue = TagCatalogue()
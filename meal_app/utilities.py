@@ -1,10 +1,78 @@
 import json
+import time
+from functools import lru_cache
+import sqlalchemy
+from flask import g
 from sqlalchemy import text
 from . import db
+from .metrics import record_query
 
+# Number of distinct SQL strings whose text() constructs are kept for reuse
+STATEMENT_CACHE_SIZE = 512
+
+
+def get_connection():
+    """
+    Return the database connection for the current request (or app context).
+
+    The first query lazily checks out a connection and begins a transaction;
+    later queries in the same context reuse both. finish_connection() commits
+    or rolls back and returns the connection to the pool.
+    """
+    if 'db_conn' not in g:
+        conn = db.engine.connect()
+        g.db_conn = conn
+        g.db_trans = conn.begin()
+    return g.db_conn
+
+
+def finish_connection(commit=True) -> None:
+    """
+    Commit (or roll back) the current context's transaction and release its connection.
+    Does nothing if no query has been run in this context.
+    """
+    conn = g.pop('db_conn', None)
+    trans = g.pop('db_trans', None)
+    if conn is None:
+        return
+    try:
+        if trans is not None and trans.is_active:
+            if commit:
+                trans.commit()
+            else:
+                trans.rollback()
+    finally:
+        conn.close()
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def compile_statement(query_string):
+    """Return the cached text() construct for a SQL string, building it on first use."""
+    return text(query_string)
+
+
+def _rows_from_mappings(result, fetch):
+    # SQLAlchemy 1.4+: results expose dictionary-style rows through mappings()
+    mappings = result.mappings()
+    if fetch == "one":
+        return mappings.first()
+    return list(mappings.all())
+
+
+def _rows_from_tuples(result, fetch):
+    # Older SQLAlchemy versions: zip each tuple row with the result keys
+    keys = result.keys()
+    if fetch == "one":
+        row = result.fetchone()
+        result.close()
+        return dict(zip(keys, row)) if row is not None else None
+    return [dict(zip(keys, row)) for row in result.fetchall()]
+
+
+# Pick the row-mapping strategy once for the installed SQLAlchemy version
+_SQLALCHEMY_VERSION = tuple(int(part) for part in sqlalchemy.__version__.split(".")[:2])
+_fetch_rows = _rows_from_mappings if _SQLALCHEMY_VERSION >= (1, 4) else _rows_from_tuples
 
-from sqlalchemy import text
-from . import db
 
 def execute_mysql_query(query_string, params=None, fetch="all"):
     """
@@ -12,6 +80,7 @@ def execute_mysql_query(query_string, params=None, fetch="all"):
 
     query_string : SQL query with optional named parameters
     params       : dictionary of parameters for the query
+                   (a list of dictionaries runs the statement once per entry)
     fetch        : controls how results are returned
                    - "all"  -> list of rows (default)
                    - "one"  -> single row or None
@@ -24,39 +93,24 @@ def execute_mysql_query(query_string, params=None, fetch="all"):
     if fetch not in ("all", "one", "none"):
         fetch = "all"
 
-    # Open a database transaction
-    with db.engine.begin() as conn:
-        result = conn.execute(text(query_string), params)
-
-        # Determine whether the query returned rows
-        try:
-            returns_rows = result.returns_rows
-        except AttributeError:
-            # Fallback for older SQLAlchemy versions
-            returns_rows = hasattr(result, "cursor") and getattr(result.cursor, "description", None)
-
-        # If the query does not return rows, nothing needs to be fetched
-        if not returns_rows:
-            return None
-
-        # Preferred path for newer SQLAlchemy versions
-        try:
-            mappings = result.mappings()
-            if fetch == "one":
-                row = mappings.first()
-                return row if row is not None else None
-            else:
-                return list(mappings.all())
-        except AttributeError:
-            # Fallback path for older SQLAlchemy versions
-            rows = result.fetchall()
-            keys = result.keys()
-            dict_rows = [dict(zip(keys, row)) for row in rows]
-
-            if fetch == "one":
-                return dict_rows[0] if dict_rows else None
-            else:
-                return dict_rows
+    # Run the query on the request's shared connection and transaction
+    # (committed or rolled back once the request finishes)
+    # The text() construct for each distinct SQL string is built once and reused
+    conn = get_connection()
+    started = time.perf_counter()
+    result = conn.execute(compile_statement(query_string), params)
+
+    # If the query does not return rows, nothing needs to be fetched
+    if not result.returns_rows:
+        record_query(query_string, time.perf_counter() - started, 0)
+        return None
+
+    rows = _fetch_rows(result, fetch)
+
+    # Record latency and returned row count for /metrics and the slow-query log
+    row_count = len(rows) if isinstance(rows, list) else int(rows is not None)
+    record_query(query_string, time.perf_counter() - started, row_count)
+    return rows
 
 
 def parse_ingredients(ingredients_dict, filter_word, remove_prefix=False):
@@ -87,33 +141,206 @@ def parse_ingredients(ingredients_dict, filter_word, remove_prefix=False):
     return json.dumps(parsed_ingredient_dict)
 
 
-def get_tag_keys(tags):
+# Ingredient bucket columns stored as JSON on MealsTable
+# The same names are used as the Category value in MealIngredients
+INGREDIENT_BUCKETS = [
+    "Fresh_Ingredients",
+    "Tinned_Ingredients",
+    "Dry_Ingredients",
+    "Dairy_Ingredients",
+]
+
+
+def load_bucket(value) -> dict:
     """
-    Convert stored tag flags into a list of active tag names.
+    Convert a stored ingredient bucket into a dictionary.
+    Accepts JSON text or an already-parsed dict; empty/null values become {}.
     """
-    tag_list = []
-    for tag_dict in tags:
-        if list(tag_dict.values())[0] == 1:
-            tag_list.append(list(tag_dict.keys())[0])
-    return tag_list
-
+    if isinstance(value, dict):
+        return value
+    if value in (None, "", "null"):
+        return {}
+    try:
+        data = json.loads(value)
+    except (TypeError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def in_clause(values, prefix="n"):
+    """
+    Build a parameterised IN (...) list.
 
-def get_tags(tags):
+    Returns the placeholder string and the matching params dictionary,
+    e.g. (":n0, :n1", {"n0": "a", "n1": "b"}).
     """
-    Convert selected tag names into a dictionary of database-ready flags.
+    placeholders = ", ".join([f":{prefix}{i}" for i in range(len(values))])
+    params = {f"{prefix}{i}": value for i, value in enumerate(values)}
+    return placeholders, params
+
+
+# Largest number of values bound into a single IN (...) list; longer lists are split into chunks
+IN_CLAUSE_CHUNK_SIZE = 500
+
+
+def chunked(values, size=IN_CLAUSE_CHUNK_SIZE):
+    """Yield successive slices of at most `size` items from a list."""
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def keyset_condition(columns, values, prefix="k"):
     """
-    from .variables import tag_list, tag_list_backend
+    Build a WHERE condition selecting rows that sort after a keyset cursor.
+
+    columns : ordered sort columns, ending with a unique tie-breaker (e.g. Meal_ID)
+    values  : the sort-column values of the last row on the previous page
 
-    parsed_tags = {}
+    Rows are assumed to be ordered ascending on every column, with NULLs first
+    (MySQL's default). Returns the SQL condition and its params dictionary.
+    """
+    params = {}
+    alternatives = []
+    for i, column in enumerate(columns):
+        # Every earlier column equals the cursor value ...
+        parts = []
+        for j in range(i):
+            if values[j] is None:
+                parts.append(f"{columns[j]} IS NULL")
+            else:
+                params[f"{prefix}{j}"] = values[j]
+                parts.append(f"{columns[j]} = :{prefix}{j}")
 
-    # Mark selected tags as 1 and others as 0
-    for tag in tag_list:
-        if tag in tags:
-            parsed_tags[tag.replace('/', '_')] = "1"
+        # ... and this column sorts after it
+        if values[i] is None:
+            parts.append(f"{column} IS NOT NULL")
         else:
-            parsed_tags[tag.replace('/', '_')] = "0"
+            params[f"{prefix}{i}"] = values[i]
+            parts.append(f"{column} > :{prefix}{i}")
+        alternatives.append("(" + " AND ".join(parts) + ")")
+    return "(" + " OR ".join(alternatives) + ")", params
+
+
+def quantity_or_none(value):
+    # Quantities are stored as DECIMAL(10,2); anything non-numeric is kept as NULL
+    try:
+        return round(float(value), 2)
+    except (TypeError, ValueError):
+        return None
+
+
+def sync_meal_ingredients(meal_name, buckets) -> None:
+    """
+    Rebuild the MealIngredients rows for one meal from its ingredient buckets.
 
-    return parsed_tags
+    meal_name : name of the meal as stored in MealsTable
+    buckets   : dictionary of bucket column -> JSON text or dict
+                (e.g. {"Fresh_Ingredients": '{"Garlic": "2"}', ...})
+
+    Ingredient names that are not in the Ingredients catalogue yet are added first,
+    so every mapping row points at a catalogue entry.
+    """
+    row = execute_mysql_query(
+        "SELECT Meal_ID FROM MealsTable WHERE Name = :name",
+        {"name": meal_name},
+        fetch="one",
+    )
+    if not row:
+        return
+    meal_id = row["Meal_ID"]
+
+    # Remove the old mapping before inserting the current one
+    execute_mysql_query(
+        "DELETE FROM MealIngredients WHERE Meal_ID = :meal_id",
+        {"meal_id": meal_id},
+        fetch="none",
+    )
+
+    # Flatten the buckets into (category, ingredient, quantity) entries
+    entries = []
+    for category in INGREDIENT_BUCKETS:
+        for ingredient, quantity in load_bucket(buckets.get(category)).items():
+            if ingredient:
+                entries.append((category, ingredient, quantity_or_none(quantity)))
+    if not entries:
+        return
+
+    # Make sure every ingredient exists in the catalogue, then look up their IDs in one query
+    names = sorted({ingredient for _, ingredient, _ in entries})
+    placeholders, params = in_clause(names)
+    execute_mysql_query(
+        "INSERT IGNORE INTO Ingredients (Ingredient_Name) VALUES "
+        + ", ".join([f"(:{key})" for key in params]),
+        params,
+        fetch="none",
+    )
+    id_rows = execute_mysql_query(
+        f"SELECT Ingredient_ID, Ingredient_Name FROM Ingredients WHERE Ingredient_Name IN ({placeholders})",
+        params,
+        fetch="all",
+    ) or []
+    # MySQL compares names case-insensitively, so match the returned names the same way
+    ingredient_ids = {r["Ingredient_Name"].casefold(): r["Ingredient_ID"] for r in id_rows}
+
+    # Insert all mapping rows with a single executemany
+    mapping_rows = [
+        {
+            "meal_id": meal_id,
+            "ingredient_id": ingredient_ids[ingredient.casefold()],
+            "category": category,
+            "quantity": quantity,
+        }
+        for category, ingredient, quantity in entries
+        if ingredient.casefold() in ingredient_ids
+    ]
+    if not mapping_rows:
+        return
+    execute_mysql_query(
+        """
+        INSERT IGNORE INTO MealIngredients (Meal_ID, Ingredient_ID, Category, Quantity)
+        VALUES (:meal_id, :ingredient_id, :category, :quantity)
+        """,
+        mapping_rows,
+        fetch="none",
+    )
+
+
+def update_last_made(meal_names, date_made, chunk_size=IN_CLAUSE_CHUNK_SIZE) -> None:
+    """
+    Set Last_Made for many meals at once.
+
+    meal_names : names of the meals to stamp (duplicates are ignored)
+    date_made  : date to store, e.g. "2021-04-23"
+    chunk_size : number of names bound into each UPDATE ... WHERE Name IN (...)
+
+    Issues one UPDATE per chunk instead of one per meal. Updated_At is kept as it was
+    (a date stamp changes nothing backfill_catalog.py or the meal pages derive from a meal).
+    """
+    names = list(dict.fromkeys(meal_names))
+    for chunk in chunked(names, chunk_size):
+        placeholders, params = in_clause(chunk)
+        params["dt"] = date_made
+        execute_mysql_query(
+            f"UPDATE MealsTable SET Last_Made = :dt, Updated_At = Updated_At WHERE Name IN ({placeholders})",
+            params,
+            fetch="none",
+        )
+
+
+def delete_meal_ingredients(meal_names) -> None:
+    """Remove the MealIngredients rows belonging to the given meals."""
+    if not meal_names:
+        return
+    placeholders, params = in_clause(list(meal_names))
+    execute_mysql_query(
+        f"""
+        DELETE mi FROM MealIngredients mi
+        JOIN MealsTable m ON m.Meal_ID = mi.Meal_ID
+        WHERE m.Name IN ({placeholders})
+        """,
+        params,
+        fetch="none",
+    )
 
 
 # Dictionary mapping ingredient names to emojis for UI display
@@ -135,51 +135,10 @@ extras = sorted(
     ]
 )
 
-# List of ingredients that are usually measured in grams
-# This is used by backend logic when formatting quantities
-gram_list = sorted(
-    [
-        "Beans (Green)",
-        "Carrots",
-        "Cauliflower",
-        "Cilantro",
-        "Curry Leaves",
-        "Ginger",
-        "Mint",
-        "Peas",
-        "Peppers (Green)",
-        "Potatoes (Baking)",
-        "Potatoes (New)",
-        "Spinach",
-        "Tomatoes",
-        "Basmati Rice",
-        "Cashew Nuts",
-        "Flour (Maida)",
-        "Gram Flour (Besan)",
-        "Masoor Dal",
-        "Peanuts",
-        "Poha (Flattened Rice)",
-        "Semolina",
-        "Toor Dal",
-        "Whole Wheat Flour",
-        "Butter",
-        "Ghee",
-        "Paneer",
-    ]
-)
-
-# Tags shown to users in the UI
+# Standard tags, in Tag_Bit order (the UI reads the tags from the Tags table)
 tag_list = [
     "Spring/Summer",
     "Autumn/Winter",
     "Quick/Easy",
     "Special",
 ]
-
-# Corresponding database column names for the tags
-tag_list_backend = [
-    "Spring_Summer",
-    "Autumn_Winter",
-    "Quick_Easy",
-    "Special",
-]
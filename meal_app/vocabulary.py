@@ -0,0 +1,169 @@
+import threading
+import time
+from flask import g, has_app_context
+from .utilities import execute_mysql_query, load_bucket, INGREDIENT_BUCKETS
+
+
+class IngredientVocabulary:
+    """
+    In-memory vocabulary of the ingredients used in each category, with usage counts.
+
+    Loaded once from the MealIngredients mapping with a single GROUP BY and then kept
+    current by apply() whenever a meal is added, edited or deleted, so the search page
+    never has to scan MealsTable. Each category's sorted name list is cached and only
+    rebuilt when an ingredient enters or leaves that category.
+
+    The vocabulary is also reloaded after a TTL, or when the catalogue version moves on
+    without a matching apply() (a write made by another worker process), so writes made
+    elsewhere are picked up.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._counts = None
+        self._sorted = {}
+        self._loaded_at = 0.0
+        self._version = None
+
+    def init_app(self, app):
+        """Share the catalogue cache TTL from the Flask config."""
+        self.ttl = app.config.get('CATALOGUE_CACHE_TTL', self.ttl)
+        self.reset()
+
+    def reset(self) -> None:
+        """Drop the vocabulary so it is reloaded from the database on next use."""
+        with self._lock:
+            self._counts = None
+            self._sorted = {}
+
+    @staticmethod
+    def _load() -> dict:
+        # Count how many meals use each ingredient in each category
+        rows = execute_mysql_query(
+            """
+            SELECT mi.Category, i.Ingredient_Name, COUNT(*) AS Uses
+            FROM MealIngredients mi
+            JOIN Ingredients i ON i.Ingredient_ID = mi.Ingredient_ID
+            GROUP BY mi.Category, i.Ingredient_ID, i.Ingredient_Name
+            """,
+            fetch="all",
+        ) or []
+
+        # Entries are keyed by casefolded name, as MySQL compares names case-insensitively
+        counts = {category: {} for category in INGREDIENT_BUCKETS}
+        for r in rows:
+            category = counts.get(r["Category"])
+            if category is not None:
+                category[r["Ingredient_Name"].casefold()] = [r["Ingredient_Name"], int(r["Uses"])]
+        return counts
+
+    def _data(self) -> dict:
+        from .catalogue import catalogue
+
+        with self._lock:
+            if (self._counts is not None and self._version == catalogue.version
+                    and (time.monotonic() - self._loaded_at) <= self.ttl):
+                return self._counts
+
+        version = catalogue.version
+        counts = self._load()
+        with self._lock:
+            self._counts = counts
+            self._sorted = {}
+            self._loaded_at = time.monotonic()
+            self._version = version
+            return counts
+
+    def ingredients(self, category) -> list[str]:
+        """Return the ingredient names used in one category, sorted alphabetically."""
+        counts = self._data()
+        with self._lock:
+            names = self._sorted.get(category)
+            if names is None:
+                names = sorted(name for name, _ in counts.get(category, {}).values())
+                self._sorted[category] = names
+            return names
+
+    def usage_counts(self, category) -> dict:
+        """Return {ingredient name: number of meals using it} for one category."""
+        counts = self._data()
+        with self._lock:
+            return {name: uses for name, uses in counts.get(category, {}).values()}
+
+    @staticmethod
+    def _bucket_keys(buckets, category) -> dict:
+        # One mapping row is stored per casefolded name, so count each name once per meal
+        keys = {}
+        for name in load_bucket((buckets or {}).get(category)):
+            if name:
+                keys.setdefault(name.casefold(), name)
+        return keys
+
+    def apply(self, old_buckets=None, new_buckets=None) -> None:
+        """
+        Update the counts after one meal's ingredients change.
+
+        old_buckets : the meal's buckets before the write (None for a new meal)
+        new_buckets : the meal's buckets after the write (None for a deleted meal)
+        Buckets are dictionaries of bucket column -> JSON text or dict.
+        Call it after catalogue.invalidate() for the same write. Inside an app context
+        the update is held back until the context's transaction commits (see finish).
+        """
+        if has_app_context():
+            g.setdefault('vocabulary_changes', []).append((old_buckets, new_buckets))
+            return
+        self._apply(old_buckets, new_buckets)
+
+    def finish(self, committed=True) -> None:
+        """
+        Apply the updates held back in this app context once its transaction has
+        committed; after a rollback the vocabulary is reloaded instead.
+        """
+        changes = g.pop('vocabulary_changes', None) if has_app_context() else None
+        if not changes:
+            return
+        if not committed:
+            self.reset()
+            return
+        for old_buckets, new_buckets in changes:
+            self._apply(old_buckets, new_buckets)
+
+    def _apply(self, old_buckets, new_buckets) -> None:
+        from .catalogue import catalogue
+
+        with self._lock:
+            # Nothing to update if the vocabulary has not been loaded yet
+            if self._counts is None:
+                return
+            # Any other version change since the last load means the counts may be stale; reload instead
+            if self._version is not None and catalogue.version - self._version > 1:
+                self._counts = None
+                return
+            self._version = catalogue.version
+
+            for category in INGREDIENT_BUCKETS:
+                old = self._bucket_keys(old_buckets, category)
+                new = self._bucket_keys(new_buckets, category)
+                counts = self._counts[category]
+
+                for key in old.keys() - new.keys():
+                    entry = counts.get(key)
+                    if entry is None:
+                        continue
+                    entry[1] -= 1
+                    if entry[1] <= 0:
+                        del counts[key]
+                        self._sorted.pop(category, None)
+
+                for key in new.keys() - old.keys():
+                    entry = counts.get(key)
+                    if entry is None:
+                        counts[key] = [new[key], 1]
+                        self._sorted.pop(category, None)
+                    else:
+                        entry[1] += 1
+
+
+# Shared vocabulary instance used by the search page and the meal write paths
+vocabulary = IngredientVocabulary()